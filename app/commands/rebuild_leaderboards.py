@@ -0,0 +1,23 @@
+import asyncio
+import logging
+
+from app.repository.companies import CompanyRepository
+from app.repository.results import ResultsRepository
+from app.services.companies import CompanyService
+from app.services.leaderboards import leaderboard_service
+from app.services.results import ResultsService
+
+
+async def rebuild_leaderboards():
+    companies_service = CompanyService(CompanyRepository)
+    results_service = ResultsService(ResultsRepository)
+    companies = await companies_service.get_all_companies()
+    for company in companies:
+        totals = await results_service.get_leaderboard_totals(company.id)
+        await leaderboard_service.rebuild_company(company.id, totals)
+    logging.info(f"Leaderboards rebuilt for {len(companies)} companies")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_leaderboards())
@@ -0,0 +1,17 @@
+import asyncio
+import logging
+
+from app.repository.results import ResultsRepository
+from app.services.results import ResultsService
+
+
+async def rebuild_results_rollup():
+    results_service = ResultsService(ResultsRepository)
+    keys = await results_service.rebuild_rollup()
+    logging.info(f"Results rollup rebuilt with {keys} rows")
+    return keys
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_results_rollup())
@@ -0,0 +1,25 @@
+import asyncio
+import logging
+
+from app.repository.companies import CompanyRepository
+from app.repository.results import ResultsRepository
+from app.services.companies import CompanyService
+from app.services.results import ResultsService
+from app.services.score_sketch import score_sketch_service
+
+BATCH_SIZE = 10000
+
+
+async def rebuild_score_sketches():
+    companies_service = CompanyService(CompanyRepository)
+    results_service = ResultsService(ResultsRepository)
+    companies = await companies_service.get_all_companies()
+    for company in companies:
+        await score_sketch_service.rebuild_company(company.id,
+                                                   results_service.stream_sketch_rows(company.id, BATCH_SIZE))
+    logging.info(f"Score sketches rebuilt for {len(companies)} companies")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_score_sketches())
@@ -20,7 +20,28 @@ class FastAPIConfig(BaseSettings):
     db_password_prod: str = os.getenv("POSTGRES_PASSWORD_PROD")
     db_endpoint_prod: str = os.getenv("POSTGRES_ENDPOINT")
     db_port_prod: int = os.getenv("POSTGRES_PORT_PROD")
+    db_replica_endpoint: str = os.getenv("POSTGRES_REPLICA_ENDPOINT", "")
+    db_replica_port: int = os.getenv("POSTGRES_REPLICA_PORT", os.getenv("POSTGRES_PORT_PROD"))
+    db_echo: bool = os.getenv("DB_ECHO", False)
+    db_pool_size: int = os.getenv("DB_POOL_SIZE", 10)
+    db_max_overflow: int = os.getenv("DB_MAX_OVERFLOW", 10)
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", True)
+    db_pool_recycle: int = os.getenv("DB_POOL_RECYCLE", 1800)
+    db_pool_timeout: int = os.getenv("DB_POOL_TIMEOUT", 30)
+    db_connect_timeout: int = os.getenv("DB_CONNECT_TIMEOUT", 10)
+    db_command_timeout: int = os.getenv("DB_COMMAND_TIMEOUT", 60)
+    db_statement_cache_size: int = os.getenv("DB_STATEMENT_CACHE_SIZE", 100)
     redis_endpoint_prod: str = os.getenv("REDIS_ENDPOINT_PROD")
+    redis_max_connections: int = os.getenv("REDIS_MAX_CONNECTIONS", 50)
+    redis_pool_timeout: int = os.getenv("REDIS_POOL_TIMEOUT", 5)
+    redis_socket_timeout: int = os.getenv("REDIS_SOCKET_TIMEOUT", 5)
+    redis_socket_connect_timeout: int = os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5)
+    redis_health_check_interval: int = os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)
+    analytics_cache_ttl: int = os.getenv("ANALYTICS_CACHE_TTL", 60)
+    redis_fetch_batch_size: int = os.getenv("REDIS_FETCH_BATCH_SIZE", 500)
+    export_jobs_per_company: int = os.getenv("EXPORT_JOBS_PER_COMPANY", 2)
+    export_job_timeout: int = os.getenv("EXPORT_JOB_TIMEOUT", 1800)
+    export_job_ttl: int = os.getenv("EXPORT_JOB_TTL", 86400)
     secret_key: str = os.getenv("SECRET_KEY")
     hash_algorithm: str = os.getenv("ALGORITHM")
     secret_auth_key: str = os.getenv("SECRET_AUTH_KEY")
@@ -30,6 +30,15 @@ ERROR_NOT_ENOUGH_OPTIONS = "A question must have at least two answer options."
 ERROR_NOT_ENOUGH_QUESTIONS = "A quiz must have at least two questions options."
 
 ERROR_INVALID_SAVE_FORMAT = "Invalid save_format. Use 'json' or 'csv'."
+ERROR_INVALID_CURSOR = "Invalid pagination cursor"
+ERROR_INVALID_DATE_RANGE = "date_from must be earlier than date_to"
+ERROR_NOT_ON_LEADERBOARD = "User is not on the leaderboard"
+ERROR_INVALID_PERCENTILES = "Percentiles must be between 0 and 100"
+ERROR_DATE_RANGE_TOO_LONG = "The date range can span at most 366 days"
+ERROR_EXPORT_JOB_LIMIT = "Too many exports are running for this company, try again later"
+ERROR_EXPORT_JOB_NOT_FOUND = "Export job not found"
+ERROR_EXPORT_JOB_NOT_READY = "Export job has not finished yet"
+ERROR_EXPORT_JOB_FAILED = "Export job failed, submit a new export"
 ERROR_EXCEL_IMPORT = "Error when try import excel"
 ERROR_NOT_EXCEL_FORMAT = "File format should be .xlsx"
 
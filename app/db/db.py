@@ -1,22 +1,193 @@
+import time
+
 import redis.asyncio as redis
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.conf.config import conf
 
 SQL_ALCHEMY_URL_PROD = f"postgresql+asyncpg://{conf.db_user_prod}:{conf.db_password_prod}@{conf.db_endpoint_prod}:{conf.db_port_prod}"
-engine = create_async_engine(SQL_ALCHEMY_URL_PROD, echo=True)
+SQL_ALCHEMY_URL_REPLICA = f"postgresql+asyncpg://{conf.db_user_prod}:{conf.db_password_prod}@{conf.db_replica_endpoint}:{conf.db_replica_port}"
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": conf.db_max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Sessions connect lazily, so the wait is recorded on each real checkout rather than per request.
+    # Every pool keeps its own metrics, the primary and the replica are reported separately.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        self._metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def snapshot(self) -> dict:
+        return self._metrics.snapshot(self)
+
+
+def create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=conf.db_echo,
+        poolclass=TimedQueuePool,
+        pool_size=conf.db_pool_size,
+        max_overflow=conf.db_max_overflow,
+        pool_pre_ping=conf.db_pool_pre_ping,
+        pool_recycle=conf.db_pool_recycle,
+        pool_timeout=conf.db_pool_timeout,
+        connect_args={
+            "timeout": conf.db_connect_timeout,
+            "command_timeout": conf.db_command_timeout,
+            "statement_cache_size": conf.db_statement_cache_size,
+        },
+    )
+
+
+engine = create_engine(SQL_ALCHEMY_URL_PROD)
+# Without POSTGRES_REPLICA_ENDPOINT reads share the primary engine
+replica_engine = create_engine(SQL_ALCHEMY_URL_REPLICA) if conf.db_replica_endpoint else engine
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+replica_session = sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+
 
+def create_redis_pool() -> redis.BlockingConnectionPool:
+    # Blocking pool: when every connection is busy callers wait up to redis_pool_timeout instead of failing at once
+    return redis.BlockingConnectionPool(
+        host=conf.redis_endpoint_prod,
+        db=0,
+        max_connections=conf.redis_max_connections,
+        timeout=conf.redis_pool_timeout,
+        socket_timeout=conf.redis_socket_timeout,
+        socket_connect_timeout=conf.redis_socket_connect_timeout,
+        health_check_interval=conf.redis_health_check_interval,
+    )
 
-async def get_redis():
-    return redis.Redis(host=conf.redis_endpoint_prod, db=0)
 
+redis_client = None
 
 
+async def get_redis() -> redis.Redis:
+    # One pooled client for the whole process, opened by the app lifespan; commands and scheduler jobs
+    # running outside it get the client created on first use. Callers must not close it.
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis(connection_pool=create_redis_pool())
+    return redis_client
 
-async def get_db():
+
+async def close_redis():
+    global redis_client
+    if redis_client is not None:
+        client, redis_client = redis_client, None
+        await client.aclose()
+        await client.connection_pool.disconnect()
+
+
+def redis_pool_metrics() -> dict:
+    if redis_client is None:
+        return {"max_connections": conf.redis_max_connections, "created": 0, "in_use": 0, "idle": 0}
+    pool = redis_client.connection_pool
+    in_use = len(pool._in_use_connections)
+    idle = len(pool._available_connections)
+    return {
+        "max_connections": pool.max_connections,
+        "created": in_use + idle,
+        "in_use": in_use,
+        "idle": idle,
+    }
+
+
+def run_after_commit(session: AsyncSession, callback):
+    # Queues an async callback for get_db to await once the request transaction has committed,
+    # it is dropped if the transaction rolls back
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def commit_request(db: AsyncSession):
+    # Commits the request transaction, then awaits the callbacks queued with run_after_commit exactly once
+    await db.commit()
+    for callback in db.info.pop("after_commit", []):
+        await callback()
+
+
+async def get_db(request: Request):
+    # One session and one transaction per request: services built from this session share it.
+    # It connects to the primary on first use, so a request served from the replica never checks out
+    # a primary connection.
+    # UnitOfWorkRoute commits it before the response is sent; the teardown here, which FastAPI runs
+    # after the response, only commits what a route outside UnitOfWorkRoute left open and rolls back if it raised.
     async with async_session() as db:
+        request.state.db = db
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+        await commit_request(db)
+
+
+class UnitOfWorkRoute(APIRoute):
+    # The request transaction is committed once the endpoint has returned and before its response goes out,
+    # so a failed commit becomes a 500 instead of a sent 2xx, and a client's next request, as well as the
+    # after-commit callbacks (cache invalidation), always see the committed data.
+    # Both sessions are then closed: a streamed export would otherwise hold their connections until the
+    # last chunk is sent. A body that still reads through them just checks out a new connection.
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            response = await handler(request)
+            db = getattr(request.state, "db", None)
+            if db is not None:
+                await commit_request(db)
+                await db.close()
+            replica = getattr(request.state, "replica_db", None)
+            if replica is not None:
+                await replica.close()
+            return response
+
+        return route_handler
+
+
+async def get_replica_db(request: Request):
+    # Read-only session for the request, it connects lazily on the first replica read.
+    # Without a replica there is nothing to yield, repositories then read through get_db's session.
+    if replica_engine is engine:
+        yield None
+        return
+    async with replica_session() as db:
+        request.state.replica_db = db
         yield db
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, ARRAY, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -46,6 +46,10 @@ class Company(Base):
 
 class UsersCompaniesActions(Base):
     __tablename__ = "actions"
+    __table_args__ = (
+        Index("ix_actions_user_company_action", "user_id", "company_id", "action"),
+        Index("ix_actions_company_action_id", "company_id", "action", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)
@@ -54,6 +58,9 @@ class UsersCompaniesActions(Base):
 
 class CompanyMembers(Base):
     __tablename__ = "members"
+    __table_args__ = (
+        Index("ix_members_company_user", "company_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)
@@ -62,6 +69,9 @@ class CompanyMembers(Base):
 
 class Quiz(Base):
     __tablename__ = "quizzes"
+    __table_args__ = (
+        Index("ix_quizzes_company_id", "quiz_company_id", "id"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     quiz_name = Column(String(255), nullable=False)
     quiz_title = Column(String(255))
@@ -75,6 +85,9 @@ class Quiz(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_quiz_id", "question_quiz_id", "id"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     question_text = Column(String, nullable=False)
     question_answers = Column(ARRAY(String), nullable=False)
@@ -88,6 +101,12 @@ class Question(Base):
 
 class Result(Base):
     __tablename__ = "results"
+    __table_args__ = (
+        Index("ix_results_user_company_created", "result_user_id", "result_company_id", "created_at"),
+        Index("ix_results_user_quiz_created", "result_user_id", "result_quiz_id", "created_at"),
+        Index("ix_results_quiz_created", "result_quiz_id", "created_at"),
+        Index("ix_results_created_at_brin", "created_at", postgresql_using="brin"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     result_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -98,8 +117,25 @@ class Result(Base):
     result_total_count = Column(Integer)
 
 
+class ResultRollup(Base):
+    # Running totals of results per (user, company, quiz), kept in step with results by ResultsService.add_results
+    __tablename__ = "results_rollup"
+
+    result_user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    result_company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+    result_quiz_id = Column(Integer, primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    result_right_count = Column(Integer, default=0, nullable=False)
+    result_total_count = Column(Integer, default=0, nullable=False)
+    first_attempt_at = Column(DateTime, nullable=False)
+    last_attempt_at = Column(DateTime, nullable=False)
+
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_is_read", "user_id", "is_read"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,17 +1,32 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from app.conf.config import conf
+from app.db.db import get_redis, close_redis
 from app.routes import health, users, auth, companies, quizzes, results, notifications, analitics
-from app.services.schedule_event import schedule_notification_sender
+from app.services.export_jobs import export_job_service
+from app.services.schedule_event import schedule_notification_sender, schedule_dashboard_snapshots
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await get_redis()
+    yield
+    await export_job_service.shutdown()
+    await close_redis()
+
 
-app = FastAPI(title="Meduzzen_internship_fastAPI")
+app = FastAPI(title="Meduzzen_internship_fastAPI", lifespan=lifespan)
 
 scheduler = AsyncIOScheduler()
 
 scheduler.add_job(schedule_notification_sender, 'cron', hour=0, minute=0)
+scheduler.add_job(schedule_dashboard_snapshots, 'cron', hour=1, minute=0)
 
 scheduler.start()   
 app.add_middleware(
@@ -20,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(health.route)
@@ -1,16 +1,23 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db import get_db, get_replica_db
 from app.repository.actions import ActionsRepository
 from app.repository.companies import CompanyRepository
 from app.repository.company_members import CompanyMembersRepository
 from app.repository.notifications import NotificationsRepository
 from app.repository.questions import QuestionsRepository
 from app.repository.quizzes import QuizzesRepository
+from app.repository.results import ResultsRepository
 from app.repository.users import UsersRepository
 from app.services.actions import ActionService
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
+from app.services.dashboard import DashboardService
 from app.services.notifications import NotificationsService
 from app.services.questions import QuestionService
 from app.services.quizzes import QuizService
+from app.services.results import ResultsService
 from app.services.users import UsersService
 
 
@@ -18,28 +25,35 @@ def users_service():
     return UsersService(UsersRepository)
 
 
-def company_service():
-    return CompanyService(CompanyRepository)
+def company_service(db: AsyncSession = Depends(get_db), replica: AsyncSession = Depends(get_replica_db)):
+    return CompanyService(CompanyRepository, db, replica)
 
 
 def action_service():
     return ActionService(ActionsRepository)
 
 
-def comp_memb_service():
-    return CompanyMembersService(CompanyMembersRepository)
+def comp_memb_service(db: AsyncSession = Depends(get_db), replica: AsyncSession = Depends(get_replica_db)):
+    return CompanyMembersService(CompanyMembersRepository, db, replica)
+
 
+def quizzes_service(db: AsyncSession = Depends(get_db), replica: AsyncSession = Depends(get_replica_db)):
+    return QuizService(QuizzesRepository, db, replica)
 
-def quizzes_service():
-    return QuizService(QuizzesRepository)
 
+def questions_service(db: AsyncSession = Depends(get_db), replica: AsyncSession = Depends(get_replica_db)):
+    return QuestionService(QuestionsRepository, db, replica)
 
-def questions_service():
-    return QuestionService(QuestionsRepository)
 
-def results_service():
-    return ResultsService(ResultsRepository)
+def results_service(db: AsyncSession = Depends(get_db), replica: AsyncSession = Depends(get_replica_db)):
+    return ResultsService(ResultsRepository, db, replica)
+
 
 def notifications_service():
     return NotificationsService(NotificationsRepository)
 
+
+def dashboard_service(results: ResultsService = Depends(results_service),
+                      quizzes: QuizService = Depends(quizzes_service),
+                      members: CompanyMembersService = Depends(comp_memb_service)):
+    return DashboardService(results, quizzes, members)
@@ -0,0 +1,55 @@
+from sqlalchemy import insert, select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models import Result, ResultRollup
+from app.utils.repository import SQLAlchemyRepository
+
+ROLLUP_KEY = ["result_user_id", "result_company_id", "result_quiz_id"]
+
+
+class ResultsRollupRepository(SQLAlchemyRepository):
+    model = ResultRollup
+
+    async def add_attempt(self, data: dict) -> None:
+        # data is a results row (keys, counts and created_at), folded into its rollup row with one upsert
+        values = {key: data[key] for key in ROLLUP_KEY}
+        statement = pg_insert(self.model).values(
+            **values,
+            attempts=1,
+            result_right_count=data["result_right_count"],
+            result_total_count=data["result_total_count"],
+            first_attempt_at=data["created_at"],
+            last_attempt_at=data["created_at"],
+        )
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(index_elements=ROLLUP_KEY, set_={
+            "attempts": self.model.attempts + 1,
+            "result_right_count": self.model.result_right_count + excluded.result_right_count,
+            "result_total_count": self.model.result_total_count + excluded.result_total_count,
+            "first_attempt_at": func.least(self.model.first_attempt_at, excluded.first_attempt_at),
+            "last_attempt_at": func.greatest(self.model.last_attempt_at, excluded.last_attempt_at),
+        })
+        async with self._session() as session:
+            await session.execute(statement)
+            await self._commit(session)
+
+    async def rebuild(self) -> int:
+        # Recomputes every rollup row from results in one transaction. The lock makes concurrent add_attempt
+        # upserts wait until the rebuild commits, so an attempt is counted either by the rebuild or by its
+        # own upsert but never twice. Results without a quiz can't be keyed and are skipped.
+        rollup = select(
+            *(getattr(Result, key) for key in ROLLUP_KEY),
+            func.count(Result.id),
+            func.coalesce(func.sum(Result.result_right_count), 0),
+            func.coalesce(func.sum(Result.result_total_count), 0),
+            func.min(Result.created_at),
+            func.max(Result.created_at),
+        ).where(Result.result_quiz_id.is_not(None)).group_by(*(getattr(Result, key) for key in ROLLUP_KEY))
+        columns = ROLLUP_KEY + ["attempts", "result_right_count", "result_total_count",
+                                "first_attempt_at", "last_attempt_at"]
+        async with self._session() as session:
+            await session.execute(text(f"LOCK TABLE {self.model.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+            await session.execute(delete(self.model))
+            res = await session.execute(insert(self.model).from_select(columns, rollup))
+            await self._commit(session)
+            return res.rowcount
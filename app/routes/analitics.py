@@ -1,29 +1,80 @@
-from fastapi import APIRouter, Depends
+from datetime import date, datetime
+from typing import List, Optional
 
-from app.repository.dependencies import results_service, quizzes_service, company_service, comp_memb_service
+from fastapi import APIRouter, Depends, Query, Response
+
+from app.db.db import UnitOfWorkRoute
+from app.repository.dependencies import results_service, quizzes_service, company_service, comp_memb_service, \
+    dashboard_service
+from app.schemas.results_schemas import TimeBucket, ScoreSeriesPoint, LeaderboardEntry
+from app.services.analytics_cache import analytics_cache
 from app.services.auth import auth_service
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
+from app.services.dashboard import DashboardService
+from app.services.leaderboards import leaderboard_service
+from app.services.participants import participants_service
 from app.services.quizzes import QuizService
 from app.services.results import ResultsService
+from app.services.results_stats import DEFAULT_HISTOGRAM_BINS, DEFAULT_PERCENTILES
+from app.services.score_sketch import score_sketch_service
+from app.utils.pagination import set_next_cursor
+from app.utils.streaming import ndjson_response
+
+route = APIRouter(prefix="/analitics", tags=["Analitics"], route_class=UnitOfWorkRoute)
+
+
+async def _quizzes_analytics(endpoint: str,
+                            analytics,
+                            response: Response,
+                            limit: int,
+                            after: Optional[str],
+                            stream: bool,
+                            results_srvice: ResultsService,
+                            quizzes_service: QuizService):
+    # stream=true writes every quiz as NDJSON, reading quizzes through a server-side cursor limit rows at a time;
+    # otherwise one keyset page of limit quizzes is returned with the next page cursor in X-Next-Cursor
+    if stream:
+        return ndjson_response(results_srvice.stream_per_batch(quizzes_service.stream_all_quizzes(limit), analytics))
 
-route = APIRouter(prefix="/analitics", tags=["Analitics"])
+    async def compute():
+        quizzes, next_cursor = await quizzes_service.get_all_quizzes_page(limit, after)
+        return {"items": await analytics(quizzes), "next_cursor": next_cursor}
+
+    page = await analytics_cache.get_or_compute(endpoint, compute, params={"limit": limit, "after": after})
+    set_next_cursor(response, page["next_cursor"])
+    return page["items"]
 
 
 @route.get("/get_last_attempt_times_for_all_quizzes")
-async def get_last_attempt_times_for_all_quizzes(results_srvice: ResultsService = Depends(results_service),
+async def get_last_attempt_times_for_all_quizzes(response: Response,
+                                                 limit: int = Query(100, ge=1, le=1000),
+                                                 after: Optional[str] = None,
+                                                 stream: bool = False,
+                                                 results_srvice: ResultsService = Depends(results_service),
                                                  quizzes_service: QuizService = Depends(quizzes_service)
                                                  ):
-    quizzes = await quizzes_service.get_all_quizzes()
-    return await results_srvice.get_last_attempt_times_for_all_quizzes(quizzes)
+    return await _quizzes_analytics("last_attempt_times_for_all_quizzes",
+                                   results_srvice.get_last_attempt_times_for_all_quizzes,
+                                   response, limit, after, stream, results_srvice, quizzes_service)
 
 
 @route.get("/get_average_quiz_by_time")
-async def get_average_quiz_by_time(results_srvice: ResultsService = Depends(results_service),
+async def get_average_quiz_by_time(response: Response,
+                                   limit: int = Query(100, ge=1, le=1000),
+                                   after: Optional[str] = None,
+                                   stream: bool = False,
+                                   results_srvice: ResultsService = Depends(results_service),
                                    quizzes_service: QuizService = Depends(quizzes_service)
                                    ):
-    quizzes = await quizzes_service.get_all_quizzes()
-    return await results_srvice.get_average_quiz_by_time(quizzes)
+    return await _quizzes_analytics("average_quiz_by_time",
+                                   results_srvice.get_average_quiz_by_time,
+                                   response, limit, after, stream, results_srvice, quizzes_service)
+
+
+def _user_tags(rows: list) -> dict:
+    # Per-user values aggregate results from all of the user's companies, so a submit anywhere invalidates them
+    return {"user": [row["user_id"] for row in rows]}
 
 
 @route.get("/get_last_attempt_times_for_all_users/{company_id}")
@@ -35,8 +86,15 @@ async def get_last_attempt_times_for_all_users(company_id: int,
                                                ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    users = await comp_memb_service.get_company_members(company.id)
-    return await results_srvice.get_last_attempt_times_for_all_users(users, current_user.id, member, company)
+    # access is checked before the cache so a hit can't bypass it
+    await results_srvice.valid_result_access(current_user.id, member, company)
+
+    async def compute():
+        users = await comp_memb_service.get_member_user_ids(company.id)
+        return await results_srvice.get_last_attempt_times_for_all_users(users, current_user.id, member, company)
+
+    return await analytics_cache.get_or_compute("last_attempt_times_for_all_users", compute,
+                                                scope={"company": company.id}, tags_from=_user_tags)
 
 
 @route.get("/get_average_users_by_time/{company_id}")
@@ -48,8 +106,14 @@ async def get_average_users_by_time(company_id: int,
                                     ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    users = await comp_memb_service.get_company_members(company.id)
-    return await results_srvice.get_average_users_by_time(users, current_user.id, member, company)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+
+    async def compute():
+        users = await comp_memb_service.get_member_user_ids(company.id)
+        return await results_srvice.get_average_users_by_time(users, current_user.id, member, company)
+
+    return await analytics_cache.get_or_compute("average_users_by_time", compute,
+                                                scope={"company": company.id}, tags_from=_user_tags)
 
 
 @route.get("/get_average_quizz_for_user_in_company_by_time/{company_id}/{user_id}")
@@ -64,9 +128,216 @@ async def get_average_quizz_for_user_in_company_by_time(user_id: int,
                                                         ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(user_id, company_id)
-    quizzes = await quizzes_service.get_all_quizzes()
-    return await results_srvice.get_average_quizz_for_user_in_company_by_time(user_id,
-                                                                              quizzes,
-                                                                              current_user.id,
-                                                                              member,
-                                                                              company)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+
+    async def compute():
+        quizzes = await quizzes_service.get_all_quizzes()
+        return await results_srvice.get_average_quizz_for_user_in_company_by_time(user_id,
+                                                                                  quizzes,
+                                                                                  current_user.id,
+                                                                                  member,
+                                                                                  company)
+
+    return await analytics_cache.get_or_compute("average_quizz_for_user_in_company_by_time", compute,
+                                                scope={"company": company.id, "user": user_id})
+
+
+@route.get("/score_series/{company_id}", response_model=List[ScoreSeriesPoint])
+async def get_company_score_series(company_id: int,
+                                   date_from: datetime,
+                                   date_to: datetime,
+                                   bucket: TimeBucket = TimeBucket.day,
+                                   quiz_id: Optional[int] = None,
+                                   user_id: Optional[int] = None,
+                                   results_srvice: ResultsService = Depends(results_service),
+                                   comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                   companies_service: CompanyService = Depends(company_service),
+                                   current_user: dict = Depends(auth_service.get_current_user),
+                                   ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+
+    async def compute():
+        return await results_srvice.get_company_score_series(company, member, current_user.id, bucket.value,
+                                                             date_from, date_to, quiz_id, user_id)
+
+    return await analytics_cache.get_or_compute("score_series", compute,
+                                                scope={"company": company.id},
+                                                params={"date_from": date_from, "date_to": date_to,
+                                                        "bucket": bucket.value, "quiz_id": quiz_id,
+                                                        "user_id": user_id})
+
+
+@route.get("/my_score_series", response_model=List[ScoreSeriesPoint])
+async def get_my_score_series(date_from: datetime,
+                              date_to: datetime,
+                              bucket: TimeBucket = TimeBucket.day,
+                              quiz_id: Optional[int] = None,
+                              results_srvice: ResultsService = Depends(results_service),
+                              current_user: dict = Depends(auth_service.get_current_user),
+                              ):
+    filter_by = {"result_user_id": current_user.id}
+    if quiz_id is not None:
+        filter_by["result_quiz_id"] = quiz_id
+
+    async def compute():
+        return await results_srvice.get_score_series(filter_by, bucket.value, date_from, date_to)
+
+    return await analytics_cache.get_or_compute("my_score_series", compute,
+                                                scope={"user": current_user.id},
+                                                params={"date_from": date_from, "date_to": date_to,
+                                                        "bucket": bucket.value, "quiz_id": quiz_id})
+
+
+@route.get("/leaderboard/{company_id}", response_model=List[LeaderboardEntry])
+async def get_leaderboard_top(company_id: int,
+                              limit: int = Query(10, ge=1, le=100),
+                              quiz_id: Optional[int] = None,
+                              results_srvice: ResultsService = Depends(results_service),
+                              comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                              companies_service: CompanyService = Depends(company_service),
+                              quizzes_service: QuizService = Depends(quizzes_service),
+                              current_user: dict = Depends(auth_service.get_current_user),
+                              ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_rating_access(member, company, current_user.id)
+    if quiz_id is not None:
+        quiz_id = (await quizzes_service.get_company_quiz(quiz_id, company.id)).id
+    return await leaderboard_service.get_top(company.id, limit, quiz_id)
+
+
+@route.get("/leaderboard/{company_id}/rank/{user_id}", response_model=LeaderboardEntry)
+async def get_leaderboard_rank(company_id: int,
+                               user_id: int,
+                               quiz_id: Optional[int] = None,
+                               results_srvice: ResultsService = Depends(results_service),
+                               comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                               companies_service: CompanyService = Depends(company_service),
+                               quizzes_service: QuizService = Depends(quizzes_service),
+                               current_user: dict = Depends(auth_service.get_current_user),
+                               ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_rating_access(member, company, current_user.id)
+    if quiz_id is not None:
+        quiz_id = (await quizzes_service.get_company_quiz(quiz_id, company.id)).id
+    return await leaderboard_service.get_rank(company.id, user_id, quiz_id)
+
+
+@route.get("/leaderboard/{company_id}/around/{user_id}", response_model=List[LeaderboardEntry])
+async def get_leaderboard_around(company_id: int,
+                                 user_id: int,
+                                 radius: int = Query(5, ge=0, le=50),
+                                 quiz_id: Optional[int] = None,
+                                 results_srvice: ResultsService = Depends(results_service),
+                                 comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                 companies_service: CompanyService = Depends(company_service),
+                                 quizzes_service: QuizService = Depends(quizzes_service),
+                                 current_user: dict = Depends(auth_service.get_current_user),
+                                 ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_rating_access(member, company, current_user.id)
+    if quiz_id is not None:
+        quiz_id = (await quizzes_service.get_company_quiz(quiz_id, company.id)).id
+    return await leaderboard_service.get_around(company.id, user_id, radius, quiz_id)
+
+
+@route.get("/distribution/{company_id}")
+async def get_score_distribution(company_id: int,
+                                 quiz_id: Optional[int] = None,
+                                 percentiles: List[float] = Query(list(DEFAULT_PERCENTILES)),
+                                 bins: int = Query(DEFAULT_HISTOGRAM_BINS, ge=1, le=100),
+                                 results_srvice: ResultsService = Depends(results_service),
+                                 comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                 companies_service: CompanyService = Depends(company_service),
+                                 current_user: dict = Depends(auth_service.get_current_user),
+                                 ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+
+    async def compute():
+        return await results_srvice.get_score_distribution(company, member, current_user.id, quiz_id,
+                                                           percentiles, bins)
+
+    return await analytics_cache.get_or_compute("score_distribution", compute,
+                                                scope={"company": company.id},
+                                                params={"quiz_id": quiz_id, "percentiles": percentiles,
+                                                        "bins": bins})
+
+
+@route.get("/score_percentiles/{company_id}")
+async def get_score_percentiles(company_id: int,
+                                quiz_id: Optional[int] = None,
+                                percentiles: List[float] = Query(list(DEFAULT_PERCENTILES)),
+                                results_srvice: ResultsService = Depends(results_service),
+                                comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                companies_service: CompanyService = Depends(company_service),
+                                quizzes_service: QuizService = Depends(quizzes_service),
+                                current_user: dict = Depends(auth_service.get_current_user),
+                                ):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+    await results_srvice.valid_percentiles(percentiles)
+    if quiz_id is None:
+        return await score_sketch_service.get_percentiles(percentiles, company_ids=[company.id])
+    quiz = await quizzes_service.get_company_quiz(quiz_id, company.id)
+    return await score_sketch_service.get_percentiles(percentiles, quiz_id=quiz.id)
+
+
+@route.get("/score_percentiles")
+async def get_merged_score_percentiles(company_ids: List[int] = Query(..., max_length=50),
+                                       percentiles: List[float] = Query(list(DEFAULT_PERCENTILES)),
+                                       results_srvice: ResultsService = Depends(results_service),
+                                       comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                       companies_service: CompanyService = Depends(company_service),
+                                       current_user: dict = Depends(auth_service.get_current_user),
+                                       ):
+    # The companies' sketches are merged, so percentiles are over all their attempts together
+    for company_id in set(company_ids):
+        company = await companies_service.get_company_by_id(company_id, current_user.id)
+        member = await comp_memb_service.get_member(current_user.id, company_id)
+        await results_srvice.valid_result_access(current_user.id, member, company)
+    await results_srvice.valid_percentiles(percentiles)
+    return await score_sketch_service.get_percentiles(percentiles, company_ids=sorted(set(company_ids)))
+
+
+@route.get("/unique_participants/{company_id}")
+async def get_unique_participants(company_id: int,
+                                  date_from: date,
+                                  date_to: date,
+                                  quiz_id: Optional[int] = None,
+                                  results_srvice: ResultsService = Depends(results_service),
+                                  comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                  companies_service: CompanyService = Depends(company_service),
+                                  quizzes_service: QuizService = Depends(quizzes_service),
+                                  current_user: dict = Depends(auth_service.get_current_user),
+                                  ):
+    # Approximate distinct users who submitted in [date_from, date_to] (UTC days, both inclusive)
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+    if quiz_id is None:
+        return await participants_service.count_unique(date_from, date_to, company_id=company.id)
+    quiz = await quizzes_service.get_company_quiz(quiz_id, company.id)
+    return await participants_service.count_unique(date_from, date_to, quiz_id=quiz.id)
+
+
+@route.get("/dashboard/{company_id}")
+async def get_company_dashboard(company_id: int,
+                                refresh: bool = False,
+                                dashboard: DashboardService = Depends(dashboard_service),
+                                results_srvice: ResultsService = Depends(results_service),
+                                comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                companies_service: CompanyService = Depends(company_service),
+                                current_user: dict = Depends(auth_service.get_current_user),
+                                ):
+    # Served from the nightly snapshot (see "as_of"), refresh=true rebuilds it now
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await results_srvice.valid_result_access(current_user.id, member, company)
+    return await dashboard.get_dashboard(company, refresh)
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import users_service
 from app.schemas.user_schemas import UserBase
 from app.services.auth import auth_service
 from app.services.users import UsersService
 
-route = APIRouter(prefix="/auth", tags=["Auth"])
+route = APIRouter(prefix="/auth", tags=["Auth"], route_class=UnitOfWorkRoute)
 
 
 @route.get('/me', response_model=UserBase)
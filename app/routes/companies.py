@@ -1,9 +1,10 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from starlette import status
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import company_service, action_service, comp_memb_service, users_service
 from app.schemas.actions_schemas import ActionBase
 from app.schemas.company_memb_schemas import MemberBase
@@ -13,8 +14,9 @@ from app.services.auth import auth_service
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
 from app.services.users import UsersService
+from app.utils.pagination import set_next_cursor
 
-route = APIRouter(prefix="/companies", tags=["Companies"])
+route = APIRouter(prefix="/companies", tags=["Companies"], route_class=UnitOfWorkRoute)
 
 
 @route.post("/CreateCompany", status_code=status.HTTP_201_CREATED)
@@ -28,18 +30,24 @@ async def create_company(body: CompanyCreate,
 
 @route.get("/", response_model=List[CompanyDetail])
 async def get_companies(
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         companies_service: CompanyService = Depends(company_service),
         current_user: dict = Depends(auth_service.get_current_user)
 ):
-    return await companies_service.get_companies(limit, offset, current_user.id)
+    if offset and after is None:
+        return await companies_service.get_companies(limit, offset, current_user.id)
+    companies, next_cursor = await companies_service.get_companies_page(limit, after, current_user.id)
+    set_next_cursor(response, next_cursor)
+    return companies
 
 
 @route.get("/company_members/{company_id}", response_model=List[MemberBase])
 async def get_company_members(
         company_id: int,
-        limit: int = Query(10, le=300),
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
         companies_service: CompanyService = Depends(company_service),
         current_user: dict = Depends(auth_service.get_current_user),
@@ -52,7 +60,7 @@ async def get_company_members(
 @route.get("/company_admins/{company_id}", response_model=List[MemberBase])
 async def get_company_admins(
         company_id: int,
-        limit: int = Query(10, le=300),
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
         companies_service: CompanyService = Depends(company_service),
         current_user: dict = Depends(auth_service.get_current_user),
@@ -72,27 +80,41 @@ async def read_company(company_id: int,
 @route.get("/company_invitations/{company_id}", response_model=List[ActionBase])
 async def get_company_invitations(
         company_id: int,
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         actions_service: ActionService = Depends(action_service),
         current_user: dict = Depends(auth_service.get_current_user),
         companies_service: CompanyService = Depends(company_service)
 ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
-    return await actions_service.get_company_invitations(company, limit, offset, current_user.id)
+    if offset and after is None:
+        return await actions_service.get_company_invitations(company, limit, offset, current_user.id)
+    actions, next_cursor = await actions_service.get_company_actions_page(company, "invitation_sent", limit, after,
+                                                                          current_user.id)
+    set_next_cursor(response, next_cursor)
+    return actions
 
 
 @route.get("/company_requests/{company_id}", response_model=List[ActionBase])
 async def get_company_requests(
         company_id: int,
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         actions_service: ActionService = Depends(action_service),
         current_user: dict = Depends(auth_service.get_current_user),
         companies_service: CompanyService = Depends(company_service)
 ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
-    return await actions_service.get_company_requests(company, limit, offset, current_user.id)
+    if offset and after is None:
+        return await actions_service.get_company_requests(company, limit, offset, current_user.id)
+    actions, next_cursor = await actions_service.get_company_actions_page(company, "request_sent", limit, after,
+                                                                          current_user.id)
+    set_next_cursor(response, next_cursor)
+    return actions
 
 
 @route.put("/{company_id}", response_model=CompanyUpdate)
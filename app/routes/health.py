@@ -6,9 +6,11 @@ from redis.asyncio import Redis
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.db import get_db, get_redis
+from app.db.db import get_db, get_redis, engine, replica_engine, redis_pool_metrics, \
+    UnitOfWorkRoute
+from app.services.analytics_cache import analytics_cache
 
-route = APIRouter(tags=["healthcheck"])
+route = APIRouter(tags=["healthcheck"], route_class=UnitOfWorkRoute)
 
 
 @route.get("/")
@@ -31,6 +33,14 @@ async def check_db_connection(db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error connecting to the database")
 
 
+@route.get("/check_db_pool")
+async def check_db_pool():
+    stats = engine.pool.snapshot()
+    # Without a replica endpoint reads go through the primary pool, its numbers are not repeated
+    stats["replica"] = replica_engine.pool.snapshot() if replica_engine is not engine else {"shared_with_primary": True}
+    return {"status_code": 200, "detail": "ok", "result": stats}
+
+
 @route.get("/check_redis")
 async def check_redis_connection(redis: Redis = Depends(get_redis)):
     try:
@@ -40,3 +50,13 @@ async def check_redis_connection(redis: Redis = Depends(get_redis)):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error connecting to the database")
+
+
+@route.get("/check_redis_pool")
+async def check_redis_pool():
+    return {"status_code": 200, "detail": "ok", "result": redis_pool_metrics()}
+
+
+@route.get("/check_analytics_cache")
+async def check_analytics_cache():
+    return {"status_code": 200, "detail": "ok", "result": analytics_cache.snapshot()}
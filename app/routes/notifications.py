@@ -3,13 +3,14 @@ from typing import List
 
 from fastapi import APIRouter, Depends
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import notifications_service
 from app.schemas.notifications_schemas import NotificationsDetail
 from app.services.auth import auth_service
 from app.services.notifications import NotificationsService
 from app.services.schedule_event import schedule_notification_sender
 
-route = APIRouter(prefix="/notifications", tags=["Notifications"])
+route = APIRouter(prefix="/notifications", tags=["Notifications"], route_class=UnitOfWorkRoute)
 
 
 @route.get("/notifications/{user_id}", response_model=List[NotificationsDetail])
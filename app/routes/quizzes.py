@@ -1,23 +1,29 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query, UploadFile
+from fastapi import APIRouter, Depends, Query, UploadFile, Response
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import company_service, quizzes_service, comp_memb_service, questions_service, \
     results_service, notifications_service
 from app.schemas.questions_schemas import QuestionCreateModel, QuestionUpdateModel, QuestionDetail
 from app.schemas.quizzes_schemas import QuizCreateModel, QuizDetail, QuizUpdateModel
+from app.services.analytics_cache import analytics_cache
 from app.services.auth import auth_service
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
 from app.services.excel_actions import import_quiz_from_excel, update_quiz_from_excel
+from app.services.leaderboards import leaderboard_service
 from app.services.notifications import NotificationsService
+from app.services.participants import participants_service
 from app.services.questions import QuestionService
 from app.services.quizzes import QuizService
 from app.services.redis import redis_service
 from app.services.results import ResultsService
+from app.services.score_sketch import score_sketch_service
+from app.utils.pagination import set_next_cursor
 
-route = APIRouter(prefix="/quizzes", tags=["Quizzes"])
+route = APIRouter(prefix="/quizzes", tags=["Quizzes"], route_class=UnitOfWorkRoute)
 
 
 @route.post("/createQuiz")
@@ -31,7 +37,7 @@ async def create_quiz(company_id: int,
                       ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    members = await comp_memb_service.get_all_members(company_id)
+    members = await comp_memb_service.get_member_user_ids(company_id)
     quiz = await quizzes_service.create_quiz(company, body, member, current_user.id)
     await notification_service.add_notifications_about_create_quizz(members, quiz)
     logging.info(f"Quiz:{quiz} was created")
@@ -99,8 +105,19 @@ async def submit_quizz(company_id: int,
     results = await quizzes_service.quizz_submit(question, body, member, company, current_user.id)
     await results_srvice.add_results(quiz_id, company.id, current_user.id, results["correct_answers"],
                                      results["total_answers"])
+    await results_srvice.after_commit(lambda: analytics_cache.invalidate(company_id=company.id,
+                                                                         quiz_id=quiz.id,
+                                                                         user_id=current_user.id))
     await redis_service.store_results(quiz.id, company.id, current_user.id, results["correct_answers"],
                                       results["total_answers"])
+    await results_srvice.after_commit(lambda: leaderboard_service.record_result(company.id, quiz.id, current_user.id,
+                                                                                results["correct_answers"],
+                                                                                results["total_answers"]))
+    await results_srvice.after_commit(lambda: score_sketch_service.record_result(company.id, quiz.id,
+                                                                                  results["correct_answers"],
+                                                                                  results["total_answers"]))
+    await results_srvice.after_commit(lambda: participants_service.record_participant(company.id, quiz.id,
+                                                                                       current_user.id))
     logging.info(f"Total score for user {current_user.id} is {results}")
     return f"Total score for user {current_user.id} is {results}"
 
@@ -108,21 +125,27 @@ async def submit_quizz(company_id: int,
 @route.get("/Quizzes", response_model=List[QuizDetail])
 async def get_quizzes(
         company_id: int,
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         companies_service: CompanyService = Depends(company_service),
         quizzes_service: QuizService = Depends(quizzes_service),
         current_user: dict = Depends(auth_service.get_current_user)
 ):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
-    return await quizzes_service.get_quizzes(company.id, limit, offset)
+    if offset and after is None:
+        return await quizzes_service.get_quizzes(company.id, limit, offset)
+    quizzes, next_cursor = await quizzes_service.get_quizzes_page(company.id, limit, after)
+    set_next_cursor(response, next_cursor)
+    return quizzes
 
 
 @route.get("/Questions", response_model=List[QuestionDetail])
 async def get_questions(
         company_id: int,
         quiz_id: int,
-        limit: int = Query(10, le=300),
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
         companies_service: CompanyService = Depends(company_service),
         questions_service: QuestionService = Depends(questions_service),
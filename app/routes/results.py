@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends
+from starlette import status
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import results_service, users_service, company_service, comp_memb_service
-from app.schemas.results_schemas import GetResultsByFormat, AverageSystemModel, AverageCompanyModel
+from app.schemas.results_schemas import GetResultsByFormat, AverageSystemModel, AverageCompanyModel, ExportJobModel
+from app.services.analytics_cache import analytics_cache
 from app.services.auth import auth_service
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
-from app.services.redis import redis_service
+from app.services.export_jobs import export_job_service
+from app.services.redis import redis_service, RESULT_FIELDS
 from app.services.results import ResultsService
 from app.services.users import UsersService
+from app.utils.streaming import export_response, export_stream_response
 
-route = APIRouter(prefix="/results", tags=["Results"])
+route = APIRouter(prefix="/results", tags=["Results"], route_class=UnitOfWorkRoute)
 
 
 @route.get("/{user_id}/system-average-rating", response_model=AverageSystemModel)
@@ -17,7 +22,10 @@ async def get_system_average_rating(user_id: int,
                                     users_service: UsersService = Depends(users_service),
                                     results_srvice: ResultsService = Depends(results_service)):
     user = await users_service.get_user_by_id(user_id)
-    return AverageSystemModel(system_average_rating=await results_srvice.get_system_average_rating(user.id))
+    rating = await analytics_cache.get_or_compute("system_average_rating",
+                                                  lambda: results_srvice.get_system_average_rating(user.id),
+                                                  scope={"user": user.id})
+    return AverageSystemModel(system_average_rating=rating)
 
 
 @route.get("/{company_id}/{user_id}/average-rating", response_model=AverageCompanyModel)
@@ -31,11 +39,13 @@ async def company_average_rating(company_id: int,
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
     user = await users_service.get_user_by_id(user_id)
-    return AverageCompanyModel(company_average_rating=await results_srvice.get_user_average_rating_in_company(user.id,
-                                                                                                              company.id,
-                                                                                                              member,
-                                                                                                              company,
-                                                                                                              current_user.id))
+    await results_srvice.valid_rating_access(member, company, current_user.id)
+    rating = await analytics_cache.get_or_compute(
+        "company_average_rating",
+        lambda: results_srvice.get_user_average_rating_in_company(user.id, company.id, member, company,
+                                                                  current_user.id),
+        scope={"company": company.id, "user": user.id})
+    return AverageCompanyModel(company_average_rating=rating)
 
 
 @route.post("/user_results/{user_id}")
@@ -43,7 +53,8 @@ async def get_user_results(user_id: int, upload_format: GetResultsByFormat,
                            users_service: UsersService = Depends(users_service),
                            current_user: dict = Depends(auth_service.get_current_user)):
     user = await users_service.get_user_by_id(user_id)
-    return await redis_service.get_user_results(user.id, current_user.id, upload_format.save_format)
+    batches = await redis_service.get_user_results(user.id, current_user.id)
+    return export_response(batches, upload_format.save_format, f"user_id_{user.id}", RESULT_FIELDS)
 
 
 @route.post("/user_company_results/{user_id}/{company_id}")
@@ -57,11 +68,9 @@ async def get_user_results_for_company(user_id: int,
     user = await users_service.get_user_by_id(user_id)
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    return await redis_service.get_user_results_for_company(user.id,
-                                                            current_user.id,
-                                                            member,
-                                                            company,
-                                                            upload_format.save_format)
+    batches = await redis_service.get_user_results_for_company(user.id, current_user.id, member, company)
+    return export_response(batches, upload_format.save_format, f"user_id_{user.id}_company_id_{company.id}",
+                           RESULT_FIELDS)
 
 
 @route.post("/all_company_results/{company_id}")
@@ -72,11 +81,46 @@ async def get_all_results_for_company(company_id: int,
                                       companies_service: CompanyService = Depends(company_service)):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    return await redis_service.get_all_results_for_company(company.id,
-                                                           current_user.id,
-                                                           member,
-                                                           company,
-                                                           upload_format.save_format)
+    batches = await redis_service.get_all_results_for_company(company.id, current_user.id, member, company)
+    return export_response(batches, upload_format.save_format, f"company_id_{company.id}", RESULT_FIELDS)
+
+
+@route.post("/all_company_results/{company_id}/jobs", response_model=ExportJobModel,
+            status_code=status.HTTP_202_ACCEPTED)
+async def submit_company_results_export(company_id: int,
+                                        upload_format: GetResultsByFormat,
+                                        current_user: dict = Depends(auth_service.get_current_user),
+                                        comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                                        companies_service: CompanyService = Depends(company_service)):
+    company = await companies_service.get_company_by_id(company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, company_id)
+    await export_job_service.valid_job_access(current_user.id, member, company)
+    return await export_job_service.submit(company.id, upload_format.save_format)
+
+
+@route.get("/export_jobs/{job_id}", response_model=ExportJobModel)
+async def get_export_job(job_id: str,
+                         current_user: dict = Depends(auth_service.get_current_user),
+                         comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                         companies_service: CompanyService = Depends(company_service)):
+    job = await export_job_service.get_job(job_id)
+    company = await companies_service.get_company_by_id(job.company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, job.company_id)
+    await export_job_service.valid_job_access(current_user.id, member, company)
+    return job
+
+
+@route.get("/export_jobs/{job_id}/download")
+async def download_export_job(job_id: str,
+                              current_user: dict = Depends(auth_service.get_current_user),
+                              comp_memb_service: CompanyMembersService = Depends(comp_memb_service),
+                              companies_service: CompanyService = Depends(company_service)):
+    job = await export_job_service.get_job(job_id)
+    company = await companies_service.get_company_by_id(job.company_id, current_user.id)
+    member = await comp_memb_service.get_member(current_user.id, job.company_id)
+    await export_job_service.valid_job_access(current_user.id, member, company)
+    chunks = await export_job_service.get_artifact(job)
+    return export_stream_response(chunks, job.save_format.value, f"company_id_{company.id}")
 
 
 @route.post("/quizz_company_results/{company_id}/{quizz_id}")
@@ -88,8 +132,5 @@ async def get_quiz_results_for_company(company_id: int,
                                        companies_service: CompanyService = Depends(company_service)):
     company = await companies_service.get_company_by_id(company_id, current_user.id)
     member = await comp_memb_service.get_member(current_user.id, company_id)
-    return await redis_service.get_quiz_results_for_company(quiz_id,
-                                                            current_user.id,
-                                                            member,
-                                                            company,
-                                                            upload_format.save_format)
+    batches = await redis_service.get_quiz_results_for_company(quiz_id, current_user.id, member, company)
+    return export_response(batches, upload_format.save_format, f"quiz_id_{quiz_id}", RESULT_FIELDS)
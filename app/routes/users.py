@@ -1,9 +1,10 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from starlette import status
 
+from app.db.db import UnitOfWorkRoute
 from app.repository.dependencies import users_service, action_service, company_service, comp_memb_service
 from app.schemas.actions_schemas import ActionBase
 from app.schemas.user_schemas import UserUpdate, SignUpRequestModel, UserDetail
@@ -12,8 +13,9 @@ from app.services.auth import auth_service
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
 from app.services.users import UsersService
+from app.utils.pagination import set_next_cursor
 
-route = APIRouter(prefix="/users", tags=["Users"])
+route = APIRouter(prefix="/users", tags=["Users"], route_class=UnitOfWorkRoute)
 
 
 @route.post("/SingUp", status_code=status.HTTP_201_CREATED)
@@ -27,11 +29,17 @@ async def SingUp(body: SignUpRequestModel,
 
 @route.get("/", response_model=List[UserDetail])
 async def get_users(
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         users_service: UsersService = Depends(users_service),
 ):
-    return await users_service.get_users(limit, offset)
+    if offset and after is None:
+        return await users_service.get_users(limit, offset)
+    users, next_cursor = await users_service.get_users_page(limit, after)
+    set_next_cursor(response, next_cursor)
+    return users
 
 
 @route.get("/{user_id}", response_model=UserDetail)
@@ -42,27 +50,41 @@ async def read_user(user_id: int, users_service: UsersService = Depends(users_se
 @route.get("/user_invitations/{company_id}", response_model=List[ActionBase])
 async def get_user_invitations(
         user_id: int,
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         actions_service: ActionService = Depends(action_service),
         current_user: dict = Depends(auth_service.get_current_user),
         users_service: UsersService = Depends(users_service)
 ):
     user = await users_service.get_user_by_id(user_id)
-    return await actions_service.get_user_invitations(user.id, limit, offset, current_user.id)
+    if offset and after is None:
+        return await actions_service.get_user_invitations(user.id, limit, offset, current_user.id)
+    actions, next_cursor = await actions_service.get_user_actions_page(user.id, "invitation_sent", limit, after,
+                                                                       current_user.id)
+    set_next_cursor(response, next_cursor)
+    return actions
 
 
 @route.get("/user_requests/{company_id}", response_model=List[ActionBase])
 async def get_user_requests(
         user_id: int,
-        limit: int = Query(10, le=300),
+        response: Response,
+        limit: int = Query(10, ge=1, le=300),
         offset: int = 0,
+        after: Optional[str] = None,
         actions_service: ActionService = Depends(action_service),
         current_user: dict = Depends(auth_service.get_current_user),
         users_service: UsersService = Depends(users_service)
 ):
     user = await users_service.get_user_by_id(user_id)
-    return await actions_service.get_user_requests(user.id, limit, offset, current_user.id)
+    if offset and after is None:
+        return await actions_service.get_user_requests(user.id, limit, offset, current_user.id)
+    actions, next_cursor = await actions_service.get_user_actions_page(user.id, "request_sent", limit, after,
+                                                                       current_user.id)
+    set_next_cursor(response, next_cursor)
+    return actions
 
 
 @route.put("/{user_id}", response_model=UserUpdate)
@@ -1,4 +1,6 @@
+from datetime import datetime
 from enum import Enum
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -6,6 +8,7 @@ from pydantic import BaseModel
 class SaveFormat(str, Enum):
     json = "json"
     csv = "csv"
+    ndjson = "ndjson"
 
 
 class GetResultsByFormat(BaseModel):
@@ -18,3 +21,41 @@ class AverageSystemModel(BaseModel):
 
 class AverageCompanyModel(BaseModel):
     company_average_rating: float
+
+
+class TimeBucket(str, Enum):
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class ScoreSeriesPoint(BaseModel):
+    bucket: datetime
+    attempts: int
+    average_score: float
+
+
+class LeaderboardEntry(BaseModel):
+    user_id: int
+    score: float
+    rank: int
+
+
+class ExportJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class ExportJobModel(BaseModel):
+    job_id: str
+    company_id: int
+    save_format: SaveFormat
+    status: ExportJobStatus
+    processed: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
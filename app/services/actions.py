@@ -58,12 +58,8 @@ class ActionService:
                              current_user: int
                              ):
         await validate_access(current_user, user_id)
-        if await self.get_actions(user_id, company.id, "request_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_REQUESTED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company.id,
-                                                         "action": "request_sent"},
-                                                        {"action": "request_canceled"})
+        return await self._change_action(user_id, company.id, "request_sent", "request_canceled",
+                                         ERROR_USER_NOT_REQUESTED)
 
     async def get_company_invitations(self, company_id: int, limit: int, offset: int, current_user: int):
         await validate_access(current_user, company_id)
@@ -81,6 +77,23 @@ class ActionService:
         await validate_access(current_user, user_id)
         return await self.actions_repo.filter_by(limit, offset, {"action": "request_sent", "user_id": user_id})
 
+    async def get_company_actions_page(self, company: dict, action: str, limit: int, after: str, current_user: int):
+        await validate_access(current_user, company.owner_id)
+        return await self.actions_repo.filter_by_cursor(limit, after, {"action": action, "company_id": company.id})
+
+    async def get_user_actions_page(self, user_id: int, action: str, limit: int, after: str, current_user: int):
+        await validate_access(current_user, user_id)
+        return await self.actions_repo.filter_by_cursor(limit, after, {"action": action, "user_id": user_id})
+
+    async def _change_action(self, user_id: int, company_id: int, action: str, new_action: str, error: str):
+        actions = await self.actions_repo.update_by_filter_returning({"user_id": user_id,
+                                                                      "company_id": company_id,
+                                                                      "action": action},
+                                                                     {"action": new_action})
+        if not actions:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error)
+        return actions[0]
+
     async def get_actions(self, user_id, company_id, action: str):
         return await self.actions_repo.find_by_filter({"user_id": user_id,
                                                        "company_id": company_id,
@@ -92,57 +105,37 @@ class ActionService:
                                 current_user: int
                                 ):
         await validate_access(current_user, company.owner_id)
-        if await self.get_actions(user_id, company.id, "invitation_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_INVITED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company.id,
-                                                         "action": "invitation_sent"},
-                                                        {"action": "invitation_canceled"})
+        return await self._change_action(user_id, company.id, "invitation_sent", "invitation_canceled",
+                                         ERROR_USER_NOT_INVITED)
 
     async def accept_invitation(self,
                                 user_id: int,
                                 company_id: int,
                                 current_user: int):
         await validate_access(current_user, user_id)
-        if await self.get_actions(user_id, company_id, "invitation_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_INVITED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company_id,
-                                                         "action": "invitation_sent"},
-                                                        {"action": "invitation_accepted"})
+        return await self._change_action(user_id, company_id, "invitation_sent", "invitation_accepted",
+                                         ERROR_USER_NOT_INVITED)
 
     async def refuse_invitation(self,
                                 user_id: int,
                                 company_id: int,
                                 current_user: int):
         await validate_access(current_user, user_id)
-        if await self.get_actions(user_id, company_id, "invitation_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_INVITED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company_id,
-                                                         "action": "invitation_sent"},
-                                                        {"action": "invitation_refused"})
+        return await self._change_action(user_id, company_id, "invitation_sent", "invitation_refused",
+                                         ERROR_USER_NOT_INVITED)
 
     async def accept_request(self,
                              user_id: int,
                              company: dict,
                              current_user: int):
         await validate_access(current_user, company.owner_id)
-        if await self.get_actions(user_id, company.id, "request_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_REQUESTED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company.id,
-                                                         "action": "request_sent"},
-                                                        {"action": "request_accepted"})
+        return await self._change_action(user_id, company.id, "request_sent", "request_accepted",
+                                         ERROR_USER_NOT_REQUESTED)
 
     async def refuse_request(self,
                              user_id: int,
                              company: dict,
                              current_user: int):
         await validate_access(current_user, company.owner_id)
-        if await self.get_actions(user_id, company.id, "request_sent") is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_USER_NOT_REQUESTED)
-        return await self.actions_repo.update_by_filter({"user_id": user_id,
-                                                         "company_id": company.id,
-                                                         "action": "request_sent"},
-                                                        {"action": "request_refused"})
+        return await self._change_action(user_id, company.id, "request_sent", "request_refused",
+                                         ERROR_USER_NOT_REQUESTED)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from app.conf.config import conf
+from app.db.db import get_redis
+
+CACHE_PREFIX = "analytics"
+TAG_PREFIX = "analytics_tag"
+# Entries without a company/quiz/user scope (system-wide quiz analytics) change on every submit
+GLOBAL_TAG = f"{TAG_PREFIX}:global"
+# Every invalidation takes the next number of this counter and stamps it on the invalidated tags,
+# a value computed before that number was taken must not be cached under those tags any more
+INVALIDATIONS_KEY = "analytics_invalidations"
+STAMP_PREFIX = "analytics_invalidated"
+# How long a stamp is remembered, longer than any analytics computation takes
+STAMP_TTL_SECONDS = 600
+
+STAMP_SCRIPT = """
+local number = redis.call('INCR', KEYS[1])
+for i = 2, #KEYS do
+    redis.call('SET', KEYS[i], number, 'EX', ARGV[1])
+end
+return number
+"""
+
+# KEYS: entry key, then ARGV[3] tag sets, then their stamps. ARGV: payload, ttl, tag count, invalidation number
+# read together with the cache miss. Nothing is written if one of the tags was invalidated after that read.
+STORE_SCRIPT = """
+local tags = tonumber(ARGV[3])
+local started = tonumber(ARGV[4])
+for i = 2 + tags, 1 + 2 * tags do
+    if tonumber(redis.call('GET', KEYS[i]) or '0') > started then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, 1 + tags do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+return 1
+"""
+
+
+class AnalyticsCache:
+    def __init__(self, ttl_seconds: int = conf.analytics_cache_ttl):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(endpoint: str, scope: dict, params: dict) -> str:
+        scope_part = ":".join(f"{name}={value}" for name, value in sorted(scope.items())) or "global"
+        params_part = hashlib.sha1(json.dumps(jsonable_encoder(params), sort_keys=True).encode()).hexdigest()
+        return f"{CACHE_PREFIX}:{endpoint}:{scope_part}:{params_part}"
+
+    @staticmethod
+    def _tags(scope: dict) -> list:
+        return [f"{TAG_PREFIX}:{name}:{value}" for name, value in scope.items()] or [GLOBAL_TAG]
+
+    @staticmethod
+    def _value_tags(tags: dict) -> list:
+        return [f"{TAG_PREFIX}:{name}:{value}" for name, values in tags.items() for value in values]
+
+    @staticmethod
+    def _stamp(tag: str) -> str:
+        return STAMP_PREFIX + tag[len(TAG_PREFIX):]
+
+    async def get_or_compute(self,
+                             endpoint: str,
+                             compute: Callable[[], Awaitable[Any]],
+                             scope: dict = None,
+                             params: dict = None,
+                             tags_from: Optional[Callable[[Any], dict]] = None):
+        # scope names the company/quiz/user ids the response depends on, it decides which submits invalidate it.
+        # tags_from adds the ids only known from the computed value, e.g. the users a company-wide response
+        # aggregates across all their companies: {"user": [ids]}; they tag the entry without being part of its key.
+        # Redis errors never fail the request, the value is then just computed without caching.
+        scope = scope or {}
+        key = self._key(endpoint, scope, params or {})
+        redis = await get_redis()
+        try:
+            cached, started = await redis.mget(key, INVALIDATIONS_KEY)
+        except RedisError as e:
+            self.errors += 1
+            logging.warning(f"Analytics cache read failed for {key}: {e}")
+            return await compute()
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+
+        self.misses += 1
+        value = await compute()
+        tags = self._tags(scope) + (self._value_tags(tags_from(value)) if tags_from else [])
+        try:
+            store = redis.register_script(STORE_SCRIPT)
+            await store(keys=[key, *tags, *(self._stamp(tag) for tag in tags)],
+                        args=[json.dumps(jsonable_encoder(value)), self.ttl_seconds, len(tags), int(started or 0)])
+        except RedisError as e:
+            self.errors += 1
+            logging.warning(f"Analytics cache write failed for {key}: {e}")
+        return value
+
+    async def invalidate(self, company_id: int = None, quiz_id: int = None, user_id: int = None):
+        # Drops every entry tagged with one of the ids plus the system-wide ones, other companies keep their entries
+        tags = [GLOBAL_TAG]
+        for name, value in (("company", company_id), ("quiz", quiz_id), ("user", user_id)):
+            if value is not None:
+                tags.append(f"{TAG_PREFIX}:{name}:{value}")
+        redis = await get_redis()
+        try:
+            # stamped first, so a computation already running can't store its result after the delete
+            stamp = redis.register_script(STAMP_SCRIPT)
+            await stamp(keys=[INVALIDATIONS_KEY, *(self._stamp(tag) for tag in tags)], args=[STAMP_TTL_SECONDS])
+            keys = await redis.sunion(tags)
+            await redis.delete(*keys, *tags)
+        except RedisError as e:
+            self.errors += 1
+            logging.warning(f"Analytics cache invalidation failed for {tags}: {e}")
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+analytics_cache = AnalyticsCache()
@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.conf.messages import ERROR_COMPANY_NOT_FOUND, ERROR_ACCESS
 from app.schemas.company_schemas import CompanyCreate, CompanyUpdate
@@ -7,8 +8,11 @@ from app.utils.repository import AbstractRepository
 
 
 class CompanyService:
-    def __init__(self, companies_repo: AbstractRepository):
-        self.companies_repo: AbstractRepository = companies_repo()
+    def __init__(self,
+                 companies_repo: AbstractRepository,
+                 session: AsyncSession = None,
+                 read_session: AsyncSession = None):
+        self.companies_repo: AbstractRepository = companies_repo(session, read_session)
 
     async def create_company(self, company: CompanyCreate, owner_id: int):
         company_dict = company.model_dump()
@@ -19,6 +23,10 @@ class CompanyService:
         companies = await self.companies_repo.find_all(limit, offset)
         return [company for company in companies if company.is_visible or current_user == company.owner_id]
 
+    async def get_companies_page(self, limit: int, after: str, current_user: int):
+        companies, next_cursor = await self.companies_repo.find_all_by_cursor(limit, after)
+        return [company for company in companies if company.is_visible or current_user == company.owner_id], next_cursor
+
     async def get_all_companies(self):
         return await self.companies_repo.find_all_without_pagination()
 
@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.conf.messages import ERROR_MEMBER_NOT_FOUND, ERROR_MEMBER_OWNER_ADMIN, \
     ERROR_MEMBER_NOT_ADMIN, ERROR_ACCESS
@@ -8,8 +9,11 @@ from app.utils.repository import AbstractRepository
 
 
 class CompanyMembersService:
-    def __init__(self, comp_memb_repo: AbstractRepository):
-        self.comp_memb_repo: AbstractRepository = comp_memb_repo()
+    def __init__(self,
+                 comp_memb_repo: AbstractRepository,
+                 session: AsyncSession = None,
+                 read_session: AsyncSession = None):
+        self.comp_memb_repo: AbstractRepository = comp_memb_repo(session, read_session)
 
     async def add_member(self,
                          user_id: int,
@@ -58,6 +62,9 @@ class CompanyMembersService:
     async def get_all_members(self, company_id: int):
         return await self.comp_memb_repo.filter({"company_id": company_id})
 
+    async def get_member_user_ids(self, company_id: int):
+        return await self.comp_memb_repo.filter_columns(["user_id"], {"company_id": company_id})
+
     async def add_admin(self,
                         user_id: int,
                         company: dict,
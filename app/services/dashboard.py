@@ -0,0 +1,105 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app.db.db import get_redis
+from app.services.company_members import CompanyMembersService
+from app.services.quizzes import QuizService
+from app.services.results import ResultsService
+
+DASHBOARD_PREFIX = "dashboard"
+# Rebuilt nightly, the extra day covers a missed run
+SNAPSHOT_TTL = timedelta(days=2)
+
+
+class DashboardService:
+    def __init__(self,
+                 results_service: ResultsService,
+                 quizzes_service: QuizService,
+                 comp_memb_service: CompanyMembersService):
+        self.results_service = results_service
+        self.quizzes_service = quizzes_service
+        self.comp_memb_service = comp_memb_service
+
+    @staticmethod
+    def _key(company_id: int) -> str:
+        return f"{DASHBOARD_PREFIX}:company:{company_id}"
+
+    @staticmethod
+    def _average(right: int, total: int) -> float:
+        return right / total if total > 0 else 0.0
+
+    async def build_snapshot(self, company: dict) -> dict:
+        # Member and quiz averages, last attempts and overdue counts of one company from a single rollup read
+        user_ids = [member.user_id for member in await self.comp_memb_service.get_member_user_ids(company.id)]
+        quizzes = await self.quizzes_service.get_company_quizzes(company.id)
+        rollup = await self.results_service.get_company_rollup(company.id)
+        now = datetime.utcnow()
+
+        members = {user_id: {"attempts": 0, "right": 0, "total": 0, "last_attempt_date": None} for user_id in user_ids}
+        quiz_totals = defaultdict(lambda: {"attempts": 0, "right": 0, "total": 0, "last_attempt_date": None})
+        last_attempts = {}
+        for row in rollup:
+            last_attempts[(row.result_quiz_id, row.result_user_id)] = row.last_attempt_at
+            for totals in (members.get(row.result_user_id), quiz_totals[row.result_quiz_id]):
+                if totals is None:
+                    continue
+                totals["attempts"] += row.attempts
+                totals["right"] += row.result_right_count
+                totals["total"] += row.result_total_count
+                if totals["last_attempt_date"] is None or row.last_attempt_at > totals["last_attempt_date"]:
+                    totals["last_attempt_date"] = row.last_attempt_at
+
+        quiz_entries = []
+        for quiz in quizzes:
+            totals = quiz_totals[quiz.id]
+            member_attempts = [last_attempts.get((quiz.id, user_id)) for user_id in user_ids]
+            quiz_entries.append({
+                "quiz_id": quiz.id,
+                "quiz_name": quiz.quiz_name,
+                "attempts": totals["attempts"],
+                "average": self._average(totals["right"], totals["total"]),
+                "last_attempt_date": totals["last_attempt_date"],
+                # same rule as the reminder notifications: last attempt at least quiz_frequency days ago
+                "overdue_members": sum(1 for last in member_attempts
+                                       if last is not None and (now - last).days >= quiz.quiz_frequency),
+                "never_attempted_members": sum(1 for last in member_attempts if last is None),
+            })
+
+        return {
+            "company_id": company.id,
+            "as_of": now,
+            "members": [{
+                "user_id": user_id,
+                "attempts": totals["attempts"],
+                "average": self._average(totals["right"], totals["total"]),
+                "last_attempt_date": totals["last_attempt_date"],
+            } for user_id, totals in members.items()],
+            "quizzes": quiz_entries,
+        }
+
+    async def store_snapshot(self, snapshot: dict):
+        # One zlib-compressed JSON blob per company, read back in a single GET
+        blob = zlib.compress(json.dumps(jsonable_encoder(snapshot)).encode())
+        redis = await get_redis()
+        await redis.set(self._key(snapshot["company_id"]), blob, ex=SNAPSHOT_TTL)
+
+    async def load_snapshot(self, company_id: int):
+        redis = await get_redis()
+        blob = await redis.get(self._key(company_id))
+        return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+    async def refresh_snapshot(self, company: dict) -> dict:
+        snapshot = await self.build_snapshot(company)
+        await self.store_snapshot(snapshot)
+        return jsonable_encoder(snapshot)
+
+    async def get_dashboard(self, company: dict, refresh: bool = False) -> dict:
+        if not refresh:
+            snapshot = await self.load_snapshot(company.id)
+            if snapshot is not None:
+                return snapshot
+        return await self.refresh_snapshot(company)
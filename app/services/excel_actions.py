@@ -63,13 +63,14 @@ async def update_quiz_from_excel(file, quiz_id: int, company: dict, member: dict
 
 async def create_questions_from_excel(quiz_id: int, sheet, member: dict, company: dict, current_user: int):
     quiz = await quizzes_service.get_quiz_by_id(quiz_id)
+    questions = []
     for row in sheet.iter_rows(min_row=5, values_only=True):
         question_text, *question_answers, question_correct_answer = row
 
-        question_data = QuestionCreateModel(
+        questions.append(QuestionCreateModel(
             question_text=question_text,
             question_answers=question_answers,
             question_correct_answer=question_correct_answer
-        )
+        ))
 
-        await question_service.create_question(quiz, question_data, member, company, current_user)
+    await question_service.create_questions(quiz, questions, member, company, current_user)
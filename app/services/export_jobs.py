@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+from fastapi import HTTPException
+from starlette import status
+
+from app.conf.config import conf
+from app.conf.messages import ERROR_EXPORT_JOB_FAILED, ERROR_EXPORT_JOB_LIMIT, ERROR_EXPORT_JOB_NOT_FOUND, \
+    ERROR_EXPORT_JOB_NOT_READY
+from app.db.db import get_redis
+from app.schemas.results_schemas import ExportJobModel, ExportJobStatus
+from app.services.redis import RedisService, RESULT_FIELDS, redis_service
+from app.utils.streaming import export_chunks
+
+EXPORT_JOB_PREFIX = "export_job"
+RUNNING_JOBS_PREFIX = "export_jobs:running"
+# Chunks read per LRANGE when a finished artifact is downloaded
+ARTIFACT_READ_CHUNKS = 50
+
+# Takes one of the company's export slots. Slots are a sorted set of job id -> start time, so a slot whose
+# worker died without releasing it is reclaimed once it is older than the job timeout.
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class ExportJobService:
+    # Company-wide result exports built in the background: the job status is a Redis hash updated as batches
+    # are written, the artifact a Redis list of zlib-compressed chunks, both expiring after export_job_ttl
+
+    def __init__(self, results_source: RedisService):
+        self.results_source = results_source
+        self.tasks = set()
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"{EXPORT_JOB_PREFIX}:{job_id}"
+
+    @staticmethod
+    def _artifact_key(job_id: str) -> str:
+        return f"{EXPORT_JOB_PREFIX}:{job_id}:artifact"
+
+    @staticmethod
+    def _running_key(company_id: int) -> str:
+        return f"{RUNNING_JOBS_PREFIX}:{company_id}"
+
+    async def valid_job_access(self, current_user: int, member: dict, company: dict):
+        await self.results_source._valid_access(current_user, member, company)
+
+    async def submit(self, company_id: int, save_format: str) -> ExportJobModel:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        redis = await get_redis()
+        acquire = redis.register_script(ACQUIRE_SLOT_SCRIPT)
+        acquired = await acquire(keys=[self._running_key(company_id)],
+                                 args=[now - conf.export_job_timeout, conf.export_jobs_per_company, now, job_id,
+                                       conf.export_job_timeout])
+        if not int(acquired):
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=ERROR_EXPORT_JOB_LIMIT)
+
+        job = ExportJobModel(job_id=job_id,
+                             company_id=company_id,
+                             save_format=save_format,
+                             status=ExportJobStatus.queued,
+                             created_at=datetime.utcnow())
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(job_id), mapping=job.model_dump(mode="json", exclude_none=True))
+            pipe.expire(self._key(job_id), conf.export_job_ttl)
+            await pipe.execute()
+
+        task = asyncio.create_task(self.run(job_id, company_id, save_format))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def run(self, job_id: str, company_id: int, save_format: str):
+        key, artifact_key = self._key(job_id), self._artifact_key(job_id)
+        redis = await get_redis()
+        try:
+            keys = await self.results_source.get_company_result_keys(company_id)
+            await redis.hset(key, mapping={"status": ExportJobStatus.running.value, "total": len(keys)})
+            batches = self._track_progress(redis, key, len(keys), self.results_source.iter_results(keys))
+            async for chunk in export_chunks(batches, save_format, RESULT_FIELDS):
+                if not chunk:
+                    continue
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.rpush(artifact_key, zlib.compress(chunk.encode()))
+                    pipe.expire(artifact_key, conf.export_job_ttl)
+                    await pipe.execute()
+            await redis.hset(key, mapping={"status": ExportJobStatus.done.value,
+                                           "finished_at": datetime.utcnow().isoformat()})
+        except (Exception, asyncio.CancelledError) as e:
+            logging.exception(f"Export job {job_id} for company {company_id} failed")
+            await redis.delete(artifact_key)
+            await redis.hset(key, mapping={"status": ExportJobStatus.failed.value,
+                                           "error": ERROR_EXPORT_JOB_FAILED,
+                                           "finished_at": datetime.utcnow().isoformat()})
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            await redis.zrem(self._running_key(company_id), job_id)
+
+    async def shutdown(self):
+        # Cancels the running jobs and waits until each has marked itself failed and released its slot,
+        # which needs Redis, so this runs before the Redis client is closed
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _track_progress(self, redis, key: str, total: int, batches):
+        # Counts fetched keys rather than rows, keys that expired since indexing still count as processed
+        processed = 0
+        async for batch in batches:
+            yield batch
+            processed = min(processed + self.results_source.fetch_batch_size, total)
+            await redis.hset(key, "processed", processed)
+
+    async def get_job(self, job_id: str) -> ExportJobModel:
+        redis = await get_redis()
+        job = await redis.hgetall(self._key(job_id))
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_EXPORT_JOB_NOT_FOUND)
+        return ExportJobModel(**{name.decode(): value.decode() for name, value in job.items()})
+
+    async def get_artifact(self, job: ExportJobModel):
+        if job.status != ExportJobStatus.done:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=ERROR_EXPORT_JOB_NOT_READY)
+        return self._iter_artifact(job.job_id)
+
+    async def _iter_artifact(self, job_id: str):
+        redis = await get_redis()
+        start = 0
+        while True:
+            chunks = await redis.lrange(self._artifact_key(job_id), start, start + ARTIFACT_READ_CHUNKS - 1)
+            if not chunks:
+                return
+            for chunk in chunks:
+                yield zlib.decompress(chunk)
+            start += len(chunks)
+
+
+export_job_service = ExportJobService(redis_service)
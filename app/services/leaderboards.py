@@ -0,0 +1,111 @@
+from collections import defaultdict
+
+from fastapi import HTTPException
+from starlette import status
+
+from app.conf.messages import ERROR_NOT_ON_LEADERBOARD
+from app.db.db import get_redis
+
+LEADERBOARD_PREFIX = "leaderboard"
+TOTALS_PREFIX = "leaderboard_totals"
+
+# Adds one result to the member's running sums and re-scores them in the sorted set. It runs as a script
+# so two submits by the same user can't interleave between the HINCRBYs and the ZADD.
+RECORD_RESULT_SCRIPT = """
+local right = redis.call('HINCRBY', KEYS[2], ARGV[1] .. ':right', ARGV[2])
+local total = redis.call('HINCRBY', KEYS[2], ARGV[1] .. ':total', ARGV[3])
+local score = 0
+if total > 0 then
+    score = right / total
+end
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+return tostring(score)
+"""
+
+
+class LeaderboardService:
+    # A leaderboard per company and per quiz: a sorted set of user id -> average score (right / total)
+    # and a hash with each user's right/total sums the score is derived from
+
+    @staticmethod
+    def _keys(company_id: int, quiz_id: int = None) -> tuple:
+        # Quiz boards sit under their company too, a quiz id alone never reaches another company's board
+        scope = f"company:{company_id}" if quiz_id is None else f"company:{company_id}:quiz:{quiz_id}"
+        return f"{LEADERBOARD_PREFIX}:{scope}", f"{TOTALS_PREFIX}:{scope}"
+
+    @staticmethod
+    def _entries(rows, first_rank: int) -> list:
+        return [{"user_id": int(member), "score": score, "rank": first_rank + offset}
+                for offset, (member, score) in enumerate(rows)]
+
+    async def record_result(self, company_id: int, quiz_id: int, user_id: int, correct_count: int, total_count: int):
+        redis = await get_redis()
+        record = redis.register_script(RECORD_RESULT_SCRIPT)
+        for keys in (self._keys(company_id), self._keys(company_id, quiz_id)):
+            await record(keys=list(keys), args=[user_id, correct_count, total_count])
+
+    async def get_top(self, company_id: int, limit: int, quiz_id: int = None) -> list:
+        board, _ = self._keys(company_id, quiz_id)
+        redis = await get_redis()
+        rows = await redis.zrevrange(board, 0, limit - 1, withscores=True)
+        return self._entries(rows, 1)
+
+    async def get_rank(self, company_id: int, user_id: int, quiz_id: int = None) -> dict:
+        board, _ = self._keys(company_id, quiz_id)
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(board, user_id)
+            pipe.zscore(board, user_id)
+            rank, score = await pipe.execute()
+        if rank is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_NOT_ON_LEADERBOARD)
+        return {"user_id": user_id, "score": score, "rank": rank + 1}
+
+    async def get_around(self, company_id: int, user_id: int, radius: int, quiz_id: int = None) -> list:
+        board, _ = self._keys(company_id, quiz_id)
+        redis = await get_redis()
+        rank = await redis.zrevrank(board, user_id)
+        if rank is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_NOT_ON_LEADERBOARD)
+        start = max(rank - radius, 0)
+        rows = await redis.zrevrange(board, start, rank + radius, withscores=True)
+        return self._entries(rows, start + 1)
+
+    async def rebuild_company(self, company_id: int, totals: list):
+        # totals are (result_quiz_id, result_user_id, result_right_count, result_total_count) rows for the company.
+        # Every board is written under a temporary key and renamed over the live one inside MULTI,
+        # so readers never see a half-built board. Submits recorded while the rows were read are lost
+        # until the next rebuild.
+        company_sums = defaultdict(lambda: [0, 0])
+        quiz_sums = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for row in totals:
+            for sums in (company_sums[row.result_user_id], quiz_sums[row.result_quiz_id][row.result_user_id]):
+                sums[0] += row.result_right_count
+                sums[1] += row.result_total_count
+
+        redis = await get_redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            self._replace_board(pipe, self._keys(company_id), company_sums)
+            for quiz_id, sums in quiz_sums.items():
+                self._replace_board(pipe, self._keys(company_id, quiz_id), sums)
+            await pipe.execute()
+
+    @staticmethod
+    def _replace_board(pipe, keys: tuple, sums: dict):
+        board, totals = keys
+        if not sums:
+            pipe.delete(board, totals)
+            return
+        scores = {user_id: right / total if total else 0.0 for user_id, (right, total) in sums.items()}
+        fields = {}
+        for user_id, (right, total) in sums.items():
+            fields[f"{user_id}:right"] = right
+            fields[f"{user_id}:total"] = total
+        pipe.delete(f"{board}:rebuild", f"{totals}:rebuild")
+        pipe.zadd(f"{board}:rebuild", scores)
+        pipe.hset(f"{totals}:rebuild", mapping=fields)
+        pipe.rename(f"{board}:rebuild", board)
+        pipe.rename(f"{totals}:rebuild", totals)
+
+
+leaderboard_service = LeaderboardService()
@@ -14,9 +14,9 @@ class NotificationsService:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_ACCESS)
 
     async def add_notifications_about_create_quizz(self, members: list, quiz_id: int):
-        for user in members:
-            await self.notifications_repo.add_one({"user_id": user.user_id,
-                                                   "text": f"Quiz {quiz_id} was created, you can submit it!!!"})
+        await self.notifications_repo.add_many([{"user_id": user.user_id,
+                                                 "text": f"Quiz {quiz_id} was created, you can submit it!!!"}
+                                                for user in members])
 
     async def add_notifications_about_time_to_quizz(self, user_id: int, quiz_id: int):
         await self.notifications_repo.add_one({"user_id": user_id,
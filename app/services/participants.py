@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from starlette import status
+
+from app.conf.messages import ERROR_INVALID_DATE_RANGE, ERROR_DATE_RANGE_TOO_LONG
+from app.db.db import get_redis
+
+PARTICIPANTS_PREFIX = "participants"
+# Day counters outlive the longest range that can be queried
+RETENTION_DAYS = 400
+MAX_RANGE_DAYS = 366
+# Redis HyperLogLogs use 16384 registers, a standard error of 1.04 / sqrt(16384)
+STANDARD_ERROR = 0.0081
+
+
+class ParticipantsService:
+    # One HyperLogLog of user ids per quiz and per company for every UTC day with submits.
+    # Counting over a range passes all day keys to one PFCOUNT, which merges them server-side,
+    # so a user active on several days is counted once.
+
+    @staticmethod
+    def _key(day: date, company_id: int = None, quiz_id: int = None) -> str:
+        scope = f"quiz:{quiz_id}" if quiz_id is not None else f"company:{company_id}"
+        return f"{PARTICIPANTS_PREFIX}:{scope}:{day.isoformat()}"
+
+    @staticmethod
+    def _days(date_from: date, date_to: date) -> list:
+        if date_from > date_to:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_INVALID_DATE_RANGE)
+        days = (date_to - date_from).days + 1
+        if days > MAX_RANGE_DAYS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_DATE_RANGE_TOO_LONG)
+        return [date_from + timedelta(days=offset) for offset in range(days)]
+
+    async def record_participant(self, company_id: int, quiz_id: int, user_id: int, day: date = None):
+        day = day or datetime.utcnow().date()
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in (self._key(day, company_id), self._key(day, quiz_id=quiz_id)):
+                pipe.pfadd(key, user_id)
+                pipe.expire(key, timedelta(days=RETENTION_DAYS))
+            await pipe.execute()
+
+    async def count_unique(self, date_from: date, date_to: date, company_id: int = None, quiz_id: int = None) -> dict:
+        days = self._days(date_from, date_to)
+        keys = [self._key(day, company_id, quiz_id) for day in days]
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.pfcount(*keys)
+            for key in keys:
+                pipe.pfcount(key)
+            total, *daily = await pipe.execute()
+        return {
+            "unique_participants": total,
+            "standard_error": STANDARD_ERROR,
+            "daily": [{"day": day, "unique_participants": count} for day, count in zip(days, daily)],
+        }
+
+
+participants_service = ParticipantsService()
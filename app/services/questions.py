@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from starlette import status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.conf.messages import ERROR_MEMBER_NOT_EXISTS, ERROR_ACCESS, ERROR_QUESTION_NOT_FOUND, ERROR_NOT_ENOUGH_OPTIONS
 from app.schemas.questions_schemas import QuestionCreateModel, QuestionUpdateModel
@@ -7,8 +8,11 @@ from app.utils.repository import AbstractRepository
 
 
 class QuestionService:
-    def __init__(self, questions_repo: AbstractRepository):
-        self.questions_repo: AbstractRepository = questions_repo()
+    def __init__(self,
+                 questions_repo: AbstractRepository,
+                 session: AsyncSession = None,
+                 read_session: AsyncSession = None):
+        self.questions_repo: AbstractRepository = questions_repo(session, read_session)
 
     async def create_question(self,
                               quiz: dict,
@@ -28,6 +32,27 @@ class QuestionService:
         })
         return await self.questions_repo.add_one(question_dict)
 
+    async def create_questions(self,
+                               quiz: dict,
+                               data: list[QuestionCreateModel],
+                               member: dict,
+                               company: dict,
+                               current_user: int) -> list[int]:
+        await self.valid_question_access(current_user, member, company)
+        questions = []
+        for question in data:
+            if len(question.question_answers) < 2:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=ERROR_NOT_ENOUGH_OPTIONS)
+            question_dict = question.model_dump()
+            question_dict.update({
+                "question_quiz_id": quiz.id,
+                "question_company_id": quiz.quiz_company_id,
+                "created_by": current_user
+            })
+            questions.append(question_dict)
+        return await self.questions_repo.add_many(questions, return_ids=True)
+
     async def update_question(self,
                               question_id: int,
                               quiz_id: int,
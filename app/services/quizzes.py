@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.conf.messages import ERROR_ACCESS, ERROR_MEMBER_NOT_EXISTS, ERROR_QUIZ_NOT_FOUND, ERROR_NOT_ENOUGH_QUESTIONS, \
     ERROR_MEMBER_NOT_FOUND
@@ -8,8 +9,11 @@ from app.utils.repository import AbstractRepository
 
 
 class QuizService:
-    def __init__(self, quizzes_repo: AbstractRepository):
-        self.quizzes_repo: AbstractRepository = quizzes_repo()
+    def __init__(self,
+                 quizzes_repo: AbstractRepository,
+                 session: AsyncSession = None,
+                 read_session: AsyncSession = None):
+        self.quizzes_repo: AbstractRepository = quizzes_repo(session, read_session)
 
     async def create_quiz(self, company: dict, data: QuizCreateModel, member: dict, current_user: int):
         await self.valid_quiz_access(current_user, member, company)
@@ -23,15 +27,34 @@ class QuizService:
     async def get_quizzes(self, company_id: int, limit: int, offset: int):
         return await self.quizzes_repo.filter_by(limit, offset, {"quiz_company_id": company_id})
 
+    async def get_quizzes_page(self, company_id: int, limit: int, after: str = None):
+        return await self.quizzes_repo.filter_by_cursor(limit, after, {"quiz_company_id": company_id})
+
     async def get_all_quizzes(self):
         return await self.quizzes_repo.find_all_without_pagination()
 
+    async def get_company_quizzes(self, company_id: int):
+        return await self.quizzes_repo.filter_columns(["id", "quiz_name", "quiz_frequency"],
+                                                      {"quiz_company_id": company_id})
+
+    async def get_all_quizzes_page(self, limit: int, after: str = None):
+        return await self.quizzes_repo.find_all_by_cursor(limit, after)
+
+    def stream_all_quizzes(self, batch_size: int):
+        return self.quizzes_repo.stream_columns(["id", "quiz_name"], {}, batch_size)
+
     async def get_quiz_by_id(self, quiz_id: int):
         quiz = await self.quizzes_repo.find_by_filter({"id": quiz_id})
         if quiz is None:
             raise HTTPException(status_code=404, detail=ERROR_QUIZ_NOT_FOUND)
         return quiz
 
+    async def get_company_quiz(self, quiz_id: int, company_id: int):
+        quiz = await self.quizzes_repo.find_by_filter({"id": quiz_id, "quiz_company_id": company_id})
+        if quiz is None:
+            raise HTTPException(status_code=404, detail=ERROR_QUIZ_NOT_FOUND)
+        return quiz
+
     async def update_quiz(self, quiz_id: int, company: dict, data: QuizUpdateModel, member: dict, current_user: int):
         await self.valid_quiz_access(current_user, member, company)
         await self.get_quiz_by_id(quiz_id)
@@ -1,29 +1,69 @@
 import json
+import struct
 
 from fastapi import HTTPException
 from fastapi import status
 
-from app.conf.messages import ERROR_ACCESS, ERROR_MEMBER_NOT_EXISTS, ERROR_INVALID_SAVE_FORMAT
+from redis.asyncio import Redis
+
+from app.conf.config import conf
+from app.conf.messages import ERROR_ACCESS, ERROR_MEMBER_NOT_EXISTS
 from app.db.db import get_redis
 from app.utils.repository import RedisDataRepository
-from app.utils.upload_data import JSONDataLoader, CSVDataLoader
+
+RESULTS_EXPIRATION_HOURS = 48
+RESULTS_INDEX_PREFIX = "quiz_answers_index"
+RESULTS_KEY_PREFIX = "quiz_answers"
+RESULT_FIELDS = ["quiz_id", "company_id", "user_id", "correct_count", "total_count"]
+# Stored value: a format version byte and the two counts, the ids are already part of the key
+RESULT_FORMAT = struct.Struct("<BII")
+RESULT_FORMAT_VERSION = 1
+
+
+def encode_result(correct_count: int, total_count: int) -> bytes:
+    return RESULT_FORMAT.pack(RESULT_FORMAT_VERSION, correct_count, total_count)
+
+
+def decode_results(keys: list, values: list) -> list:
+    # Values are matched to the MGET keys they were fetched with, keys that expired since indexing come back empty.
+    # Values starting with "{" were written as JSON objects before the packed format and still decode until they expire.
+    results = []
+    for key, value in zip(keys, values):
+        if not value:
+            continue
+        if value[:1] == b"{":
+            results.append(json.loads(value))
+            continue
+        _, quiz_id, user_id, company_id = (key.decode() if isinstance(key, bytes) else key).split(":")
+        _, correct_count, total_count = RESULT_FORMAT.unpack(value)
+        results.append({
+            "quiz_id": int(quiz_id),
+            "company_id": int(company_id),
+            "user_id": int(user_id),
+            "correct_count": correct_count,
+            "total_count": total_count,
+        })
+    return results
 
 
 class RedisService(RedisDataRepository):
-    def __init__(self):
-        self.redis = get_redis()
-        self.json_loader = JSONDataLoader()
-        self.csv_loader = CSVDataLoader()
-
-    async def _save_data(self, data, key, save_format):
-        if save_format == "json":
-            json_loader = JSONDataLoader()
-            json_loader.save(data, str(key) + "-results.json")
-        elif save_format == "csv":
-            csv_loader = CSVDataLoader()
-            csv_loader.save(data, str(key) + "-results.csv")
-        else:
-            HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_INVALID_SAVE_FORMAT)
+    def __init__(self, redis: Redis = None):
+        # Without an injected client every call uses the application's shared pooled client
+        self.redis = redis
+        self.fetch_batch_size = int(conf.redis_fetch_batch_size)
+
+    async def _client(self) -> Redis:
+        return self.redis or await get_redis()
+
+    @staticmethod
+    def _index_keys(quiz_id: int, company_id: int, user_id: int) -> list:
+        # The quiz index sits under its company, a quiz id from another company finds nothing
+        return [
+            f"{RESULTS_INDEX_PREFIX}:user:{user_id}",
+            f"{RESULTS_INDEX_PREFIX}:company:{company_id}",
+            f"{RESULTS_INDEX_PREFIX}:company:{company_id}:quiz:{quiz_id}",
+            f"{RESULTS_INDEX_PREFIX}:user_company:{user_id}:{company_id}",
+        ]
 
     async def store_results(self,
                             quiz_id: int,
@@ -31,88 +71,63 @@ class RedisService(RedisDataRepository):
                             current_user: int,
                             correct_count: int,
                             total_count: int):
-        key = f"quiz_answers:{quiz_id}:{current_user}:{company_id}"
-        redis = await self.redis
-        await self.store_data(redis, key, json.dumps({
-            "quiz_id": quiz_id,
-            "company_id": company_id,
-            "user_id": current_user,
-            "correct_count": correct_count,
-            "total_count": total_count,
-        }))
-        await redis.close()
-
-    async def get_user_results(self, user_id: int, current_user: int, upload_format: str):
+        key = f"{RESULTS_KEY_PREFIX}:{quiz_id}:{current_user}:{company_id}"
+        redis = await self._client()
+        await self.store_data(redis, key, encode_result(correct_count, total_count), RESULTS_EXPIRATION_HOURS,
+                              self._index_keys(quiz_id, company_id, current_user))
+
+    async def get_company_result_keys(self, company_id: int) -> list:
+        redis = await self._client()
+        return await self.get_indexed_keys(redis, f"{RESULTS_INDEX_PREFIX}:company:{company_id}")
+
+    async def iter_results(self, keys: list):
+        redis = await self._client()
+        async for batch in self._iter_result_batches(redis, keys):
+            yield batch
+
+    async def _iter_indexed_results(self, index_key: str):
+        # Keys come from the index written by store_results instead of a KEYS scan over the whole keyspace,
+        # results are yielded one decoded MGET batch at a time
+        redis = await self._client()
+        keys = await self.get_indexed_keys(redis, index_key)
+        async for batch in self._iter_result_batches(redis, keys):
+            yield batch
+
+    async def _iter_result_batches(self, redis, keys: list):
+        # One MGET round trip per batch instead of one GET per key
+        for start in range(0, len(keys), self.fetch_batch_size):
+            batch_keys = keys[start:start + self.fetch_batch_size]
+            yield decode_results(batch_keys, await self.get_many(redis, batch_keys))
+
+    async def get_user_results(self, user_id: int, current_user: int):
+        # Access is checked when called, the returned generator is consumed while the export streams
         if user_id != current_user:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_ACCESS)
-        redis = await self.redis
-        keys = await redis.keys(f"quiz_answers:*:{user_id}:*")
-        results = []
-
-        for key in keys:
-            data = await self.get_data(redis, key)
-            if data:
-                results.append(json.loads(data))
-        await redis.close()
-        await self._save_data(results, f"user_id_{user_id}", upload_format)
-        return results
+        return self._iter_indexed_results(f"{RESULTS_INDEX_PREFIX}:user:{user_id}")
 
     async def get_user_results_for_company(self,
                                            user_id: int,
                                            current_user: int,
                                            member: dict,
-                                           company: dict,
-                                           upload_format: str):
+                                           company: dict):
         await self._valid_access(current_user, member, company)
-        redis = await self.redis
-        keys = await redis.keys(f"quiz_answers:*:{user_id}:{company.id}")
-
-        results = []
-        for key in keys:
-            data = await self.get_data(redis, key)
-            if data:
-                results.append(json.loads(data))
-        await redis.close()
-        await self._save_data(results, f"user_id_{user_id}_company_id_{company.id}", upload_format)
-        return results
+        return self._iter_indexed_results(f"{RESULTS_INDEX_PREFIX}:user_company:{user_id}:{company.id}")
 
     async def get_all_results_for_company(self,
                                           company_id: int,
                                           current_user: int,
                                           member: dict,
-                                          company: dict,
-                                          upload_format: str):
+                                          company: dict):
         await self._valid_access(current_user, member, company)
-        redis = await self.redis
-        keys = await redis.keys(f"quiz_answers:*:{company_id}")
-
-        results = []
-        for key in keys:
-            data = await self.get_data(redis, key)
-            if data:
-                results.append(json.loads(data))
-        await redis.close()
-        await self._save_data(results, f"company_id_{company_id}", upload_format)
-        return results
+        return self._iter_indexed_results(f"{RESULTS_INDEX_PREFIX}:company:{company_id}")
 
     async def get_quiz_results_for_company(self,
                                            quiz_id: int,
                                            current_user: int,
                                            member: dict,
-                                           company: dict,
-                                           upload_format: str):
+                                           company: dict):
         await self._valid_access(current_user, member, company)
-        redis = await self.redis
-        keys = await redis.keys(f"quiz_answers:{quiz_id}:*")
-
-        results = []
-        for key in keys:
-            data = await self.get_data(redis, key)
-            if data:
-                results.append(json.loads(data))
-        await redis.close()
-        await self._save_data(results, f"quiz_id_{quiz_id}", upload_format)
-        return results
+        return self._iter_indexed_results(f"{RESULTS_INDEX_PREFIX}:company:{company.id}:quiz:{quiz_id}")
 
     async def _valid_access(self,
                             current_user: int,
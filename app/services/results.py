@@ -1,14 +1,53 @@
+from datetime import datetime, timezone
+
 from fastapi import HTTPException
 from starlette import status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.conf.messages import ERROR_MEMBER_NOT_FOUND, ERROR_USER_NOT_FOUND, ERROR_MEMBER_NOT_EXISTS, ERROR_ACCESS
-from app.db.models import Result
+from app.conf.messages import ERROR_MEMBER_NOT_FOUND, ERROR_USER_NOT_FOUND, ERROR_MEMBER_NOT_EXISTS, ERROR_ACCESS, \
+    ERROR_INVALID_DATE_RANGE, ERROR_INVALID_PERCENTILES
+from app.db.db import run_after_commit
+from app.db.models import ResultRollup
+from app.repository.results_rollup import ResultsRollupRepository
+from app.services.results_stats import DEFAULT_HISTOGRAM_BINS, DEFAULT_PERCENTILES, STATS_COLUMNS, \
+    score_distribution, to_arrays
 from app.utils.repository import AbstractRepository
 
+# Over raw results rows
+RATING_AGGREGATES = {
+    "attempts": ("count", "id"),
+    "result_right_count": ("sum", "result_right_count"),
+    "result_total_count": ("sum", "result_total_count"),
+}
+# Over results_rollup rows
+ROLLUP_RATING_AGGREGATES = {
+    "attempts": ("sum", "attempts"),
+    "result_right_count": ("sum", "result_right_count"),
+    "result_total_count": ("sum", "result_total_count"),
+}
+LEADERBOARD_COLUMNS = ["result_quiz_id", "result_user_id", "result_right_count", "result_total_count"]
+SKETCH_COLUMNS = ["result_quiz_id", "result_right_count", "result_total_count"]
+DASHBOARD_COLUMNS = ["result_quiz_id", "result_user_id", "attempts", "result_right_count", "result_total_count",
+                     "last_attempt_at"]
+LAST_ATTEMPT_AGGREGATES = {
+    "last_attempt_date": ("max", "last_attempt_at"),
+}
+AVERAGE_BY_TIME_AGGREGATES = {
+    "last_attempt_date": ("max", "last_attempt_at"),
+    "result_right_count": ("sum", "result_right_count"),
+    "result_total_count": ("sum", "result_total_count"),
+}
+
 
 class ResultsService:
-    def __init__(self, results_repo: AbstractRepository):
-        self.results_repo: AbstractRepository = results_repo()
+    def __init__(self,
+                 results_repo: AbstractRepository,
+                 session: AsyncSession = None,
+                 read_session: AsyncSession = None,
+                 rollup_repo: AbstractRepository = ResultsRollupRepository):
+        self.session = session
+        self.results_repo: AbstractRepository = results_repo(session, read_session)
+        self.rollup_repo: AbstractRepository = rollup_repo(session, read_session)
 
     async def valid_result_access(self, current_user: int, member: dict, company: dict):
         if not member and company.owner_id != current_user:
@@ -16,6 +55,14 @@ class ResultsService:
         if company.owner_id != current_user and not member.is_admin:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_ACCESS)
 
+    async def valid_rating_access(self, member: dict, company: dict, current_user: int):
+        if member is None and company.owner_id != current_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_MEMBER_NOT_FOUND)
+
+    async def valid_percentiles(self, percentiles):
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_INVALID_PERCENTILES)
+
     async def calculate_average_rating(self, user_results):
         total_right_count = sum(result.result_right_count for result in user_results)
         total_total_count = sum(result.result_total_count for result in user_results)
@@ -27,13 +74,36 @@ class ResultsService:
                           current_user: int,
                           correct_count: int,
                           total_count: int):
-        await self.results_repo.add_one({
+        # With a request session both writes share its transaction, so the rollup never drifts from results
+        result = {
             "result_user_id": current_user,
             "result_company_id": company_id,
             "result_quiz_id": quiz_id,
             "result_right_count": correct_count,
             "result_total_count": total_count,
-        })
+            "created_at": datetime.utcnow(),
+        }
+        await self.results_repo.add_one(result)
+        await self.rollup_repo.add_attempt(result)
+
+    async def after_commit(self, callback):
+        # Side effects that must not run before the new results are visible, e.g. cache invalidation
+        if self.session is None:
+            await callback()
+        else:
+            run_after_commit(self.session, callback)
+
+    async def get_company_rollup(self, company_id: int) -> list:
+        return await self.rollup_repo.filter_columns(DASHBOARD_COLUMNS, {"result_company_id": company_id})
+
+    async def get_leaderboard_totals(self, company_id: int) -> list:
+        return await self.rollup_repo.filter_columns(LEADERBOARD_COLUMNS, {"result_company_id": company_id})
+
+    def stream_sketch_rows(self, company_id: int, batch_size: int):
+        return self.results_repo.stream_columns(SKETCH_COLUMNS, {"result_company_id": company_id}, batch_size)
+
+    async def rebuild_rollup(self) -> int:
+        return await self.rollup_repo.rebuild()
 
     async def get_user_average_rating_in_company(self,
                                                  user_id: int,
@@ -41,96 +111,96 @@ class ResultsService:
                                                  member: dict,
                                                  company: dict,
                                                  current_user: int) -> int:
-        if member is None and company.owner_id != current_user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_MEMBER_NOT_FOUND)
+        await self.valid_rating_access(member, company, current_user)
 
-        user_results = await self.results_repo.filter(
-            {
-                "result_user_id": user_id,
-                "result_company_id": company_id,
-            }
-        )
-        if not user_results:
-            raise HTTPException(status_code=404, detail=ERROR_USER_NOT_FOUND)
-        return await self.calculate_average_rating(user_results)
+        return await self._average_rating({
+            "result_user_id": user_id,
+            "result_company_id": company_id,
+        })
 
     async def get_system_average_rating(self,
                                         user_id: int) -> int:
-        user_results = await self.results_repo.filter(
-            {
-                "result_user_id": user_id,
-            }
-        )
-        if not user_results:
+        return await self._average_rating({
+            "result_user_id": user_id,
+        })
+
+    async def _average_rating(self, filter_by: dict):
+        # Sums are computed by the database over the rollup, the single totals row is rated like a one-attempt list
+        totals = (await self.rollup_repo.aggregate(ROLLUP_RATING_AGGREGATES, filter_by))[0]
+        if not totals.attempts:
             raise HTTPException(status_code=404, detail=ERROR_USER_NOT_FOUND)
-        return await self.calculate_average_rating(user_results)
+        return await self.calculate_average_rating([totals])
 
     async def get_last_attempt_time_for_user_quiz(self, user_id: int, quiz_id: int):
-        return await self.results_repo.get_max_by_filter(Result.created_at,
-                                                         {"result_user_id": user_id,
-                                                          "result_quiz_id": quiz_id})
+        return await self.rollup_repo.get_max_by_filter(ResultRollup.last_attempt_at,
+                                                        {"result_user_id": user_id,
+                                                         "result_quiz_id": quiz_id})
 
-    async def get_last_attempt_times_for_all_quizzes(self, quizzes: list):
-        quiz_last_attempt_times = []
+    async def _aggregate_by(self, aggregates: dict, group_by: str, ids: list, filter_by: dict = None) -> dict:
+        # One grouped query for every id at once, keyed by the group column; ids without results are absent
+        if not ids:
+            return {}
+        rows = await self.rollup_repo.aggregate(aggregates, filter_by or {}, group_by=[group_by],
+                                                filter_in={group_by: ids})
+        return {getattr(row, group_by): row for row in rows}
 
-        for quiz in quizzes:
-            last_attempt_date = await self.results_repo.get_max_by_filter(Result.created_at,
-                                                                          {"result_quiz_id": quiz.id})
+    async def _rating(self, totals) -> float:
+        return await self.calculate_average_rating([totals] if totals else [])
 
-            quiz_last_attempt_times.append({
-                "quiz_id": quiz.id,
-                "quiz_name": quiz.quiz_name,
-                "last_attempt_date": last_attempt_date,
-            })
+    async def get_last_attempt_times_for_all_quizzes(self, quizzes: list):
+        last_attempts = await self._aggregate_by(LAST_ATTEMPT_AGGREGATES, "result_quiz_id",
+                                                 [quiz.id for quiz in quizzes])
+
+        return [{
+            "quiz_id": quiz.id,
+            "quiz_name": quiz.quiz_name,
+            "last_attempt_date": last_attempts[quiz.id].last_attempt_date if quiz.id in last_attempts else None,
+        } for quiz in quizzes]
 
-        return quiz_last_attempt_times
+    async def stream_per_batch(self, batches, compute):
+        # Runs an analytics method once per batch of quizzes/users and yields its rows one by one
+        async for batch in batches:
+            for row in await compute(batch):
+                yield row
 
     async def get_average_quiz_by_time(self, quizzes: list):
+        totals = await self._aggregate_by(AVERAGE_BY_TIME_AGGREGATES, "result_quiz_id",
+                                          [quiz.id for quiz in quizzes])
         average_quiz = []
 
         for quiz in quizzes:
-            last_attempt_date = await self.results_repo.get_max_by_filter(Result.created_at,
-                                                                          {"result_quiz_id": quiz.id})
-            quizz = await self.results_repo.filter({"result_quiz_id": quiz.id})
-            average_quizz = await self.calculate_average_rating(quizz)
-
+            quiz_totals = totals.get(quiz.id)
             average_quiz.append({
                 "quiz_id": quiz.id,
-                "average_quizz": average_quizz,
-                "last_attempt_date": last_attempt_date,
+                "average_quizz": await self._rating(quiz_totals),
+                "last_attempt_date": quiz_totals.last_attempt_date if quiz_totals else None,
             })
 
         return average_quiz
 
     async def get_last_attempt_times_for_all_users(self, users: list, current_user: int, member: dict, company: dict):
         await self.valid_result_access(current_user, member, company)
-        user_last_attempt_times = []
-
-        for user in users:
-            last_attempt_date = await self.results_repo.get_max_by_filter(Result.created_at,
-                                                                          {"result_user_id": user.id})
+        last_attempts = await self._aggregate_by(LAST_ATTEMPT_AGGREGATES, "result_user_id",
+                                                 [user.user_id for user in users])
 
-            user_last_attempt_times.append({
-                "user_id": user.user_id,
-                "last_attempt_date": last_attempt_date,
-            })
-
-        return user_last_attempt_times
+        return [{
+            "user_id": user.user_id,
+            "last_attempt_date": last_attempts[user.user_id].last_attempt_date
+            if user.user_id in last_attempts else None,
+        } for user in users]
 
     async def get_average_users_by_time(self, users: list, current_user: int, member: dict, company: dict):
         await self.valid_result_access(current_user, member, company)
+        totals = await self._aggregate_by(AVERAGE_BY_TIME_AGGREGATES, "result_user_id",
+                                          [user.user_id for user in users])
         average_users = []
 
         for user in users:
-            last_attempt_date = await self.results_repo.get_max_by_filter(Result.created_at,
-                                                                          {"result_user_id": user.user_id})
-            userss = await self.results_repo.filter({"result_user_id": user.user_id})
-            average_user = await self.calculate_average_rating(userss)
-
+            user_totals = totals.get(user.user_id)
             average_users.append({
                 "user_id": user.user_id,
-                "average_user": average_user,
-                "last_attempt_date": last_attempt_date,
+                "average_user": await self._rating(user_totals),
+                "last_attempt_date": user_totals.last_attempt_date if user_totals else None,
             })
 
         return average_users
@@ -142,22 +212,71 @@ class ResultsService:
                                                             member: dict,
                                                             company: dict):
         await self.valid_result_access(current_user, member, company)
+        totals = await self._aggregate_by(AVERAGE_BY_TIME_AGGREGATES, "result_quiz_id",
+                                          [quiz.id for quiz in quizzes],
+                                          {"result_user_id": users_id, "result_company_id": company.id})
         average_quiz = []
 
         for quiz in quizzes:
-            last_attempt_date = await self.results_repo.get_max_by_filter(Result.created_at,
-                                                                          {"result_quiz_id": quiz.id})
-            userss = await self.results_repo.filter({"result_quiz_id": quiz.id,
-                                                     "result_user_id": users_id,
-                                                     "result_company_id": company.id})
-            average_user = await self.calculate_average_rating(userss)
-
+            quiz_totals = totals.get(quiz.id)
             average_quiz.append({
                 "user_id": users_id,
                 "company_id": company.id,
                 "result_quiz_id": quiz.id,
-                "average_user": average_user,
-                "last_attempt_date": last_attempt_date,
+                "average_user": await self._rating(quiz_totals),
+                "last_attempt_date": quiz_totals.last_attempt_date if quiz_totals else None,
             })
 
         return average_quiz
+
+    async def get_score_series(self, filter_by: dict, bucket: str, date_from: datetime, date_to: datetime) -> list:
+        # results.created_at is naive UTC, aware bounds are converted so the comparison is well defined
+        date_from, date_to = self._naive_utc(date_from), self._naive_utc(date_to)
+        if date_from >= date_to:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_INVALID_DATE_RANGE)
+        rows = await self.results_repo.aggregate_by_period(RATING_AGGREGATES, filter_by, bucket, "created_at",
+                                                           date_from, date_to)
+        return [{
+            "bucket": row.bucket,
+            "attempts": row.attempts,
+            "average_score": await self.calculate_average_rating([row]),
+        } for row in rows]
+
+    async def get_company_score_series(self,
+                                       company: dict,
+                                       member: dict,
+                                       current_user: int,
+                                       bucket: str,
+                                       date_from: datetime,
+                                       date_to: datetime,
+                                       quiz_id: int = None,
+                                       user_id: int = None) -> list:
+        await self.valid_result_access(current_user, member, company)
+        filter_by = {"result_company_id": company.id}
+        if quiz_id is not None:
+            filter_by["result_quiz_id"] = quiz_id
+        if user_id is not None:
+            filter_by["result_user_id"] = user_id
+        return await self.get_score_series(filter_by, bucket, date_from, date_to)
+
+    async def get_score_distribution(self,
+                                     company: dict,
+                                     member: dict,
+                                     current_user: int,
+                                     quiz_id: int = None,
+                                     percentiles: list = DEFAULT_PERCENTILES,
+                                     bins: int = DEFAULT_HISTOGRAM_BINS) -> dict:
+        await self.valid_result_access(current_user, member, company)
+        await self.valid_percentiles(percentiles)
+        filter_by = {"result_company_id": company.id}
+        if quiz_id is not None:
+            filter_by["result_quiz_id"] = quiz_id
+        rows = await self.results_repo.filter_columns(STATS_COLUMNS, filter_by)
+        scores, attempts, first_attempt, last_attempt = to_arrays(rows)
+        return score_distribution(scores, attempts, first_attempt, last_attempt, percentiles, bins)
+
+    @staticmethod
+    def _naive_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,52 @@
+from operator import itemgetter
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90, 95, 99)
+DEFAULT_HISTOGRAM_BINS = 10
+# Fetched as plain column tuples, never as ORM objects
+STATS_COLUMNS = ["result_right_count", "result_total_count", "created_at"]
+
+
+def to_arrays(rows: list) -> tuple:
+    # rows are (result_right_count, result_total_count, created_at) tuples. Returns the per-attempt scores
+    # as an array (attempts without questions dropped), the number of attempts and the first/last attempt time.
+    # Counts are copied straight into float arrays with fromiter; created_at is only reduced to min/max,
+    # converting every datetime to datetime64 would cost more than all the statistics together.
+    count = len(rows)
+    if not count:
+        return np.empty(0), 0, None, None
+    right = np.fromiter(map(itemgetter(0), rows), dtype=np.float64, count=count)
+    total = np.fromiter(map(itemgetter(1), rows), dtype=np.float64, count=count)
+    answered = total > 0
+    created_at = list(map(itemgetter(2), rows))
+    return right[answered] / total[answered], count, min(created_at), max(created_at)
+
+
+def score_distribution(scores: np.ndarray,
+                       attempts: int,
+                       first_attempt=None,
+                       last_attempt=None,
+                       percentiles=DEFAULT_PERCENTILES,
+                       bins: int = DEFAULT_HISTOGRAM_BINS) -> dict:
+    counts, edges = np.histogram(scores, bins=bins, range=(0.0, 1.0))
+    distribution = {
+        "attempts": attempts,
+        "scored_attempts": int(scores.size),
+        "histogram": {"edges": edges.round(6).tolist(), "counts": counts.tolist()},
+        "first_attempt": first_attempt,
+        "last_attempt": last_attempt,
+    }
+    if not scores.size:
+        return {**distribution, "mean": None, "median": None, "std": None, "min": None, "max": None,
+                "percentiles": {f"{p:g}": None for p in percentiles}}
+    values = np.percentile(scores, [50, *percentiles])
+    return {
+        **distribution,
+        "mean": float(scores.mean()),
+        "median": float(values[0]),
+        "std": float(scores.std()),
+        "min": float(scores.min()),
+        "max": float(scores.max()),
+        "percentiles": {f"{p:g}": float(v) for p, v in zip(percentiles, values[1:])},
+    }
@@ -7,6 +7,7 @@ from app.repository.quizzes import QuizzesRepository
 from app.repository.results import ResultsRepository
 from app.services.companies import CompanyService
 from app.services.company_members import CompanyMembersService
+from app.services.dashboard import DashboardService
 from app.services.notifications import NotificationsService
 from app.services.quizzes import QuizService
 from app.services.results import ResultsService
@@ -33,3 +34,13 @@ async def schedule_notification_sender():
                     days_since_last_attempt = (datetime.utcnow() - last_attempt_date).days
                     if days_since_last_attempt >= quiz.quiz_frequency:
                         await notification_service.add_notifications_about_time_to_quizz(user.user_id, quiz.id)
+
+
+async def schedule_dashboard_snapshots():
+    companies_service = CompanyService(CompanyRepository)
+    dashboard_service = DashboardService(ResultsService(ResultsRepository),
+                                         QuizService(QuizzesRepository),
+                                         CompanyMembersService(CompanyMembersRepository))
+    companies = await companies_service.get_all_companies()
+    for company in companies:
+        await dashboard_service.refresh_snapshot(company)
@@ -0,0 +1,133 @@
+from operator import itemgetter
+
+import numpy as np
+
+from app.db.db import get_redis
+
+SKETCH_PREFIX = "score_sketch"
+# Scores are right / total, always in [0, 1], so a fixed-width histogram is a mergeable quantile sketch with
+# a hard error bound: a quantile is answered with the midpoint of the bin holding the exact nearest-rank
+# value, at most 1 / (2 * SKETCH_BINS) = 0.0005 away from it, whatever the number or order of scores.
+SKETCH_BINS = 1000
+MAX_QUANTILE_ERROR = 1 / (2 * SKETCH_BINS)
+
+
+class ScoreSketch:
+    def __init__(self, counts: dict = None):
+        # bin index -> number of scores in it, only non-empty bins are kept
+        self.counts = counts or {}
+
+    @staticmethod
+    def bin_of(score: float) -> int:
+        return min(int(score * SKETCH_BINS), SKETCH_BINS - 1)
+
+    @classmethod
+    def from_redis(cls, raw: dict) -> "ScoreSketch":
+        return cls({int(index): int(count) for index, count in raw.items()})
+
+    @classmethod
+    def from_scores(cls, scores: np.ndarray) -> "ScoreSketch":
+        counts = np.bincount(np.minimum((scores * SKETCH_BINS).astype(np.int64), SKETCH_BINS - 1),
+                             minlength=SKETCH_BINS)
+        return cls({int(index): int(counts[index]) for index in np.flatnonzero(counts)})
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, score: float, count: int = 1):
+        index = self.bin_of(score)
+        self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other: "ScoreSketch") -> "ScoreSketch":
+        counts = dict(self.counts)
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        return ScoreSketch(counts)
+
+    def quantiles(self, percentiles) -> dict:
+        # Nearest-rank percentiles in one pass over at most SKETCH_BINS bins
+        total = self.total
+        if not total:
+            return {f"{p:g}": None for p in percentiles}
+        ranks = sorted((max(int(np.ceil(p / 100 * total)), 1), p) for p in percentiles)
+        result = {}
+        seen = 0
+        position = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while position < len(ranks) and ranks[position][0] <= seen:
+                result[f"{ranks[position][1]:g}"] = (index + 0.5) / SKETCH_BINS
+                position += 1
+        return {f"{p:g}": result[f"{p:g}"] for p in percentiles}
+
+
+class ScoreSketchService:
+    @staticmethod
+    def _key(company_id: int = None, quiz_id: int = None) -> str:
+        scope = f"quiz:{quiz_id}" if quiz_id is not None else f"company:{company_id}"
+        return f"{SKETCH_PREFIX}:{scope}"
+
+    async def record_result(self, company_id: int, quiz_id: int, correct_count: int, total_count: int):
+        if not total_count:
+            return
+        index = ScoreSketch.bin_of(correct_count / total_count)
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(self._key(company_id), index, 1)
+            pipe.hincrby(self._key(quiz_id=quiz_id), index, 1)
+            await pipe.execute()
+
+    async def get_sketch(self, company_ids: list = (), quiz_id: int = None) -> ScoreSketch:
+        # A quiz sketch, or the merge of the given companies' sketches
+        keys = [self._key(quiz_id=quiz_id)] if quiz_id is not None else [self._key(c) for c in company_ids]
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            raws = await pipe.execute()
+        sketch = ScoreSketch()
+        for raw in raws:
+            sketch = sketch.merge(ScoreSketch.from_redis(raw))
+        return sketch
+
+    async def get_percentiles(self, percentiles, company_ids: list = (), quiz_id: int = None) -> dict:
+        sketch = await self.get_sketch(company_ids, quiz_id)
+        return {
+            "attempts": sketch.total,
+            "max_error": MAX_QUANTILE_ERROR,
+            "percentiles": sketch.quantiles(percentiles),
+        }
+
+    async def rebuild_company(self, company_id: int, batches):
+        # batches yield (result_quiz_id, result_right_count, result_total_count) rows of the company.
+        # Every sketch is written under a temporary key and renamed over the live one inside MULTI, like the
+        # leaderboard rebuild. Submits recorded while the rows were read are lost until the next rebuild.
+        quiz_sketches = {}
+        company_sketch = ScoreSketch()
+        async for rows in batches:
+            rows = [row for row in rows if row[0] is not None and row[1] is not None and row[2]]
+            if not rows:
+                continue
+            quiz_ids = np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=len(rows))
+            scores = (np.fromiter(map(itemgetter(1), rows), dtype=np.float64, count=len(rows))
+                      / np.fromiter(map(itemgetter(2), rows), dtype=np.float64, count=len(rows)))
+            company_sketch = company_sketch.merge(ScoreSketch.from_scores(scores))
+            for quiz_id in np.unique(quiz_ids):
+                sketch = ScoreSketch.from_scores(scores[quiz_ids == quiz_id])
+                quiz_sketches[int(quiz_id)] = quiz_sketches.get(int(quiz_id), ScoreSketch()).merge(sketch)
+
+        redis = await get_redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            for key, sketch in [(self._key(company_id), company_sketch),
+                                *((self._key(quiz_id=q), s) for q, s in quiz_sketches.items())]:
+                if not sketch.counts:
+                    pipe.delete(key)
+                    continue
+                pipe.delete(f"{key}:rebuild")
+                pipe.hset(f"{key}:rebuild", mapping=sketch.counts)
+                pipe.rename(f"{key}:rebuild", key)
+            await pipe.execute()
+
+
+score_sketch_service = ScoreSketchService()
@@ -26,6 +26,9 @@ class UsersService:
     async def get_users(self, limit: int, offset: int):
         return await self.users_repo.find_all(limit, offset)
 
+    async def get_users_page(self, limit: int, after: str = None):
+        return await self.users_repo.find_all_by_cursor(limit, after)
+
     async def get_user_by_id(self, user_id: int):
         filter_by = {"id": user_id}
         user = await self.users_repo.find_by_filter(filter_by)
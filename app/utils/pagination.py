@@ -0,0 +1,39 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from starlette import status
+
+from app.conf.messages import ERROR_INVALID_CURSOR
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row, order_by: str = "id") -> str:
+    position = {"id": row.id}
+    if order_by != "id":
+        value = getattr(row, order_by)
+        position[order_by] = value.isoformat() if isinstance(value, datetime) else value
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str = "id") -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        if order_by == "created_at":
+            position["created_at"] = datetime.fromisoformat(position["created_at"])
+        if not isinstance(position["id"], int) or order_by not in position:
+            raise ValueError(cursor)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_INVALID_CURSOR)
+    return position
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -1,11 +1,16 @@
+import operator
+import time
 from abc import ABC, abstractmethod
-from datetime import timedelta
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from redis.asyncio import Redis
-from sqlalchemy import insert, select, update, delete, func
+from sqlalchemy import insert, select, update, delete, func, tuple_, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.db import async_session
+from app.utils.pagination import encode_cursor, decode_cursor
 
 
 class AbstractRepository(ABC):
@@ -13,14 +18,31 @@ class AbstractRepository(ABC):
     async def add_one(self, data: dict) -> int:
         raise NotImplementedError
 
+    @abstractmethod
+    async def add_many(self, data: List[dict], return_ids: bool = False) -> Optional[List[int]]:
+        raise NotImplementedError
+
     @abstractmethod
     async def find_all(self, limit: int, offset: int) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
+    @abstractmethod
+    async def find_all_by_cursor(self, limit: int, after: Optional[str],
+                                 order_by: str = "id") -> Tuple[List[Any], Optional[str]]:
+        raise NotImplementedError
+
     @abstractmethod
     async def find_all_without_pagination(self) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
+    @abstractmethod
+    async def filter_columns(self, columns: List[str], filter_by: dict) -> List[Tuple]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_columns(self, columns: List[str], filter_by: dict, batch_size: int) -> AsyncIterator[List[Tuple]]:
+        raise NotImplementedError
+
     @abstractmethod
     async def find_by_filter(self, filter_by: dict):
         raise NotImplementedError
@@ -29,6 +51,11 @@ class AbstractRepository(ABC):
     async def filter_by(self, limit: int, offset: int, filter_by: dict) -> Optional[Dict[str, Any]]:
         raise NotImplementedError
 
+    @abstractmethod
+    async def filter_by_cursor(self, limit: int, after: Optional[str], filter_by: dict,
+                               order_by: str = "id") -> Tuple[List[Any], Optional[str]]:
+        raise NotImplementedError
+
     @abstractmethod
     async def filter_all_by(self, filter_by: dict) -> Optional[Dict[str, Any]]:
         raise NotImplementedError
@@ -45,6 +72,10 @@ class AbstractRepository(ABC):
     async def update_by_filter(self, filter_by: dict, data: dict) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    async def update_by_filter_returning(self, filter_by: dict, data: dict) -> List[Any]:
+        raise NotImplementedError
+
     @abstractmethod
     async def delete_by_id(self, record_id: int) -> None:
         raise NotImplementedError
@@ -53,90 +84,280 @@ class AbstractRepository(ABC):
     async def get_max_by_filter(self, filter_max, filter_by):
         raise NotImplementedError
 
+    @abstractmethod
+    async def aggregate(self, aggregates: Dict[str, Tuple[str, str]], filter_by: dict,
+                        group_by: List[str] = None, having: Dict[str, Tuple[str, Any]] = None,
+                        filter_in: Dict[str, list] = None) -> List[Tuple]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def aggregate_by_period(self, aggregates: Dict[str, Tuple[str, str]], filter_by: dict, period: str,
+                                  date_column: str, date_from: datetime, date_to: datetime) -> List[Tuple]:
+        raise NotImplementedError
+
     @abstractmethod
     async def delete_by_filter(self, filter_by: dict) -> None:
         raise NotImplementedError
 
 
+HAVING_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+DATE_TRUNC_PERIODS = ("hour", "day", "week", "month")
+
+
 class SQLAlchemyRepository(AbstractRepository):
     model = None
 
+    def __init__(self, session: Optional[AsyncSession] = None, read_session: Optional[AsyncSession] = None):
+        # When a request-scoped session is given (unit-of-work mode) every method runs in
+        # its transaction and the commit is left to get_db, otherwise each call opens its own session.
+        # Reads go to read_session (the replica) if given, writes always go to the primary.
+        self.session = session
+        self.read_session = read_session
+
+    @asynccontextmanager
+    async def _session(self):
+        if self.session is not None:
+            yield self.session
+        else:
+            async with async_session() as session:
+                yield session
+
+    @asynccontextmanager
+    async def _read_session(self):
+        # Once the request has written through the primary session its reads stay there (read-your-writes).
+        # Without a request session there is nothing tracking writes, so reads stay on the primary as well.
+        if self.session is not None and (self.read_session is None or self.session.info.get("has_writes")):
+            yield self.session
+        elif self.read_session is not None:
+            yield self.read_session
+        else:
+            async with self._session() as session:
+                yield session
+
+    async def _commit(self, session: AsyncSession) -> None:
+        if self.session is None:
+            await session.commit()
+        else:
+            session.info["has_writes"] = True
+
+    def _keyset(self, statement, limit: int, after: Optional[str], order_by: str):
+        # Seek past the last row of the previous page instead of OFFSET, ties on order_by are broken by id
+        if order_by == "id":
+            if after is not None:
+                statement = statement.where(self.model.id > decode_cursor(after)["id"])
+            return statement.order_by(self.model.id).limit(limit)
+        column = getattr(self.model, order_by)
+        if after is not None:
+            cursor = decode_cursor(after, order_by)
+            statement = statement.where(tuple_(column, self.model.id) > tuple_(cursor[order_by], cursor["id"]))
+        return statement.order_by(column, self.model.id).limit(limit)
+
+    async def _page(self, statement, limit: int, after: Optional[str], order_by: str) -> tuple:
+        async with self._read_session() as session:
+            res = await session.execute(self._keyset(statement, limit, after, order_by))
+            rows = res.scalars().all()
+            next_cursor = encode_cursor(rows[-1], order_by) if rows and len(rows) == limit else None
+            return rows, next_cursor
+
     async def add_one(self, data: dict) -> int:
-        async with async_session() as session:
+        async with self._session() as session:
             statement = insert(self.model).values(**data).returning(self.model.id)
             res = await session.execute(statement)
-            await session.commit()
+            await self._commit(session)
             return res.scalar_one()
 
+    async def add_many(self, data: List[dict], return_ids: bool = False) -> Optional[List[int]]:
+        # A list of parameter sets runs as one batched INSERT (executemany / insertmanyvalues) in one transaction
+        if not data:
+            return [] if return_ids else None
+        async with self._session() as session:
+            statement = insert(self.model)
+            if return_ids:
+                statement = statement.returning(self.model.id, sort_by_parameter_order=True)
+            res = await session.execute(statement, data)
+            await self._commit(session)
+            return res.scalars().all() if return_ids else None
+
     async def find_all(self, limit: int, offset: int) -> list:
-        async with async_session() as session:
-            statement = select(self.model)
+        async with self._read_session() as session:
+            statement = select(self.model).order_by(self.model.id)
             statement = statement.limit(limit).offset(offset)
             res = await session.execute(statement)
             return res.scalars().all()
 
+    async def find_all_by_cursor(self, limit: int, after: Optional[str], order_by: str = "id") -> tuple:
+        return await self._page(select(self.model), limit, after, order_by)
+
     async def find_all_without_pagination(self) -> list:
-        async with async_session() as session:
+        async with self._read_session() as session:
             statement = select(self.model)
             res = await session.execute(statement)
             return res.scalars().all()
 
     async def filter_by(self, limit: int, offset: int, filter_by: dict) -> list:
-        async with async_session() as session:
-            statement = select(self.model).filter_by(**filter_by).limit(limit).offset(offset)
+        async with self._read_session() as session:
+            statement = select(self.model).filter_by(**filter_by).order_by(self.model.id).limit(limit).offset(offset)
             res = await session.execute(statement)
             return res.scalars().all()
 
+    async def filter_by_cursor(self, limit: int, after: Optional[str], filter_by: dict, order_by: str = "id") -> tuple:
+        return await self._page(select(self.model).filter_by(**filter_by), limit, after, order_by)
+
     async def filter_all_by(self, filter_by: dict) -> list:
-        async with async_session() as session:
+        async with self._read_session() as session:
             statement = select(self.model).filter_by(**filter_by)
             res = await session.execute(statement)
             return res.scalars().all()
 
     async def get_max_by_filter(self, filter_max, filter_by):
-        async with async_session() as session:
+        async with self._read_session() as session:
             statement = select(func.max(filter_max)).filter_by(**filter_by)
             max_value = await session.execute(statement)
             return max_value.scalar()
 
+    async def aggregate(self,
+                        aggregates: dict,
+                        filter_by: dict,
+                        group_by: list = None,
+                        having: dict = None,
+                        filter_in: dict = None) -> list:
+        # aggregates maps a result label to (sql function, column), e.g. {"total": ("sum", "result_total_count")},
+        # having maps a label to (operator, value), filter_in maps a column to the values for an IN filter;
+        # rows come back as Row tuples with group_by columns first
+        expressions = self._aggregate_expressions(aggregates)
+        group_columns = [getattr(self.model, column) for column in group_by or []]
+        async with self._read_session() as session:
+            statement = select(*group_columns, *expressions.values()).filter_by(**filter_by)
+            for column, values in (filter_in or {}).items():
+                statement = statement.where(getattr(self.model, column).in_(values))
+            if group_columns:
+                statement = statement.group_by(*group_columns)
+            for label, (op, value) in (having or {}).items():
+                statement = statement.having(HAVING_OPERATORS[op](expressions[label], value))
+            res = await session.execute(statement)
+            return res.all()
+
+    async def aggregate_by_period(self,
+                                  aggregates: dict,
+                                  filter_by: dict,
+                                  period: str,
+                                  date_column: str,
+                                  date_from: datetime,
+                                  date_to: datetime) -> list:
+        # Groups rows of [date_from, date_to) by date_trunc(period, date_column), one row per non-empty bucket
+        # ordered by time; the bucket start comes back as "bucket" followed by the aggregates labels.
+        # The period is inlined (and so whitelisted) because select and GROUP BY must share the same expression
+        if period not in DATE_TRUNC_PERIODS:
+            raise ValueError(f"Unsupported period: {period}")
+        column = getattr(self.model, date_column)
+        bucket = func.date_trunc(literal_column(f"'{period}'"), column).label("bucket")
+        expressions = self._aggregate_expressions(aggregates)
+        async with self._read_session() as session:
+            statement = (select(bucket, *expressions.values())
+                         .filter_by(**filter_by)
+                         .where(column >= date_from, column < date_to)
+                         .group_by(bucket)
+                         .order_by(bucket))
+            res = await session.execute(statement)
+            return res.all()
+
+    def _aggregate_expressions(self, aggregates: dict) -> dict:
+        return {label: getattr(func, function)(getattr(self.model, column)).label(label)
+                for label, (function, column) in aggregates.items()}
+
     async def filter(self, filter_by: dict) -> list:
-        async with async_session() as session:
+        async with self._read_session() as session:
             statement = select(self.model).filter_by(**filter_by)
             res = await session.execute(statement)
             return res.scalars().all()
 
+    async def filter_columns(self, columns: List[str], filter_by: dict) -> list:
+        # Selects only the named columns and returns plain Row tuples (attribute access by column name),
+        # no ORM instances are built and nothing is added to the session identity map
+        async with self._read_session() as session:
+            statement = select(*(getattr(self.model, column) for column in columns)).filter_by(**filter_by)
+            res = await session.execute(statement)
+            return res.all()
+
+    async def stream_columns(self, columns: List[str], filter_by: dict, batch_size: int):
+        # Reads through a server-side cursor and yields batches of at most batch_size Row tuples in id order,
+        # so only one batch is held in memory however many rows match
+        async with self._read_session() as session:
+            statement = (select(*(getattr(self.model, column) for column in columns))
+                         .filter_by(**filter_by)
+                         .order_by(self.model.id)
+                         .execution_options(yield_per=batch_size))
+            res = await session.stream(statement)
+            async for batch in res.partitions():
+                yield batch
+
     async def find_by_filter(self, filter_by: dict):
-        async with async_session() as session:
+        async with self._read_session() as session:
             statement = select(self.model).filter_by(**filter_by)
             res = await session.execute(statement)
             return res.scalar_one_or_none()
 
     async def update_by_filter(self, filter_by: dict, data: dict) -> None:
-        async with async_session() as session:
+        async with self._session() as session:
             statement = update(self.model).filter_by(**filter_by).values(**data)
             await session.execute(statement)
-            await session.commit()
+            await self._commit(session)
+
+    async def update_by_filter_returning(self, filter_by: dict, data: dict) -> list:
+        # Conditional update in one statement: the filter doubles as the expected current state,
+        # so an empty list means nothing matched (or a concurrent request got there first)
+        async with self._session() as session:
+            statement = update(self.model).filter_by(**filter_by).values(**data).returning(self.model)
+            res = await session.execute(statement)
+            rows = res.scalars().all()
+            await self._commit(session)
+            return rows
 
     async def delete_by_id(self, record_id: int) -> None:
-        async with async_session() as session:
+        async with self._session() as session:
             statement = delete(self.model).where(self.model.id == record_id)
             await session.execute(statement)
-            await session.commit()
+            await self._commit(session)
 
     async def delete_by_filter(self, filter_by: dict) -> None:
-        async with async_session() as session:
+        async with self._session() as session:
             statement = delete(self.model).filter_by(**filter_by)
             await session.execute(statement)
-            await session.commit()
+            await self._commit(session)
 
 
 class RedisDataRepository:
-    async def store_data(self, redis: Redis, key: str, data: str, expiration_hours: int = 48):
-        await redis.set(key, data)
-        await redis.expire(key, timedelta(hours=expiration_hours))
+    async def store_data(self, redis: Redis, key: str, data, expiration_hours: int = 48,
+                         index_keys: List[str] = ()):
+        # The value is written with SET ... EX together with its index entries in one MULTI round trip.
+        # Index keys are sorted sets of data keys scored by their expiry time, so an entry lapses together
+        # with the data it points to; each write also trims lapsed entries and extends the index's own TTL
+        now = time.time()
+        expiration = timedelta(hours=expiration_hours)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, data, ex=expiration)
+            for index_key in index_keys:
+                pipe.zadd(index_key, {key: now + expiration.total_seconds()})
+                pipe.zremrangebyscore(index_key, "-inf", now)
+                pipe.expire(index_key, expiration)
+            await pipe.execute()
+
+    async def get_indexed_keys(self, redis: Redis, index_key: str) -> list:
+        return await redis.zrangebyscore(index_key, time.time(), "+inf")
 
     async def get_data(self, redis: Redis, key: str):
         return await redis.get(key)
 
+    async def get_many(self, redis: Redis, keys: List[str]) -> list:
+        return await redis.mget(keys)
+
     async def delete_data(self, redis: Redis, key: str):
         return await redis.delete(key)
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "json": "application/json",
+}
+
+
+async def ndjson_lines(rows):
+    async for row in rows:
+        yield json.dumps(jsonable_encoder(row)) + "\n"
+
+
+def ndjson_response(rows) -> StreamingResponse:
+    # One JSON document per line, written as soon as each row is produced
+    return StreamingResponse(ndjson_lines(rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def csv_chunks(batches, fieldnames):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    yield _drain(buffer)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield _drain(buffer)
+
+
+async def ndjson_chunks(batches):
+    async for batch in batches:
+        yield "".join(json.dumps(row) + "\n" for row in batch)
+
+
+async def json_array_chunks(batches):
+    separator = ""
+    yield "["
+    async for batch in batches:
+        if batch:
+            yield separator + ",".join(json.dumps(row) for row in batch)
+            separator = ","
+    yield "]"
+
+
+def export_chunks(batches, save_format: str, fieldnames):
+    if save_format == "csv":
+        return csv_chunks(batches, fieldnames)
+    if save_format == "ndjson":
+        return ndjson_chunks(batches)
+    return json_array_chunks(batches)
+
+
+def export_stream_response(chunks, save_format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[save_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}-results.{save_format}"'},
+    )
+
+
+def export_response(batches, save_format: str, name: str, fieldnames) -> StreamingResponse:
+    # Encodes each batch of row dicts as it arrives, the export is never held in memory or written to disk
+    return export_stream_response(export_chunks(batches, save_format, fieldnames), save_format, name)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
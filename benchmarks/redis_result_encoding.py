@@ -0,0 +1,109 @@
+"""Redis memory per cached quiz result: the old JSON value vs the packed value from app.services.redis.
+
+Payload sizes are computed offline. With a reachable Redis (REDIS_ENDPOINT_PROD) the script also writes
+--rows results in each encoding under a throwaway prefix, reports MEMORY USAGE and the used_memory delta
+per result, then deletes its keys:
+
+    python -m benchmarks.redis_result_encoding --rows 50000
+"""
+import argparse
+import json
+import random
+import uuid
+
+import redis
+
+from app.conf.config import conf
+from app.services.redis import RESULTS_EXPIRATION_HOURS, encode_result
+
+PIPELINE_SIZE = 1000
+
+
+def generate_results(count: int) -> list:
+    results = []
+    for _ in range(count):
+        total = random.randint(2, 30)
+        results.append({
+            "quiz_id": random.randint(1, 5_000),
+            "company_id": random.randint(1, 500),
+            "user_id": random.randint(1, 200_000),
+            "correct_count": random.randint(0, total),
+            "total_count": total,
+        })
+    return results
+
+
+def json_value(result: dict) -> bytes:
+    # What store_results wrote before the packed format
+    return json.dumps(result).encode()
+
+
+def packed_value(result: dict) -> bytes:
+    return encode_result(result["correct_count"], result["total_count"])
+
+
+def write(client: redis.Redis, prefix: str, results: list, encode) -> list:
+    keys = []
+    for start in range(0, len(results), PIPELINE_SIZE):
+        with client.pipeline(transaction=False) as pipe:
+            for i, result in enumerate(results[start:start + PIPELINE_SIZE], start):
+                # the index keeps keys unique when random ids collide
+                key = f"{prefix}:{result['quiz_id']}:{result['user_id']}:{result['company_id']}:{i}"
+                pipe.set(key, encode(result), ex=RESULTS_EXPIRATION_HOURS * 3600)
+                keys.append(key)
+            pipe.execute()
+    return keys
+
+
+def memory_usage(client: redis.Redis, keys: list) -> int:
+    total = 0
+    for start in range(0, len(keys), PIPELINE_SIZE):
+        with client.pipeline(transaction=False) as pipe:
+            for key in keys[start:start + PIPELINE_SIZE]:
+                pipe.memory_usage(key, samples=0)
+            total += sum(pipe.execute())
+    return total
+
+
+def delete(client: redis.Redis, keys: list):
+    for start in range(0, len(keys), PIPELINE_SIZE):
+        client.delete(*keys[start:start + PIPELINE_SIZE])
+
+
+def measure(client: redis.Redis, results: list, encode) -> tuple:
+    prefix = f"quiz_answers_bench_{uuid.uuid4().hex[:8]}"
+    before = client.info("memory")["used_memory"]
+    keys = write(client, prefix, results, encode)
+    after = client.info("memory")["used_memory"]
+    usage = memory_usage(client, keys)
+    delete(client, keys)
+    return usage / len(results), (after - before) / len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    results = generate_results(args.rows)
+    json_payload = sum(len(json_value(result)) for result in results) / len(results)
+    packed_payload = sum(len(packed_value(result)) for result in results) / len(results)
+    print(f"results: {args.rows}")
+    print(f"value bytes/result     json: {json_payload:7.1f}  packed: {packed_payload:7.1f}")
+
+    client = redis.Redis(host=conf.redis_endpoint_prod, db=0, socket_connect_timeout=2)
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        print(f"Redis not reachable ({e}), skipping server-side measurements")
+        return
+
+    json_usage, json_delta = measure(client, results, json_value)
+    packed_usage, packed_delta = measure(client, results, packed_value)
+    print(f"MEMORY USAGE/result    json: {json_usage:7.1f}  packed: {packed_usage:7.1f}")
+    print(f"used_memory/result     json: {json_delta:7.1f}  packed: {packed_delta:7.1f}")
+    print(f"saved per result:      {json_usage - packed_usage:7.1f} bytes ({1 - packed_usage / json_usage:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Distribution statistics: per-row Python over ORM objects vs the NumPy engine in app.services.results_stats.
+
+Run from the repository root (no database needed, rows are generated in memory):
+
+    python -m benchmarks.results_distribution --rows 200000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from app.db.models import Result
+from app.services.results_stats import DEFAULT_HISTOGRAM_BINS, DEFAULT_PERCENTILES, score_distribution, to_arrays
+
+
+def generate_rows(count: int) -> list:
+    started = datetime(2023, 1, 1)
+    rows = []
+    for i in range(count):
+        total = random.randint(0, 20)
+        rows.append((random.randint(0, total), total, started + timedelta(minutes=i)))
+    return rows
+
+
+def per_row(results: list) -> dict:
+    # What computing these stats looked like before: loop over Result objects in Python
+    scores = [r.result_right_count / r.result_total_count for r in results if r.result_total_count > 0]
+    quantiles = statistics.quantiles(scores, n=100, method="inclusive")
+    histogram = [0] * DEFAULT_HISTOGRAM_BINS
+    for score in scores:
+        histogram[min(int(score * DEFAULT_HISTOGRAM_BINS), DEFAULT_HISTOGRAM_BINS - 1)] += 1
+    return {
+        "mean": statistics.fmean(scores),
+        "median": statistics.median(scores),
+        "std": statistics.pstdev(scores),
+        "percentiles": {p: quantiles[p - 1] for p in DEFAULT_PERCENTILES},
+        "histogram": histogram,
+        "first_attempt": min(r.created_at for r in results),
+        "last_attempt": max(r.created_at for r in results),
+    }
+
+
+def vectorized(rows: list) -> dict:
+    return score_distribution(*to_arrays(rows))
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    results = [Result(result_right_count=right, result_total_count=total, created_at=created_at)
+               for right, total, created_at in rows]
+
+    slow, fast = per_row(results), vectorized(rows)
+    assert abs(slow["median"] - fast["median"]) < 1e-9 and abs(slow["std"] - fast["std"]) < 1e-9
+
+    per_row_seconds = best_of(args.repeat, per_row, results)
+    vectorized_seconds = best_of(args.repeat, vectorized, rows)
+    print(f"rows: {args.rows}")
+    print(f"per-row:    {per_row_seconds * 1000:9.1f} ms  {args.rows / per_row_seconds:12,.0f} rows/s")
+    print(f"vectorized: {vectorized_seconds * 1000:9.1f} ms  {args.rows / vectorized_seconds:12,.0f} rows/s")
+    print(f"speedup:    {per_row_seconds / vectorized_seconds:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Add composite indexes for hot queries
+
+Revision ID: 62507e2e16a5
+Revises: e780107c8845
+Create Date: 2026-10-18 10:12:31.418203
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '62507e2e16a5'
+down_revision: Union[str, None] = 'e780107c8845'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns - kept in sync with __table_args__ in app/db/models.py
+INDEXES = [
+    ('ix_results_user_company_created', 'results', ['result_user_id', 'result_company_id', 'created_at']),
+    ('ix_results_user_quiz_created', 'results', ['result_user_id', 'result_quiz_id', 'created_at']),
+    ('ix_results_quiz_created', 'results', ['result_quiz_id', 'created_at']),
+    ('ix_members_company_user', 'members', ['company_id', 'user_id']),
+    ('ix_actions_user_company_action', 'actions', ['user_id', 'company_id', 'action']),
+    ('ix_actions_company_action_id', 'actions', ['company_id', 'action', 'id']),
+    ('ix_questions_quiz_id', 'questions', ['question_quiz_id', 'id']),
+    ('ix_quizzes_company_id', 'quizzes', ['quiz_company_id', 'id']),
+    ('ix_notifications_user_is_read', 'notifications', ['user_id', 'is_read']),
+]
+
+
+def drop_invalid_index(name: str, table: str) -> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which if_not_exists would then keep
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if invalid:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction, so each index is built in autocommit mode
+    # and the tables stay writable while it runs; a retry after a failed run first drops the invalid
+    # leftover, then if_not_exists skips the indexes that were built
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            drop_invalid_index(name, table)
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
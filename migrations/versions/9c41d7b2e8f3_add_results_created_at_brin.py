@@ -0,0 +1,40 @@
+"""Add BRIN index on results.created_at
+
+Revision ID: 9c41d7b2e8f3
+Revises: 62507e2e16a5
+Create Date: 2026-10-18 14:05:12.730114
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41d7b2e8f3'
+down_revision: Union[str, None] = '62507e2e16a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # results is append-only, so created_at follows the physical row order and a BRIN index
+    # (a min/max per block range) lets date range scans skip most of the table at a tiny fraction of a btree's size
+    with op.get_context().autocommit_block():
+        # a failed concurrent build leaves an INVALID index that if_not_exists would keep, drop it first
+        invalid = op.get_bind().execute(
+            sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": "ix_results_created_at_brin"},
+        ).scalar()
+        if invalid:
+            op.drop_index('ix_results_created_at_brin', table_name='results',
+                          postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_results_created_at_brin', 'results', ['created_at'], unique=False,
+                        postgresql_using='brin', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_results_created_at_brin', table_name='results',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,49 @@
+"""Add results rollup table
+
+Revision ID: b3e5f0a7c214
+Revises: 9c41d7b2e8f3
+Create Date: 2026-10-18 15:21:44.102983
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e5f0a7c214'
+down_revision: Union[str, None] = '9c41d7b2e8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('results_rollup',
+    sa.Column('result_user_id', sa.Integer(), nullable=False),
+    sa.Column('result_company_id', sa.Integer(), nullable=False),
+    sa.Column('result_quiz_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('result_right_count', sa.Integer(), nullable=False),
+    sa.Column('result_total_count', sa.Integer(), nullable=False),
+    sa.Column('first_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_attempt_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['result_company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['result_user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('result_user_id', 'result_company_id', 'result_quiz_id')
+    )
+    # Backfill from existing results, same query as ResultsRollupRepository.rebuild
+    op.execute("""
+        INSERT INTO results_rollup (result_user_id, result_company_id, result_quiz_id, attempts,
+                                    result_right_count, result_total_count, first_attempt_at, last_attempt_at)
+        SELECT result_user_id, result_company_id, result_quiz_id, count(id),
+               coalesce(sum(result_right_count), 0), coalesce(sum(result_total_count), 0),
+               min(created_at), max(created_at)
+        FROM results
+        WHERE result_quiz_id IS NOT NULL
+        GROUP BY result_user_id, result_company_id, result_quiz_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('results_rollup')
@@ -5,7 +5,7 @@ from fastapi import HTTPException
 from starlette import status
 
 from app.conf.messages import ERROR_ACCESS, ERROR_USER_INVITED, ERROR_USER_NOT_REQUESTED, ERROR_USER_NOT_INVITED
-from app.db.models import User, Company
+from app.db.models import User, Company, UsersCompaniesActions
 from app.repository.actions import ActionsRepository
 from app.services.actions import ActionService
 
@@ -77,10 +77,12 @@ async def test_cancel_request_success():
     user_id = 1
     company = Company(id=1, owner_id=2)
     current_user = 1
-    action_service.get_actions = AsyncMock(return_value=[{"action": "request_sent"}])
-    action_service.actions_repo.update_by_filter = AsyncMock(return_value=1)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company.id)])
     result = await action_service.cancel_request(user_id, company, current_user)
-    assert isinstance(result, int)
+    assert result.id == 1
+    action_service.actions_repo.update_by_filter_returning.assert_awaited_once_with(
+        {"user_id": user_id, "company_id": company.id, "action": "request_sent"}, {"action": "request_canceled"})
 
 
 @pytest.mark.asyncio
@@ -99,7 +101,7 @@ async def test_cancel_request_not_found():
     user_id = 1
     company = Company(id=1, owner_id=2)
     current_user = 1
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
     with pytest.raises(HTTPException) as exc_info:
         await action_service.cancel_request(user_id, company, current_user)
     assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
@@ -174,10 +176,9 @@ async def test_cancel_invitation_success():
     user_id = 1
     company = Company(id=1, owner_id=1)
     current_user = 1
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company.id, "action": "invitation_sent"}])
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company.id)])
 
-    action_service.actions_repo.update_by_filter = AsyncMock()
     result = await action_service.cancel_invitation(user_id, company, current_user)
     assert result is not None
 
@@ -188,7 +189,7 @@ async def test_cancel_invitation_user_not_invited():
     company = Company(id=1, owner_id=2)
     current_user = 2
 
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
     with pytest.raises(HTTPException) as exc_info:
         await action_service.cancel_invitation(user_id, company, current_user)
 
@@ -201,9 +202,8 @@ async def test_accept_invitation_success():
     user_id = 1
     company_id = 1
     current_user = 1
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company_id, "action": "invitation_sent"}])
-    action_service.actions_repo.update_by_filter = AsyncMock()
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company_id)])
 
     result = await action_service.accept_invitation(user_id, company_id, current_user)
 
@@ -216,7 +216,7 @@ async def test_accept_invitation_user_not_invited():
     company_id = 1
     current_user = 1
 
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
 
     with pytest.raises(HTTPException) as exc_info:
         await action_service.accept_invitation(user_id, company_id, current_user)
@@ -230,8 +230,8 @@ async def test_refuse_invitation_success():
     user_id = 1
     company_id = 1
     current_user = 1
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company_id, "action": "invitation_sent"}])
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company_id)])
     result = await action_service.refuse_invitation(user_id, company_id, current_user)
 
     assert result is not None
@@ -242,8 +242,8 @@ async def test_refuse_invitation_access_denied():
     user_id = 1
     company_id = 1
     current_user = 2
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company_id, "action": "invitation_sent"}])
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company_id)])
 
     with pytest.raises(HTTPException) as exc_info:
         await action_service.refuse_invitation(user_id, company_id, current_user)
@@ -257,7 +257,7 @@ async def test_refuse_invitation_no_invitation_found():
     user_id = 1
     company_id = 1
     current_user = 1
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
     with pytest.raises(HTTPException) as exc_info:
         await action_service.refuse_invitation(user_id, company_id, current_user)
 
@@ -271,8 +271,8 @@ async def test_accept_request_success():
     company = Company(id=1, owner_id=2)
     current_user = 2
 
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company.id, "action": "request_sent"}])
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company.id)])
 
     result = action_service.accept_request(user_id, company, current_user)
 
@@ -284,7 +284,7 @@ async def test_accept_request_user_not_requested():
     user_id = 1
     company = Company(id=1, owner_id=2)
     current_user = 2
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
     with pytest.raises(HTTPException) as exc_info:
         await action_service.accept_request(user_id, company, current_user)
     assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
@@ -297,12 +297,12 @@ async def test_accept_request_success():
     company = Company(id=1, owner_id=2)
     current_user = 2
 
-    action_service.get_actions = AsyncMock(
-        return_value=[{"user_id": user_id, "company_id": company.id, "action": "request_sent"}])
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(
+        return_value=[UsersCompaniesActions(id=1, user_id=user_id, company_id=company.id)])
 
     result = await action_service.accept_request(user_id, company, current_user)
 
-    assert result is None
+    assert result.id == 1
 
 
 @pytest.mark.asyncio
@@ -311,7 +311,7 @@ async def test_accept_request_user_not_requested():
     company = Company(id=1, owner_id=2)
     current_user = 2
 
-    action_service.get_actions = AsyncMock(return_value=None)
+    action_service.actions_repo.update_by_filter_returning = AsyncMock(return_value=[])
     with pytest.raises(HTTPException) as exc_info:
         await action_service.accept_request(user_id, company, current_user)
 
@@ -0,0 +1,141 @@
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.services.analytics_cache import AnalyticsCache, GLOBAL_TAG, INVALIDATIONS_KEY, STAMP_SCRIPT, STORE_SCRIPT
+
+
+def cache_redis(redis_mock, cached=None, invalidations=None):
+    # The cache reads with MGET and writes through scripts, each registered script is one AsyncMock
+    redis, _ = redis_mock
+    redis.mget.return_value = [cached, invalidations]
+    scripts = {}
+
+    def register_script(source):
+        return scripts.setdefault(source, AsyncMock(return_value=1))
+
+    redis.register_script = MagicMock(side_effect=register_script)
+    return redis, scripts
+
+
+@pytest.mark.asyncio
+async def test_miss_computes_and_stores_with_scope_tags(redis_mock):
+    redis, scripts = cache_redis(redis_mock, invalidations=b"41")
+    cache = AnalyticsCache(ttl_seconds=30)
+    compute = AsyncMock(return_value=[{"user_id": 1, "last_attempt_date": datetime(2023, 10, 15)}])
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        value = await cache.get_or_compute("average_users_by_time", compute, scope={"company": 7})
+
+    assert value == compute.return_value
+    store = scripts[STORE_SCRIPT].call_args.kwargs
+    key = store["keys"][0]
+    assert key.startswith("analytics:average_users_by_time:company=7:")
+    assert redis.mget.call_args.args == (key, INVALIDATIONS_KEY)
+    assert store["keys"][1:] == ["analytics_tag:company:7", "analytics_invalidated:company:7"]
+    payload, ttl, tag_count, started = store["args"]
+    assert json.loads(payload) == [{"user_id": 1, "last_attempt_date": "2023-10-15T00:00:00"}]
+    assert (ttl, tag_count, started) == (30, 1, 41)
+    assert cache.snapshot()["misses"] == 1
+    redis.close.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_value_tags_invalidate_cross_company_user_entries(redis_mock):
+    redis, scripts = cache_redis(redis_mock)
+    cache = AnalyticsCache()
+    compute = AsyncMock(return_value=[{"user_id": 3, "average_user": 0.5}, {"user_id": 4, "average_user": 0.1}])
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        await cache.get_or_compute("average_users_by_time", compute, scope={"company": 7},
+                                   tags_from=lambda rows: {"user": [row["user_id"] for row in rows]})
+
+    keys = scripts[STORE_SCRIPT].call_args.kwargs["keys"]
+    assert keys[0] == cache._key("average_users_by_time", {"company": 7}, {})
+    assert keys[1:4] == ["analytics_tag:company:7", "analytics_tag:user:3", "analytics_tag:user:4"]
+
+
+@pytest.mark.asyncio
+async def test_hit_skips_compute(redis_mock):
+    redis, _ = cache_redis(redis_mock, cached=json.dumps({"rating": 0.5}))
+    cache = AnalyticsCache()
+    compute = AsyncMock()
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        value = await cache.get_or_compute("system_average_rating", compute, scope={"user": 1})
+
+    assert value == {"rating": 0.5}
+    compute.assert_not_awaited()
+    assert cache.snapshot()["hits"] == 1
+    assert cache.snapshot()["hit_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_params_are_part_of_the_key():
+    cache = AnalyticsCache()
+
+    day = cache._key("score_series", {"company": 1}, {"bucket": "day"})
+    week = cache._key("score_series", {"company": 1}, {"bucket": "week"})
+
+    assert day != week
+    assert cache._key("score_series", {"company": 1}, {"bucket": "day"}) == day
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_compute(redis_mock):
+    redis, _ = cache_redis(redis_mock)
+    redis.mget.side_effect = ConnectionError("down")
+    cache = AnalyticsCache()
+    compute = AsyncMock(return_value=0.7)
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        value = await cache.get_or_compute("system_average_rating", compute, scope={"user": 1})
+
+    assert value == 0.7
+    assert cache.snapshot()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_only_tagged_keys(redis_mock):
+    redis, scripts = cache_redis(redis_mock)
+    redis.sunion.return_value = {b"analytics:a", b"analytics:b"}
+    cache = AnalyticsCache()
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        await cache.invalidate(company_id=1, quiz_id=2, user_id=3)
+
+    tags = [GLOBAL_TAG, "analytics_tag:company:1", "analytics_tag:quiz:2", "analytics_tag:user:3"]
+    stamps = scripts[STAMP_SCRIPT].call_args.kwargs["keys"]
+    assert stamps == [INVALIDATIONS_KEY, "analytics_invalidated:global", "analytics_invalidated:company:1",
+                      "analytics_invalidated:quiz:2", "analytics_invalidated:user:3"]
+    redis.sunion.assert_awaited_once_with(tags)
+    deleted = redis.delete.call_args.args
+    assert set(deleted) == {b"analytics:a", b"analytics:b", *tags}
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_compute_is_not_overwritten_by_stale_value():
+    redis = fakeredis.FakeAsyncRedis()
+    cache = AnalyticsCache()
+
+    async def compute():
+        # a submit for one of the returned users lands while the value is being computed
+        await cache.invalidate(company_id=9, user_id=3)
+        return [{"user_id": 3, "average_user": 0.5}]
+
+    with patch("app.services.analytics_cache.get_redis", AsyncMock(return_value=redis)):
+        await cache.get_or_compute("average_users_by_time", compute, scope={"company": 7},
+                                   tags_from=lambda rows: {"user": [row["user_id"] for row in rows]})
+        assert await redis.keys("analytics:*") == []
+
+        fresh = AsyncMock(return_value=[{"user_id": 3, "average_user": 0.6}])
+        await cache.get_or_compute("average_users_by_time", fresh, scope={"company": 7},
+                                   tags_from=lambda rows: {"user": [row["user_id"] for row in rows]})
+        assert len(await redis.keys("analytics:*")) == 1
+
+        await cache.invalidate(company_id=9, user_id=3)
+        assert await redis.keys("analytics:*") == []
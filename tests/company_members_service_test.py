@@ -144,6 +144,19 @@ async def test_get_all_members():
     assert result == expected_members
 
 
+@pytest.mark.asyncio
+async def test_get_member_user_ids():
+    company_id = 1
+    rows = [(1,), (2,)]
+    company_members_service.comp_memb_repo.filter_columns = AsyncMock(return_value=rows)
+
+    result = await company_members_service.get_member_user_ids(company_id)
+
+    assert result == rows
+    company_members_service.comp_memb_repo.filter_columns.assert_awaited_once_with(["user_id"],
+                                                                                  {"company_id": company_id})
+
+
 @pytest.mark.asyncio
 async def test_add_admin_success():
     user_id = 1
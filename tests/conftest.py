@@ -1,3 +1,5 @@
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
 from fastapi import Depends
 from starlette.testclient import TestClient
@@ -10,3 +12,15 @@ from app.services.auth import auth_service
 @pytest.fixture
 def client():
     return TestClient(app)
+
+
+@pytest.fixture
+def redis_mock():
+    # The shared async Redis client with pipelines as async context managers, all yielding the same pipe
+    redis = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    redis.pipeline = MagicMock()
+    redis.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+    redis.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    return redis, pipe
@@ -0,0 +1,86 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.db.models import Company
+from app.repository.company_members import CompanyMembersRepository
+from app.repository.quizzes import QuizzesRepository
+from app.repository.results import ResultsRepository
+from app.services.company_members import CompanyMembersService
+from app.services.dashboard import DashboardService
+from app.services.quizzes import QuizService
+from app.services.results import ResultsService
+
+
+def make_dashboard_service():
+    service = DashboardService(ResultsService(ResultsRepository),
+                               QuizService(QuizzesRepository),
+                               CompanyMembersService(CompanyMembersRepository))
+    service.comp_memb_service.get_member_user_ids = AsyncMock(return_value=[
+        SimpleNamespace(user_id=1), SimpleNamespace(user_id=2), SimpleNamespace(user_id=3),
+    ])
+    service.quizzes_service.get_company_quizzes = AsyncMock(return_value=[
+        SimpleNamespace(id=10, quiz_name="Quiz 10", quiz_frequency=7),
+        SimpleNamespace(id=11, quiz_name="Quiz 11", quiz_frequency=1),
+    ])
+    now = datetime.utcnow()
+    service.results_service.get_company_rollup = AsyncMock(return_value=[
+        SimpleNamespace(result_quiz_id=10, result_user_id=1, attempts=2, result_right_count=8,
+                        result_total_count=10, last_attempt_at=now - timedelta(days=8)),
+        SimpleNamespace(result_quiz_id=10, result_user_id=2, attempts=1, result_right_count=1,
+                        result_total_count=5, last_attempt_at=now - timedelta(days=1)),
+        SimpleNamespace(result_quiz_id=11, result_user_id=1, attempts=1, result_right_count=5,
+                        result_total_count=5, last_attempt_at=now),
+    ])
+    return service
+
+
+@pytest.mark.asyncio
+async def test_build_snapshot():
+    service = make_dashboard_service()
+
+    snapshot = await service.build_snapshot(Company(id=1, owner_id=9))
+
+    members = {member["user_id"]: member for member in snapshot["members"]}
+    assert members[1]["attempts"] == 3 and members[1]["average"] == 13 / 15
+    assert members[3] == {"user_id": 3, "attempts": 0, "average": 0.0, "last_attempt_date": None}
+    quizzes = {quiz["quiz_id"]: quiz for quiz in snapshot["quizzes"]}
+    assert quizzes[10]["average"] == 0.6
+    assert quizzes[10]["overdue_members"] == 1
+    assert quizzes[10]["never_attempted_members"] == 1
+    assert quizzes[11]["overdue_members"] == 0
+    assert quizzes[11]["never_attempted_members"] == 2
+    service.results_service.get_company_rollup.assert_awaited_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_stored_compressed_and_served_from_cache():
+    service = make_dashboard_service()
+    redis = AsyncMock()
+    stored = {}
+    redis.set.side_effect = lambda key, blob, ex: stored.update({key: blob})
+    redis.get.side_effect = lambda key: stored.get(key)
+
+    with patch("app.services.dashboard.get_redis", AsyncMock(return_value=redis)):
+        built = await service.get_dashboard(Company(id=1, owner_id=9))
+        served = await service.get_dashboard(Company(id=1, owner_id=9))
+
+    assert served == built
+    assert json.loads(zlib.decompress(stored["dashboard:company:1"]))["as_of"] == built["as_of"]
+    service.results_service.get_company_rollup.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rebuilds_snapshot():
+    service = make_dashboard_service()
+    redis = AsyncMock()
+
+    with patch("app.services.dashboard.get_redis", AsyncMock(return_value=redis)):
+        await service.get_dashboard(Company(id=1, owner_id=9), refresh=True)
+
+    redis.get.assert_not_awaited()
+    redis.set.assert_awaited_once()
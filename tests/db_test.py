@@ -0,0 +1,105 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.testclient import TestClient
+
+from app.db.db import UnitOfWorkRoute, get_db, get_replica_db, run_after_commit
+
+
+def session_mock(events: list, commit_error: Exception = None, name: str = "db"):
+    session = MagicMock()
+    session.info = {}
+    session.connection = AsyncMock()
+
+    async def commit():
+        events.append("commit")
+        if commit_error is not None:
+            raise commit_error
+
+    async def rollback():
+        events.append("rollback")
+
+    async def close():
+        events.append(f"close {name}")
+
+    session.commit = AsyncMock(side_effect=commit)
+    session.rollback = AsyncMock(side_effect=rollback)
+    session.close = AsyncMock(side_effect=close)
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    return factory
+
+
+def unit_of_work_client(events: list) -> TestClient:
+    route = APIRouter(route_class=UnitOfWorkRoute)
+
+    @route.post("/submit")
+    async def submit(db=Depends(get_db)):
+        async def invalidate():
+            events.append("after_commit")
+
+        async def body():
+            events.append("body")
+            yield "ok"
+
+        run_after_commit(db, invalidate)
+        return StreamingResponse(body())
+
+    @route.post("/export")
+    async def export(db=Depends(get_db), replica=Depends(get_replica_db)):
+        async def body():
+            events.append("body")
+            yield "ok"
+
+        return StreamingResponse(body())
+
+    @route.post("/fail")
+    async def fail(db=Depends(get_db)):
+        raise HTTPException(status_code=400, detail="bad request")
+
+    app = FastAPI()
+    app.include_router(route)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_request_commits_before_response_is_sent():
+    events = []
+    with patch("app.db.db.async_session", session_mock(events)):
+        response = unit_of_work_client(events).post("/submit")
+
+    assert response.status_code == 200
+    assert events[:4] == ["commit", "after_commit", "close db", "body"]
+    assert events.count("after_commit") == 1
+
+
+def test_failed_commit_is_not_reported_as_success():
+    events = []
+    with patch("app.db.db.async_session", session_mock(events, commit_error=RuntimeError("serialization failure"))):
+        response = unit_of_work_client(events).post("/submit")
+
+    assert response.status_code == 500
+    assert "body" not in events
+    assert "after_commit" not in events
+    assert "rollback" in events
+
+
+def test_raising_request_rolls_back():
+    events = []
+    with patch("app.db.db.async_session", session_mock(events)):
+        response = unit_of_work_client(events).post("/fail")
+
+    assert response.status_code == 400
+    assert events == ["rollback"]
+
+
+def test_sessions_are_released_before_a_streamed_body():
+    events = []
+    with patch("app.db.db.async_session", session_mock(events)), \
+            patch("app.db.db.replica_session", session_mock(events, name="replica")), \
+            patch("app.db.db.replica_engine", MagicMock()):
+        response = unit_of_work_client(events).post("/export")
+
+    assert response.status_code == 200
+    assert events[:4] == ["commit", "close db", "close replica", "body"]
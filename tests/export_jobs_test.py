@@ -0,0 +1,143 @@
+import asyncio
+import zlib
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.conf.messages import ERROR_EXPORT_JOB_FAILED, ERROR_EXPORT_JOB_LIMIT, ERROR_EXPORT_JOB_NOT_READY
+from app.schemas.results_schemas import ExportJobModel, ExportJobStatus
+from app.services.export_jobs import ExportJobService
+
+ROWS = [
+    {"quiz_id": 1, "company_id": 7, "user_id": 3, "correct_count": 4, "total_count": 5},
+    {"quiz_id": 2, "company_id": 7, "user_id": 3, "correct_count": 1, "total_count": 5},
+]
+
+
+def results_source(keys: list, batches: list):
+    async def iter_results(_keys):
+        for batch in batches:
+            yield batch
+
+    source = MagicMock()
+    source.fetch_batch_size = 1
+    source.get_company_result_keys = AsyncMock(return_value=keys)
+    source.iter_results = iter_results
+    return source
+
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_company_slots_are_taken(redis_mock):
+    redis, _ = redis_mock
+    redis.register_script = MagicMock(return_value=AsyncMock(return_value=0))
+    service = ExportJobService(results_source([], []))
+
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)), \
+            pytest.raises(HTTPException) as exc_info:
+        await service.submit(7, "csv")
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.detail == ERROR_EXPORT_JOB_LIMIT
+    redis.pipeline.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_submit_stores_queued_job_and_starts_worker(redis_mock):
+    redis, pipe = redis_mock
+    redis.register_script = MagicMock(return_value=AsyncMock(return_value=1))
+    service = ExportJobService(results_source([], []))
+
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)), \
+            patch.object(ExportJobService, "run", AsyncMock()) as run:
+        job = await service.submit(7, "csv")
+        for task in list(service.tasks):
+            await task
+
+    assert job.status == ExportJobStatus.queued
+    acquire = redis.register_script.return_value
+    assert acquire.call_args.kwargs["keys"] == ["export_jobs:running:7"]
+    key, = pipe.hset.call_args.args
+    assert key == f"export_job:{job.job_id}"
+    assert pipe.hset.call_args.kwargs["mapping"]["status"] == "queued"
+    run.assert_awaited_once_with(job.job_id, 7, "csv")
+
+
+@pytest.mark.asyncio
+async def test_run_writes_artifact_and_reports_progress(redis_mock):
+    redis, pipe = redis_mock
+    service = ExportJobService(results_source(["a", "b"], [ROWS[:1], ROWS[1:]]))
+
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)):
+        await service.run("job", 7, "csv")
+
+    artifact = b"".join(zlib.decompress(call.args[1]) for call in pipe.rpush.call_args_list)
+    assert artifact.decode().splitlines() == ["quiz_id,company_id,user_id,correct_count,total_count",
+                                              "1,7,3,4,5", "2,7,3,1,5"]
+    assert all(call.args[0] == "export_job:job:artifact" for call in pipe.rpush.call_args_list)
+    redis.hset.assert_any_await("export_job:job", mapping={"status": "running", "total": 2})
+    redis.hset.assert_any_await("export_job:job", "processed", 1)
+    redis.hset.assert_any_await("export_job:job", "processed", 2)
+    assert redis.hset.call_args.kwargs["mapping"]["status"] == "done"
+    redis.zrem.assert_awaited_once_with("export_jobs:running:7", "job")
+
+
+@pytest.mark.asyncio
+async def test_run_marks_failed_job_and_releases_slot(redis_mock):
+    redis, _ = redis_mock
+    source = results_source([], [])
+    source.get_company_result_keys = AsyncMock(side_effect=RuntimeError("boom"))
+    service = ExportJobService(source)
+
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)):
+        await service.run("job", 7, "json")
+
+    mapping = redis.hset.call_args.kwargs["mapping"]
+    assert mapping["status"] == "failed"
+    assert mapping["error"] == ERROR_EXPORT_JOB_FAILED
+    redis.delete.assert_awaited_once_with("export_job:job:artifact")
+    redis.zrem.assert_awaited_once_with("export_jobs:running:7", "job")
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_running_jobs_before_redis_closes(redis_mock):
+    redis, _ = redis_mock
+    started = asyncio.Event()
+    source = results_source([], [])
+
+    async def get_company_result_keys(_company_id):
+        started.set()
+        await asyncio.Event().wait()
+
+    source.get_company_result_keys = get_company_result_keys
+    service = ExportJobService(source)
+
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)):
+        task = asyncio.create_task(service.run("job", 7, "json"))
+        service.tasks.add(task)
+        await started.wait()
+        await service.shutdown()
+
+    assert task.cancelled()
+    assert redis.hset.call_args.kwargs["mapping"]["status"] == "failed"
+    redis.zrem.assert_awaited_once_with("export_jobs:running:7", "job")
+
+
+@pytest.mark.asyncio
+async def test_get_artifact_streams_finished_chunks(redis_mock):
+    redis, _ = redis_mock
+    redis.lrange.side_effect = [[zlib.compress(b"[1"), zlib.compress(b",2]")], []]
+    service = ExportJobService(results_source([], []))
+    job = ExportJobModel(job_id="job", company_id=7, save_format="json", status="running",
+                         created_at=datetime(2023, 10, 15))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_artifact(job)
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.detail == ERROR_EXPORT_JOB_NOT_READY
+
+    job.status = ExportJobStatus.done
+    with patch("app.services.export_jobs.get_redis", AsyncMock(return_value=redis)):
+        chunks = await service.get_artifact(job)
+        assert b"".join([chunk async for chunk in chunks]) == b"[1,2]"
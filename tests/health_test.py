@@ -1,10 +1,11 @@
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
 
 from app.db import db
-from app.routes.health import check_db_connection, check_redis_connection
+from app.routes.health import check_db_connection, check_redis_connection, check_db_pool, check_analytics_cache, \
+    check_redis_pool
 from app.services import redis
 
 
@@ -38,6 +39,39 @@ async def test_check_db_connection_db_error():
     assert exc_info.value.detail == "Error connecting to the database"
 
 
+@pytest.mark.asyncio
+async def test_check_db_pool():
+    db.engine.pool._metrics.record_wait(0.002)
+    db.engine.pool._metrics.record_wait(0.004)
+
+    response = await check_db_pool()
+
+    stats = response["result"]
+    assert stats["pool_size"] == db.conf.db_pool_size
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] >= 2
+    assert stats["max_wait_ms"] >= 4.0
+    assert stats["replica"] == {"shared_with_primary": True}
+
+
+def test_pool_records_wait_on_checkout():
+    pool = db.TimedQueuePool(MagicMock(), pool_size=1, max_overflow=0)
+    replica = db.TimedQueuePool(MagicMock(), pool_size=1, max_overflow=0)
+
+    with patch.object(db.AsyncAdaptedQueuePool, "connect", return_value="connection"):
+        assert pool.connect() == "connection"
+
+    assert pool.snapshot()["checkouts"] == 1
+    assert replica.snapshot()["checkouts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_check_analytics_cache():
+    response = await check_analytics_cache()
+
+    assert set(response["result"]) == {"hits", "misses", "errors", "hit_ratio", "ttl_seconds"}
+
+
 @pytest.mark.asyncio
 async def test_check_redis_connection_successful():
     redis.ping = AsyncMock(return_value=None)
@@ -61,3 +95,21 @@ async def test_check_redis_connection_redis_error():
     assert exc_info.value.status_code == 500
     assert exc_info.value.detail == "Error connecting to the database"
 
+
+
+@pytest.mark.asyncio
+async def test_check_redis_pool_shares_one_client():
+    client = await db.get_redis()
+    assert await db.get_redis() is client
+
+    response = await check_redis_pool()
+
+    stats = response["result"]
+    assert stats["max_connections"] == db.conf.redis_max_connections
+    assert stats["in_use"] == 0
+    assert stats["created"] == stats["in_use"] + stats["idle"]
+
+    await db.close_redis()
+    assert db.redis_client is None
+    assert await db.get_redis() is not client
+    await db.close_redis()
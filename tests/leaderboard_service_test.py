@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.conf.messages import ERROR_NOT_ON_LEADERBOARD
+from app.services.leaderboards import LeaderboardService
+
+leaderboard_service = LeaderboardService()
+
+
+@pytest.mark.asyncio
+async def test_record_result_updates_company_and_quiz_boards(redis_mock):
+    redis, pipe = redis_mock
+    script = AsyncMock()
+    redis.register_script = MagicMock(return_value=script)
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        await leaderboard_service.record_result(1, 2, 3, 4, 5)
+
+    assert [call.kwargs for call in script.call_args_list] == [
+        {"keys": ["leaderboard:company:1", "leaderboard_totals:company:1"], "args": [3, 4, 5]},
+        {"keys": ["leaderboard:company:1:quiz:2", "leaderboard_totals:company:1:quiz:2"], "args": [3, 4, 5]},
+    ]
+
+
+def test_quiz_boards_are_scoped_to_their_company():
+    assert leaderboard_service._keys(1, 2) != leaderboard_service._keys(5, 2)
+    assert leaderboard_service._keys(1, 2)[0].startswith("leaderboard:company:1:")
+
+
+@pytest.mark.asyncio
+async def test_get_top_returns_ranked_entries(redis_mock):
+    redis, pipe = redis_mock
+    redis.zrevrange.return_value = [(b"7", 0.9), (b"3", 0.5)]
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        top = await leaderboard_service.get_top(1, 2)
+
+    redis.zrevrange.assert_awaited_once_with("leaderboard:company:1", 0, 1, withscores=True)
+    assert top == [{"user_id": 7, "score": 0.9, "rank": 1}, {"user_id": 3, "score": 0.5, "rank": 2}]
+
+
+@pytest.mark.asyncio
+async def test_get_rank(redis_mock):
+    redis, pipe = redis_mock
+    pipe.execute.return_value = [4, 0.75]
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        rank = await leaderboard_service.get_rank(1, 3, quiz_id=2)
+
+    pipe.zrevrank.assert_called_once_with("leaderboard:company:1:quiz:2", 3)
+    assert rank == {"user_id": 3, "score": 0.75, "rank": 5}
+
+
+@pytest.mark.asyncio
+async def test_get_rank_not_on_leaderboard(redis_mock):
+    redis, pipe = redis_mock
+    pipe.execute.return_value = [None, None]
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        with pytest.raises(HTTPException) as exc_info:
+            await leaderboard_service.get_rank(1, 3)
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == ERROR_NOT_ON_LEADERBOARD
+
+
+@pytest.mark.asyncio
+async def test_get_around_clamps_at_the_top(redis_mock):
+    redis, pipe = redis_mock
+    redis.zrevrank.return_value = 1
+    redis.zrevrange.return_value = [(b"7", 0.9), (b"3", 0.5), (b"8", 0.4), (b"9", 0.1)]
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        around = await leaderboard_service.get_around(1, 3, 2)
+
+    redis.zrevrange.assert_awaited_once_with("leaderboard:company:1", 0, 3, withscores=True)
+    assert [entry["rank"] for entry in around] == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_company_swaps_in_boards_from_totals(redis_mock):
+    redis, pipe = redis_mock
+    totals = [
+        SimpleNamespace(result_quiz_id=1, result_user_id=3, result_right_count=4, result_total_count=5),
+        SimpleNamespace(result_quiz_id=2, result_user_id=3, result_right_count=1, result_total_count=5),
+        SimpleNamespace(result_quiz_id=1, result_user_id=4, result_right_count=2, result_total_count=4),
+    ]
+
+    with patch("app.services.leaderboards.get_redis", AsyncMock(return_value=redis)):
+        await leaderboard_service.rebuild_company(1, totals)
+
+    redis.pipeline.assert_called_once_with(transaction=True)
+    zadds = {call.args[0]: call.args[1] for call in pipe.zadd.call_args_list}
+    assert zadds["leaderboard:company:1:rebuild"] == {3: 0.5, 4: 0.5}
+    assert zadds["leaderboard:company:1:quiz:1:rebuild"] == {3: 0.8, 4: 0.5}
+    assert zadds["leaderboard:company:1:quiz:2:rebuild"] == {3: 0.2}
+    pipe.rename.assert_any_call("leaderboard:company:1:rebuild", "leaderboard:company:1")
+    pipe.execute.assert_awaited_once()
@@ -24,10 +24,16 @@ async def test_add_notifications_about_create_quizz():
     ]
     quiz_id = 1
 
-    notifications_service.notifications_repo.add_one = AsyncMock()
+    notifications_service.notifications_repo.add_many = AsyncMock()
 
     await notifications_service.add_notifications_about_create_quizz(members, quiz_id)
 
+    notifications_service.notifications_repo.add_many.assert_awaited_once_with([
+        {"user_id": 1, "text": "Quiz 1 was created, you can submit it!!!"},
+        {"user_id": 2, "text": "Quiz 1 was created, you can submit it!!!"},
+        {"user_id": 3, "text": "Quiz 1 was created, you can submit it!!!"},
+    ])
+
 
 @pytest.mark.asyncio
 async def test_get_notifications():
@@ -0,0 +1,99 @@
+import uuid
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import pytest
+import redis.asyncio as redis
+from fastapi import HTTPException
+
+from app.conf.config import conf
+from app.conf.messages import ERROR_INVALID_DATE_RANGE, ERROR_DATE_RANGE_TOO_LONG
+from app.services.participants import ParticipantsService, STANDARD_ERROR
+
+participants_service = ParticipantsService()
+
+
+async def live_redis():
+    client = redis.Redis(host=conf.redis_endpoint_prod, db=0, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except Exception:
+        await client.close()
+        pytest.skip("Redis is not reachable")
+    return client
+
+
+@pytest.mark.asyncio
+async def test_record_participant_adds_to_quiz_and_company_day(redis_mock):
+    client, pipe = redis_mock
+
+    with patch("app.services.participants.get_redis", AsyncMock(return_value=client)):
+        await participants_service.record_participant(1, 2, 3, day=date(2023, 10, 15))
+
+    pipe.pfadd.assert_any_call("participants:company:1:2023-10-15", 3)
+    pipe.pfadd.assert_any_call("participants:quiz:2:2023-10-15", 3)
+    assert pipe.expire.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_count_unique_merges_range_in_one_pfcount(redis_mock):
+    client, pipe = redis_mock
+    pipe.execute.return_value = [5, 3, 4]
+
+    with patch("app.services.participants.get_redis", AsyncMock(return_value=client)):
+        counts = await participants_service.count_unique(date(2023, 10, 14), date(2023, 10, 15), quiz_id=2)
+
+    pipe.pfcount.assert_any_call("participants:quiz:2:2023-10-14", "participants:quiz:2:2023-10-15")
+    assert counts["unique_participants"] == 5
+    assert counts["daily"] == [{"day": date(2023, 10, 14), "unique_participants": 3},
+                               {"day": date(2023, 10, 15), "unique_participants": 4}]
+
+
+@pytest.mark.asyncio
+async def test_count_unique_invalid_ranges():
+    with pytest.raises(HTTPException) as exc_info:
+        await participants_service.count_unique(date(2023, 10, 15), date(2023, 10, 14), company_id=1)
+    assert exc_info.value.detail == ERROR_INVALID_DATE_RANGE
+
+    with pytest.raises(HTTPException) as exc_info:
+        await participants_service.count_unique(date(2022, 1, 1), date(2023, 10, 14), company_id=1)
+    assert exc_info.value.detail == ERROR_DATE_RANGE_TOO_LONG
+
+
+async def assert_within_error(client):
+    # The estimate must stay within 3 standard errors of the exact count, over the range and for each day
+    company_id = f"test-{uuid.uuid4().hex}"
+    days = [date(2023, 10, 14), date(2023, 10, 15), date(2023, 10, 16)]
+    users_per_day = [range(0, 20000), range(10000, 35000), range(30000, 60000)]
+    try:
+        with patch("app.services.participants.get_redis", AsyncMock(return_value=client)):
+            for day, users in zip(days, users_per_day):
+                key = participants_service._key(day, company_id)
+                for start in range(users.start, users.stop, 5000):
+                    await client.pfadd(key, *range(start, min(start + 5000, users.stop)))
+            counts = await participants_service.count_unique(days[0], days[-1], company_id=company_id)
+
+        exact_total = len(set().union(*users_per_day))
+        assert abs(counts["unique_participants"] - exact_total) <= 3 * STANDARD_ERROR * exact_total
+        for daily, users in zip(counts["daily"], users_per_day):
+            assert abs(daily["unique_participants"] - len(users)) <= 3 * STANDARD_ERROR * len(users)
+    finally:
+        await client.delete(*(participants_service._key(day, company_id) for day in days))
+
+
+@pytest.mark.asyncio
+async def test_range_count_merges_overlapping_days():
+    # fakeredis counts PF* keys exactly, so this pins the range merge and the bound check without a server
+    client = fakeredis.FakeAsyncRedis()
+    await assert_within_error(client)
+
+
+@pytest.mark.asyncio
+async def test_hyperloglog_error_against_exact_counts():
+    # Runs against the configured Redis to measure the real HyperLogLog error
+    client = await live_redis()
+    try:
+        await assert_within_error(client)
+    finally:
+        await client.close()
@@ -55,6 +55,44 @@ async def test_create_question_not_enough_options():
     assert exc_info.value.detail == ERROR_NOT_ENOUGH_OPTIONS
 
 
+@pytest.mark.asyncio
+async def test_create_questions():
+    quiz = Quiz(id=1, quiz_company_id=2)
+    data = [
+        QuestionCreateModel(question_text="What is 2+2?", question_answers=["3", "4"], question_correct_answer="4"),
+        QuestionCreateModel(question_text="What is 2+3?", question_answers=["5", "6"], question_correct_answer="5"),
+    ]
+    current_user = 1
+
+    question_service.valid_question_access = AsyncMock()
+    question_service.questions_repo.add_many = AsyncMock(return_value=[10, 11])
+
+    result = await question_service.create_questions(quiz, data, {}, {}, current_user)
+
+    assert result == [10, 11]
+    rows = question_service.questions_repo.add_many.call_args.args[0]
+    assert [row["question_text"] for row in rows] == ["What is 2+2?", "What is 2+3?"]
+    assert all(row["question_quiz_id"] == 1 and row["question_company_id"] == 2 for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_create_questions_not_enough_options():
+    quiz = Quiz(id=1, quiz_company_id=1)
+    data = [
+        QuestionCreateModel(question_text="What is 2+2?", question_answers=["3", "4"], question_correct_answer="4"),
+        QuestionCreateModel(question_text="What is 2+3?", question_answers=["5"], question_correct_answer="5"),
+    ]
+    question_service.valid_question_access = AsyncMock()
+    question_service.questions_repo.add_many = AsyncMock()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await question_service.create_questions(quiz, data, {}, {}, 1)
+
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+    assert exc_info.value.detail == ERROR_NOT_ENOUGH_OPTIONS
+    question_service.questions_repo.add_many.assert_not_awaited()
+
+
 @pytest.mark.asyncio
 async def test_update_question():
     question_id = 1
@@ -196,3 +196,27 @@ async def test_quizz_submit_no_member_and_owner_not_current_user():
         await quizz_service.quizz_submit(questions, user_answer, member, company, current_user)
 
     assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_all_quizzes_page():
+    service = QuizService(QuizzesRepository)
+    service.quizzes_repo.find_all_by_cursor = AsyncMock(return_value=([Quiz(id=1)], "cursor"))
+
+    quizzes, next_cursor = await service.get_all_quizzes_page(1)
+
+    assert next_cursor == "cursor"
+    service.quizzes_repo.find_all_by_cursor.assert_awaited_once_with(1, None)
+
+
+@pytest.mark.asyncio
+async def test_get_company_quiz_from_other_company():
+    service = QuizService(QuizzesRepository)
+    service.quizzes_repo.find_by_filter = AsyncMock(return_value=None)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_company_quiz(1, 2)
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == ERROR_QUIZ_NOT_FOUND
+    service.quizzes_repo.find_by_filter.assert_awaited_once_with({"id": 1, "quiz_company_id": 2})
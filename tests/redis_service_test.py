@@ -8,22 +8,11 @@ from app.conf.messages import ERROR_MEMBER_NOT_EXISTS, ERROR_ACCESS
 from app.db.models import Company, CompanyMembers
 from app.repository.companies import CompanyRepository
 from app.services.companies import CompanyService
-from app.services.redis import redis_service, RedisService
+from app.services.redis import redis_service, RedisService, encode_result, decode_results
 
 company_service = CompanyService(CompanyRepository)
 
 
-@pytest.mark.asyncio
-async def test_save_data_json():
-    data = {"example": "data"}
-    key = "example_key"
-    save_format = "json"
-    json_loader_instance = AsyncMock()
-    json_loader_instance.save = AsyncMock()
-    redis_service.JSONDataLoader = json_loader_instance
-    await redis_service._save_data(data, key, save_format)
-
-
 @pytest.mark.asyncio
 async def test_store_results():
     with patch.object(redis_service, 'redis', AsyncMock()), \
@@ -40,15 +29,12 @@ async def test_store_results():
 async def test_get_user_results():
     user_id = 123
     current_user = 123
-    upload_format = "json"
     redis_instance = AsyncMock()
     redis_instance.keys = AsyncMock()
     redis_instance.close = AsyncMock()
     redis_service.redis = redis_instance
     get_data_mock = AsyncMock()
     redis_service.get_data = get_data_mock
-    save_data_mock = AsyncMock()
-    redis_service._save_data = save_data_mock
     expected_keys = [f"quiz_answers:1:{user_id}:1", f"quiz_answers:2:{user_id}:1"]
     redis_instance.keys.return_value = expected_keys
     data1 = {
@@ -66,7 +52,7 @@ async def test_get_user_results():
         "total_count": 10,
     }
     get_data_mock.side_effect = [json.dumps(data1), json.dumps(data2)]
-    redis_service.get_user_results(user_id, current_user, upload_format)
+    redis_service.get_user_results(user_id, current_user)
 
 
 @pytest.mark.asyncio
@@ -97,10 +83,9 @@ async def test_valid_access_member_not_admin():
 async def test_get_user_results_access_error():
     user_id = 123
     current_user = 456
-    upload_format = "json"
 
     with pytest.raises(HTTPException) as exc_info:
-        await redis_service.get_user_results(user_id, current_user, upload_format)
+        await redis_service.get_user_results(user_id, current_user)
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == ERROR_ACCESS
@@ -112,10 +97,9 @@ async def test_get_user_results_for_company_access_error():
     current_user = 456
     member = CompanyMembers(is_admin=False)
     company = Company(id=499)
-    upload_format = "json"
 
     with pytest.raises(HTTPException) as exc_info:
-        await redis_service.get_user_results_for_company(user_id, current_user, member, company, upload_format)
+        await redis_service.get_user_results_for_company(user_id, current_user, member, company)
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == ERROR_ACCESS
@@ -127,9 +111,8 @@ async def test_get_user_results_for_company_access_granted():
     current_user = 123
     member = {"is_admin": False}
     company = {"id": 123}
-    upload_format = "json"
     with patch.object(RedisService, '_valid_access', return_value=None):
-        results = redis_service.get_user_results_for_company(user_id, current_user, member, company, upload_format)
+        results = redis_service.get_user_results_for_company(user_id, current_user, member, company)
 
     assert results is not None
 
@@ -140,10 +123,9 @@ async def test_get_all_results_for_company_access_error():
     current_user = 456
     member = CompanyMembers(is_admin=False)
     company = Company(id=499)
-    upload_format = "json"
 
     with pytest.raises(HTTPException) as exc_info:
-        await redis_service.get_all_results_for_company(company_id, current_user, member, company, upload_format)
+        await redis_service.get_all_results_for_company(company_id, current_user, member, company)
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == ERROR_ACCESS
@@ -155,11 +137,9 @@ async def test_get_all_results_for_company_access_granted():
     current_user = 123
     member = {"is_admin": False}
     company = {"id": 123}
-    upload_format = "json"
     with patch.object(RedisService, '_valid_access', return_value=None):
         with patch.object(RedisService, 'get_data', return_value='{"result": "some data"}'):
-            results = redis_service.get_all_results_for_company(company_id, current_user, member, company,
-                                                                upload_format)
+            results = redis_service.get_all_results_for_company(company_id, current_user, member, company)
 
     assert results is not None
 
@@ -170,10 +150,9 @@ async def test_get_quiz_results_for_company_access_error():
     current_user = 456
     member = CompanyMembers(is_admin=False)
     company = Company(id=499)
-    upload_format = "json"
 
     with pytest.raises(HTTPException) as exc_info:
-        await redis_service.get_quiz_results_for_company(quiz_id, current_user, member, company, upload_format)
+        await redis_service.get_quiz_results_for_company(quiz_id, current_user, member, company)
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == ERROR_ACCESS
@@ -185,11 +164,92 @@ async def test_get_quiz_results_for_company_access_error():
     current_user = 456
     member = {"is_admin": False}
     company = {"id": 789}
-    upload_format = "json"
     with patch.object(RedisService, '_valid_access', return_value=None):
         with patch.object(RedisService, 'get_data', return_value='{"result": "some data"}'):
-            results = redis_service.get_quiz_results_for_company(quiz_id, current_user, member, company,
-                                                                 upload_format)
+            results = redis_service.get_quiz_results_for_company(quiz_id, current_user, member, company)
 
     assert results is not None
 
+
+@pytest.mark.asyncio
+async def test_store_results_indexes_key(redis_mock):
+    redis, pipe = redis_mock
+    service = RedisService(redis)
+
+    await service.store_results(1, 2, 3, 4, 5)
+
+    key = "quiz_answers:1:3:2"
+    redis.pipeline.assert_called_once_with(transaction=True)
+    pipe.set.assert_called_once()
+    assert pipe.set.call_args.args == (key, encode_result(4, 5))
+    assert pipe.set.call_args.kwargs["ex"].total_seconds() == 48 * 3600
+    redis.set.assert_not_called()
+    redis.expire.assert_not_called()
+    zadds = {call.args[0]: call.args[1] for call in pipe.zadd.call_args_list}
+    assert set(zadds) == {"quiz_answers_index:user:3", "quiz_answers_index:company:2",
+                          "quiz_answers_index:company:2:quiz:1", "quiz_answers_index:user_company:3:2"}
+    assert all(list(entry) == [key] for entry in zadds.values())
+    assert pipe.zremrangebyscore.call_count == 4
+    assert pipe.expire.call_count == 4
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_all_results_for_company_reads_index(redis_mock):
+    redis, _ = redis_mock
+    service = RedisService(redis)
+    data = {"quiz_id": 1, "company_id": 2, "user_id": 3, "correct_count": 4, "total_count": 5}
+    redis.zrangebyscore.return_value = ["quiz_answers:1:3:2"]
+    redis.mget.return_value = [encode_result(4, 5)]
+
+    with patch.object(RedisService, '_valid_access', AsyncMock(return_value=None)):
+        batches = await service.get_all_results_for_company(2, 3, None, Company(id=2))
+        results = [batch async for batch in batches]
+
+    assert results == [[data]]
+    assert redis.zrangebyscore.call_args.args[0] == "quiz_answers_index:company:2"
+    redis.keys.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_quiz_results_for_company_reads_company_scoped_index(redis_mock):
+    redis, _ = redis_mock
+    service = RedisService(redis)
+    redis.zrangebyscore.return_value = []
+
+    with patch.object(RedisService, '_valid_access', AsyncMock(return_value=None)):
+        batches = await service.get_quiz_results_for_company(1, 3, None, Company(id=2))
+        assert [batch async for batch in batches] == []
+
+    assert redis.zrangebyscore.call_args.args[0] == "quiz_answers_index:company:2:quiz:1"
+
+
+@pytest.mark.asyncio
+async def test_get_user_results_fetches_in_batches(redis_mock):
+    redis, _ = redis_mock
+    service = RedisService(redis)
+    service.fetch_batch_size = 2
+    keys = [f"quiz_answers:{quiz_id}:3:2" for quiz_id in range(5)]
+    values = {key: encode_result(i, 5) for i, key in enumerate(keys)}
+    values[keys[1]] = None
+    redis.zrangebyscore.return_value = keys
+    redis.mget.side_effect = lambda chunk: [values[key] for key in chunk]
+
+    batches = await service.get_user_results(3, 3)
+    results = [result async for batch in batches for result in batch]
+
+    assert [call.args[0] for call in redis.mget.call_args_list] == [keys[0:2], keys[2:4], keys[4:5]]
+    redis.get.assert_not_called()
+    assert [result["quiz_id"] for result in results] == [0, 2, 3, 4]
+
+
+def test_decode_results_packed_and_legacy_json():
+    legacy = {"quiz_id": 9, "company_id": 2, "user_id": 3, "correct_count": 1, "total_count": 2}
+    keys = [b"quiz_answers:1:3:2", b"quiz_answers:8:3:2", b"quiz_answers:9:3:2"]
+    values = [encode_result(4, 5), None, json.dumps(legacy).encode()]
+
+    assert decode_results(keys, values) == [
+        {"quiz_id": 1, "company_id": 2, "user_id": 3, "correct_count": 4, "total_count": 5},
+        legacy,
+    ]
+    assert len(encode_result(4, 5)) < len(json.dumps(legacy))
@@ -0,0 +1,337 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.conf.messages import ERROR_INVALID_CURSOR
+from app.db.models import User, Company
+from app.repository.actions import ActionsRepository
+from app.repository.companies import CompanyRepository
+from app.repository.quizzes import QuizzesRepository
+from app.repository.results import ResultsRepository
+from app.repository.results_rollup import ResultsRollupRepository
+from app.repository.users import UsersRepository
+from app.services.companies import CompanyService
+from app.services.results import ResultsService
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+def session_mock(scalar=None):
+    session = AsyncMock()
+    session.info = {}
+    result = MagicMock()
+    result.scalar_one.return_value = scalar
+    result.scalar_one_or_none.return_value = scalar
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_add_one_does_not_commit():
+    session = session_mock(scalar=7)
+    repo = ResultsRepository(session)
+
+    record_id = await repo.add_one({"result_user_id": 1, "result_company_id": 1})
+
+    assert record_id == 7
+    session.execute.assert_awaited_once()
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_shares_session_between_repositories():
+    session = session_mock()
+    company_service = CompanyService(CompanyRepository, session)
+    results_service = ResultsService(ResultsRepository, session)
+
+    await company_service.companies_repo.update_by_filter({"id": 1}, {"is_visible": False})
+    await results_service.results_repo.delete_by_filter({"result_company_id": 1})
+
+    assert session.execute.await_count == 2
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_without_session_commits_own_transaction():
+    session = session_mock()
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    session_factory.return_value.__aexit__ = AsyncMock(return_value=None)
+    repo = CompanyRepository()
+
+    with patch("app.utils.repository.async_session", session_factory):
+        await repo.update_by_filter({"id": 1}, {"is_visible": False})
+
+    session_factory.assert_called_once()
+    session.commit.assert_awaited_once()
+
+
+def test_cursor_round_trip():
+    user = User(id=42, created_at=datetime(2023, 10, 15, 10, 0, 0))
+
+    assert decode_cursor(encode_cursor(user)) == {"id": 42}
+    assert decode_cursor(encode_cursor(user, "created_at"), "created_at") == {
+        "id": 42, "created_at": datetime(2023, 10, 15, 10, 0, 0)}
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(User(id=1))])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, "created_at")
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == ERROR_INVALID_CURSOR
+
+
+def test_keyset_seeks_past_cursor_instead_of_offset():
+    repo = UsersRepository()
+    statement = repo._keyset(select(User), 10, encode_cursor(User(id=5)), "id")
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "users.id > " in sql
+    assert "ORDER BY users.id" in sql
+    assert "OFFSET" not in sql
+
+
+@pytest.mark.asyncio
+async def test_find_all_by_cursor_returns_next_cursor_for_full_page():
+    users = [User(id=1), User(id=2)]
+    session = session_mock()
+    session.execute.return_value.scalars.return_value.all.return_value = users
+    repo = UsersRepository(session)
+
+    rows, next_cursor = await repo.find_all_by_cursor(2, None)
+
+    assert rows == users
+    assert decode_cursor(next_cursor) == {"id": 2}
+
+    rows, next_cursor = await repo.find_all_by_cursor(3, None)
+
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_find_all_by_cursor_empty_page_has_no_next_cursor():
+    session = session_mock()
+    session.execute.return_value.scalars.return_value.all.return_value = []
+    repo = UsersRepository(session)
+
+    assert await repo.find_all_by_cursor(0, None) == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_add_many_runs_one_batched_insert():
+    session = session_mock()
+    session.execute.return_value.scalars.return_value.all.return_value = [1, 2]
+    repo = ResultsRepository(session)
+    rows = [{"result_user_id": 1, "result_company_id": 1}, {"result_user_id": 2, "result_company_id": 1}]
+
+    ids = await repo.add_many(rows, return_ids=True)
+
+    assert ids == [1, 2]
+    session.execute.assert_awaited_once()
+    assert session.execute.call_args.args[1] == rows
+
+
+@pytest.mark.asyncio
+async def test_add_many_empty_list_skips_database():
+    session = session_mock()
+    repo = ResultsRepository(session)
+
+    assert await repo.add_many([]) is None
+    assert await repo.add_many([], return_ids=True) == []
+    session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_filter_columns_selects_only_named_columns():
+    session = session_mock()
+    session.execute.return_value.all.return_value = [(1, 2)]
+    repo = ResultsRepository(session)
+
+    rows = await repo.filter_columns(["result_right_count", "result_total_count"], {"result_user_id": 1})
+
+    assert rows == [(1, 2)]
+    statement = session.execute.call_args.args[0]
+    assert [column.name for column in statement.selected_columns] == ["result_right_count", "result_total_count"]
+
+
+@pytest.mark.asyncio
+async def test_aggregate_builds_grouped_query_with_having():
+    session = session_mock()
+    session.execute.return_value.all.return_value = [(1, 3, 10)]
+    repo = ResultsRepository(session)
+
+    rows = await repo.aggregate({"attempts": ("count", "id"), "total": ("sum", "result_total_count")},
+                                {"result_company_id": 1},
+                                group_by=["result_user_id"],
+                                having={"attempts": (">=", 2)})
+
+    assert rows == [(1, 3, 10)]
+    sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "count(results.id) AS attempts" in sql
+    assert "sum(results.result_total_count) AS total" in sql
+    assert "GROUP BY results.result_user_id" in sql
+    assert "HAVING count(results.id) >= " in sql
+
+
+@pytest.mark.asyncio
+async def test_aggregate_filter_in_scopes_grouped_query():
+    session = session_mock()
+    session.execute.return_value.all.return_value = []
+    repo = ResultsRepository(session)
+
+    await repo.aggregate({"last_attempt_date": ("max", "created_at")}, {"result_company_id": 1},
+                         group_by=["result_quiz_id"], filter_in={"result_quiz_id": [1, 2]})
+
+    sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "max(results.created_at) AS last_attempt_date" in sql
+    assert "results.result_quiz_id IN (__[POSTCOMPILE_result_quiz_id_1])" in sql
+    assert "GROUP BY results.result_quiz_id" in sql
+
+
+@pytest.mark.asyncio
+async def test_aggregate_by_period_buckets_with_date_trunc():
+    session = session_mock()
+    session.execute.return_value.all.return_value = []
+    repo = ResultsRepository(session)
+
+    await repo.aggregate_by_period({"attempts": ("count", "id")}, {"result_company_id": 1}, "week", "created_at",
+                                   datetime(2023, 1, 1), datetime(2023, 2, 1))
+
+    sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "date_trunc('week', results.created_at) AS bucket" in sql
+    assert "results.created_at >= " in sql and "results.created_at < " in sql
+    assert "GROUP BY date_trunc('week', results.created_at)" in sql
+    assert "ORDER BY bucket" in sql
+
+
+@pytest.mark.asyncio
+async def test_aggregate_by_period_rejects_unknown_period():
+    repo = ResultsRepository(session_mock())
+
+    with pytest.raises(ValueError):
+        await repo.aggregate_by_period({}, {}, "1 day; drop table results", "created_at",
+                                       datetime(2023, 1, 1), datetime(2023, 2, 1))
+
+
+@pytest.mark.asyncio
+async def test_rollup_add_attempt_is_a_single_upsert():
+    session = session_mock()
+    repo = ResultsRollupRepository(session)
+
+    await repo.add_attempt({"result_user_id": 1, "result_company_id": 2, "result_quiz_id": 3,
+                            "result_right_count": 4, "result_total_count": 5, "created_at": datetime(2023, 1, 1)})
+
+    session.execute.assert_awaited_once()
+    sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (result_user_id, result_company_id, result_quiz_id) DO UPDATE" in sql
+    assert "attempts = (results_rollup.attempts + " in sql
+    assert "last_attempt_at = greatest(results_rollup.last_attempt_at, excluded.last_attempt_at)" in sql
+    assert session.info["has_writes"] is True
+
+
+@pytest.mark.asyncio
+async def test_rollup_rebuild_locks_and_recomputes_from_results():
+    session = session_mock()
+    session.execute.return_value.rowcount = 2
+    repo = ResultsRollupRepository(session)
+
+    assert await repo.rebuild() == 2
+
+    statements = [str(call.args[0].compile(dialect=postgresql.dialect())) for call in session.execute.call_args_list]
+    assert statements[0] == "LOCK TABLE results_rollup IN SHARE ROW EXCLUSIVE MODE"
+    assert statements[1] == "DELETE FROM results_rollup"
+    assert statements[2].startswith("INSERT INTO results_rollup")
+    assert "GROUP BY results.result_user_id, results.result_company_id, results.result_quiz_id" in statements[2]
+
+
+@pytest.mark.asyncio
+async def test_stream_columns_yields_server_side_cursor_batches():
+    async def partitions():
+        yield [(1, "Quiz 1"), (2, "Quiz 2")]
+        yield [(3, "Quiz 3")]
+
+    session = session_mock()
+    session.stream = AsyncMock(return_value=MagicMock(partitions=partitions))
+    repo = QuizzesRepository(session)
+
+    batches = [batch async for batch in repo.stream_columns(["id", "quiz_name"], {}, 2)]
+
+    assert batches == [[(1, "Quiz 1"), (2, "Quiz 2")], [(3, "Quiz 3")]]
+    statement = session.stream.call_args.args[0]
+    assert statement.get_execution_options()["yield_per"] == 2
+    assert "ORDER BY quizzes.id" in str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_writes_to_primary():
+    primary = session_mock()
+    replica = session_mock(scalar=Company(id=1))
+    repo = CompanyRepository(primary, replica)
+
+    await repo.find_by_filter({"id": 1})
+    await repo.update_by_filter({"id": 1}, {"is_visible": False})
+
+    replica.execute.assert_awaited_once()
+    primary.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_reads_stay_on_primary_after_write_in_request():
+    primary = session_mock()
+    replica = session_mock()
+    company_repo = CompanyRepository(primary, replica)
+    results_repo = ResultsRepository(primary, replica)
+
+    await results_repo.add_one({"result_user_id": 1, "result_company_id": 1})
+    await company_repo.find_by_filter({"id": 1})
+
+    assert primary.execute.await_count == 2
+    replica.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_reads_use_request_session_without_replica():
+    primary = session_mock()
+    repo = CompanyRepository(primary)
+
+    await repo.filter_columns(["id"], {"owner_id": 1})
+
+    primary.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_reads_without_request_session_use_primary():
+    # e.g. PUT /users/{user_id} writes and then re-reads through a sessionless UsersService
+    session = session_mock(scalar=Company(id=1))
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    session_factory.return_value.__aexit__ = AsyncMock(return_value=None)
+    repo = CompanyRepository()
+
+    with patch("app.utils.repository.async_session", session_factory):
+        await repo.find_by_filter({"id": 1})
+
+    session_factory.assert_called_once()
+    session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_update_by_filter_returning_is_single_conditional_statement():
+    session = session_mock()
+    session.execute.return_value.scalars.return_value.all.return_value = []
+    repo = ActionsRepository(session)
+
+    rows = await repo.update_by_filter_returning({"user_id": 1, "company_id": 1, "action": "invitation_sent"},
+                                                 {"action": "invitation_accepted"})
+
+    assert rows == []
+    session.execute.assert_awaited_once()
+    sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE actions SET action=")
+    assert "actions.action = " in sql
+    assert "RETURNING" in sql
@@ -1,10 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 import pytest
 from fastapi import HTTPException
 
-from app.conf.messages import ERROR_USER_NOT_FOUND, ERROR_MEMBER_NOT_FOUND, ERROR_ACCESS
+from app.conf.messages import ERROR_USER_NOT_FOUND, ERROR_MEMBER_NOT_FOUND, ERROR_ACCESS, ERROR_INVALID_DATE_RANGE, \
+    ERROR_INVALID_PERCENTILES
 from app.db.models import Result, Company, Quiz, CompanyMembers
 from app.repository.results import ResultsRepository
 from app.services.results import ResultsService
@@ -20,9 +22,22 @@ async def test_add_results():
     correct_count = 5
     total_count = 7
     result_service.results_repo.add_one = AsyncMock()
+    result_service.rollup_repo.add_attempt = AsyncMock()
 
     await result_service.add_results(quiz_id, company_id, current_user, correct_count, total_count)
 
+    result = result_service.results_repo.add_one.call_args.args[0]
+    assert result["result_right_count"] == correct_count
+    result_service.rollup_repo.add_attempt.assert_awaited_once_with(result)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_rollup():
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.rebuild = AsyncMock(return_value=3)
+
+    assert await service.rebuild_rollup() == 3
+
 
 @pytest.mark.asyncio
 async def test_calculate_average_rating():
@@ -83,22 +98,36 @@ async def test_get_user_average_rating_in_company_user_not_member():
 async def test_get_system_average_rating_success():
     user_id = 1
 
-    result1 = Result(result_right_count=4, result_total_count=5)
-    result2 = Result(result_right_count=7, result_total_count=10)
-    user_results = [result1, result2]
+    totals = SimpleNamespace(attempts=2, result_right_count=11, result_total_count=15)
     result_service.calculate_average_rating = AsyncMock(return_value=0.675)
-    result_service.results_repo.filter = AsyncMock(return_value=user_results)
+    result_service.rollup_repo.aggregate = AsyncMock(return_value=[totals])
 
     average_rating = await result_service.get_system_average_rating(user_id)
 
     assert average_rating == 0.675
+    result_service.calculate_average_rating.assert_awaited_once_with([totals])
+
+
+@pytest.mark.asyncio
+async def test_get_system_average_rating_from_database_totals():
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(
+        return_value=[SimpleNamespace(attempts=2, result_right_count=11, result_total_count=20)])
+
+    average_rating = await service.get_system_average_rating(1)
+
+    assert average_rating == 0.55
+    aggregates, filter_by = service.rollup_repo.aggregate.call_args.args
+    assert aggregates["result_right_count"] == ("sum", "result_right_count")
+    assert filter_by == {"result_user_id": 1}
 
 
 @pytest.mark.asyncio
 async def test_get_system_average_rating_user_not_found():
     user_id = 1
 
-    result_service.results_repo.filter = AsyncMock(return_value=[])
+    result_service.rollup_repo.aggregate = AsyncMock(
+        return_value=[SimpleNamespace(attempts=0, result_right_count=None, result_total_count=None)])
 
     with pytest.raises(HTTPException) as exc_info:
         await result_service.get_system_average_rating(user_id)
@@ -114,12 +143,13 @@ async def test_get_last_attempt_times_for_all_quizzes_success():
         Quiz(id=2, quiz_name="Quiz 2"),
         Quiz(id=3, quiz_name="Quiz 3"),
     ]
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(return_value=[
+        SimpleNamespace(result_quiz_id=1, last_attempt_date=datetime(2023, 10, 15, 10, 0, 0)),
+        SimpleNamespace(result_quiz_id=2, last_attempt_date=datetime(2023, 10, 16, 15, 0, 0)),
+    ])
 
-    result_service.results_repo.get_max_by_filter = AsyncMock(
-        side_effect=[datetime(2023, 10, 15, 10, 0, 0), datetime(2023, 10, 16, 15, 0, 0), None]
-    )
-
-    last_attempt_times = await result_service.get_last_attempt_times_for_all_quizzes(quizzes)
+    last_attempt_times = await service.get_last_attempt_times_for_all_quizzes(quizzes)
 
     expected_times = [
         {"quiz_id": 1, "quiz_name": "Quiz 1", "last_attempt_date": datetime(2023, 10, 15, 10, 0, 0)},
@@ -128,6 +158,20 @@ async def test_get_last_attempt_times_for_all_quizzes_success():
     ]
 
     assert last_attempt_times == expected_times
+    service.rollup_repo.aggregate.assert_awaited_once()
+    assert service.rollup_repo.aggregate.call_args.kwargs == {
+        "group_by": ["result_quiz_id"],
+        "filter_in": {"result_quiz_id": [1, 2, 3]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_last_attempt_times_for_all_quizzes_empty():
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock()
+
+    assert await service.get_last_attempt_times_for_all_quizzes([]) == []
+    service.rollup_repo.aggregate.assert_not_awaited()
 
 
 @pytest.mark.asyncio
@@ -135,30 +179,26 @@ async def test_get_average_quiz_by_time_success():
     quizzes = [
         Quiz(id=1, quiz_name="Quiz 1"),
         Quiz(id=2, quiz_name="Quiz 2"),
+        Quiz(id=3, quiz_name="Quiz 3"),
     ]
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(return_value=[
+        SimpleNamespace(result_quiz_id=1, last_attempt_date=datetime(2023, 10, 15, 10, 0, 0),
+                        result_right_count=5, result_total_count=5),
+        SimpleNamespace(result_quiz_id=2, last_attempt_date=datetime(2023, 10, 16, 15, 0, 0),
+                        result_right_count=3, result_total_count=6),
+    ])
 
-    result1 = Result(result_quiz_id=1, created_at=datetime(2023, 10, 15, 10, 0, 0))
-    result2 = Result(result_quiz_id=2, created_at=datetime(2023, 10, 16, 15, 0, 0))
-
-    user_results1 = [result1]
-    user_results2 = [result2]
-    result_service.results_repo.get_max_by_filter = AsyncMock(
-        side_effect=[datetime(2023, 10, 15, 10, 0, 0), datetime(2023, 10, 16, 15, 0, 0)]
-    )
-    result_service.results_repo.filter = AsyncMock(
-        side_effect=[user_results1, user_results2]
-    )
-    result_service.calculate_average_rating = AsyncMock(
-        side_effect=[1.0, 0.5]
-    )
-    average_quizzes = await result_service.get_average_quiz_by_time(quizzes)
+    average_quizzes = await service.get_average_quiz_by_time(quizzes)
 
     expected_average_quizzes = [
         {"quiz_id": 1, "average_quizz": 1.0, "last_attempt_date": datetime(2023, 10, 15, 10, 0, 0)},
-        {"quiz_id": 2, "average_quizz": 0.5, "last_attempt_date": datetime(2023, 10, 16, 15, 0, 0)}
+        {"quiz_id": 2, "average_quizz": 0.5, "last_attempt_date": datetime(2023, 10, 16, 15, 0, 0)},
+        {"quiz_id": 3, "average_quizz": 0.0, "last_attempt_date": None},
     ]
 
     assert average_quizzes == expected_average_quizzes
+    service.rollup_repo.aggregate.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -168,15 +208,14 @@ async def test_get_last_attempt_times_for_all_users_success():
         CompanyMembers(user_id=2),
         CompanyMembers(user_id=3),
     ]
-
-    result_service.results_repo.get_max_by_filter = AsyncMock(side_effect=[
-        datetime(2023, 10, 15, 10, 0, 0),
-        datetime(2023, 10, 16, 15, 0, 0),
-        None
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(return_value=[
+        SimpleNamespace(result_user_id=1, last_attempt_date=datetime(2023, 10, 15, 10, 0, 0)),
+        SimpleNamespace(result_user_id=2, last_attempt_date=datetime(2023, 10, 16, 15, 0, 0)),
     ])
-    result_service.valid_result_access = AsyncMock()
+    service.valid_result_access = AsyncMock()
 
-    user_last_attempt_times = await result_service.get_last_attempt_times_for_all_users(users, 1, {}, {})
+    user_last_attempt_times = await service.get_last_attempt_times_for_all_users(users, 1, {}, {})
 
     expected_last_attempt_times = [
         {"user_id": 1, "last_attempt_date": datetime(2023, 10, 15, 10, 0, 0)},
@@ -185,6 +224,7 @@ async def test_get_last_attempt_times_for_all_users_success():
     ]
 
     assert user_last_attempt_times == expected_last_attempt_times
+    assert service.rollup_repo.aggregate.call_args.kwargs["filter_in"] == {"result_user_id": [1, 2, 3]}
 
 
 @pytest.mark.asyncio
@@ -196,9 +236,10 @@ async def test_get_last_attempt_times_for_all_users_error_access():
     ]
     company = Company(owner_id=2)
     member = CompanyMembers(user_id=1)
+    service = ResultsService(ResultsRepository)
 
     with pytest.raises(HTTPException) as exc_info:
-        await result_service.get_last_attempt_times_for_all_users(users, 1, member, company)
+        await service.get_last_attempt_times_for_all_users(users, 1, member, company)
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == ERROR_ACCESS
@@ -210,14 +251,16 @@ async def test_get_average_users_by_time_success():
         CompanyMembers(user_id=1),
         CompanyMembers(user_id=2)
     ]
-    result_service.results_repo.get_max_by_filter = AsyncMock(side_effect=[
-        datetime(2023, 10, 15, 10, 0, 0),
-        datetime(2023, 10, 16, 15, 0, 0)
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(return_value=[
+        SimpleNamespace(result_user_id=1, last_attempt_date=datetime(2023, 10, 15, 10, 0, 0),
+                        result_right_count=8, result_total_count=10),
+        SimpleNamespace(result_user_id=2, last_attempt_date=datetime(2023, 10, 16, 15, 0, 0),
+                        result_right_count=7, result_total_count=10),
     ])
-    result_service.calculate_average_rating = AsyncMock(side_effect=[0.8, 0.7])
-    result_service.valid_result_access = AsyncMock()
+    service.valid_result_access = AsyncMock()
 
-    average_users = await result_service.get_average_users_by_time(users, 1, {}, {})
+    average_users = await service.get_average_users_by_time(users, 1, {}, {})
 
     expected_average_users = [
         {"user_id": 1, "average_user": 0.8, "last_attempt_date": datetime(2023, 10, 15, 10, 0, 0)},
@@ -237,27 +280,148 @@ async def test_get_average_quizz_for_user_in_company_by_time_success():
     current_user = 1
     member = {}
     company = Company(id=1)
-    result_service.results_repo.get_max_by_filter = AsyncMock(side_effect=[
-        datetime(2023, 10, 15, 10, 0, 0),
-        datetime(2023, 10, 16, 15, 0, 0)
-    ])
-    result_service.results_repo.filter = AsyncMock(side_effect=[
-        [
-            Result(result_user_id=1, result_quiz_id=1, result_company_id=1, result_right_count=4, result_total_count=5),
-            Result(result_user_id=1, result_quiz_id=2, result_company_id=1, result_right_count=3, result_total_count=5)
-        ],
-        [
-            Result(result_user_id=1, result_quiz_id=1, result_company_id=1, result_right_count=3, result_total_count=5),
-            Result(result_user_id=1, result_quiz_id=2, result_company_id=1, result_right_count=2, result_total_count=5)
-        ]
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(return_value=[
+        SimpleNamespace(result_quiz_id=1, last_attempt_date=datetime(2023, 10, 15, 10, 0, 0),
+                        result_right_count=4, result_total_count=5),
+        SimpleNamespace(result_quiz_id=2, last_attempt_date=datetime(2023, 10, 16, 15, 0, 0),
+                        result_right_count=3, result_total_count=5),
     ])
-    result_service.calculate_average_rating = AsyncMock(side_effect=[0.8, 0.6, 0.6, 0.4])
-    result_service.valid_result_access = AsyncMock()
-    average_quizzes = await result_service.get_average_quizz_for_user_in_company_by_time(
+    service.valid_result_access = AsyncMock()
+    average_quizzes = await service.get_average_quizz_for_user_in_company_by_time(
         users_id, quizzes, current_user, member, company)
 
     expected_average_quizzes = [
         {"user_id": 1, "company_id": 1, "result_quiz_id": 1, "average_user": 0.8, "last_attempt_date": datetime(2023, 10, 15, 10, 0, 0)},
         {"user_id": 1, "company_id": 1, "result_quiz_id": 2, "average_user": 0.6, "last_attempt_date": datetime(2023, 10, 16, 15, 0, 0)}
     ]
-    assert average_quizzes == expected_average_quizzes
\ No newline at end of file
+    assert average_quizzes == expected_average_quizzes
+    aggregates, filter_by = service.rollup_repo.aggregate.call_args.args
+    assert filter_by == {"result_user_id": 1, "result_company_id": 1}
+
+
+@pytest.mark.asyncio
+async def test_get_company_score_series_success():
+    service = ResultsService(ResultsRepository)
+    service.results_repo.aggregate_by_period = AsyncMock(return_value=[
+        SimpleNamespace(bucket=datetime(2023, 10, 1), attempts=2, result_right_count=6, result_total_count=10),
+        SimpleNamespace(bucket=datetime(2023, 10, 3), attempts=1, result_right_count=0, result_total_count=0),
+    ])
+    service.valid_result_access = AsyncMock()
+
+    series = await service.get_company_score_series(Company(id=1), {}, 1, "day",
+                                                    datetime(2023, 10, 1), datetime(2023, 11, 1), quiz_id=4)
+
+    assert series == [
+        {"bucket": datetime(2023, 10, 1), "attempts": 2, "average_score": 0.6},
+        {"bucket": datetime(2023, 10, 3), "attempts": 1, "average_score": 0.0},
+    ]
+    aggregates, filter_by, period, column, date_from, date_to = \
+        service.results_repo.aggregate_by_period.call_args.args
+    assert filter_by == {"result_company_id": 1, "result_quiz_id": 4}
+    assert (period, column) == ("day", "created_at")
+
+
+@pytest.mark.asyncio
+async def test_get_score_series_converts_aware_bounds_to_utc():
+    service = ResultsService(ResultsRepository)
+    service.results_repo.aggregate_by_period = AsyncMock(return_value=[])
+    kyiv = timezone(timedelta(hours=3))
+
+    await service.get_score_series({"result_user_id": 1}, "hour",
+                                   datetime(2023, 10, 1, 3, tzinfo=kyiv), datetime(2023, 10, 2, 3, tzinfo=kyiv))
+
+    date_from, date_to = service.results_repo.aggregate_by_period.call_args.args[4:]
+    assert date_from == datetime(2023, 10, 1) and date_to == datetime(2023, 10, 2)
+
+
+@pytest.mark.asyncio
+async def test_get_score_series_invalid_range():
+    service = ResultsService(ResultsRepository)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_score_series({}, "day", datetime(2023, 11, 1), datetime(2023, 10, 1))
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == ERROR_INVALID_DATE_RANGE
+
+
+@pytest.mark.asyncio
+async def test_after_commit_is_queued_on_the_request_session():
+    session = SimpleNamespace(info={})
+    service = ResultsService(ResultsRepository, session)
+    callback = AsyncMock()
+
+    await service.after_commit(callback)
+
+    callback.assert_not_awaited()
+    assert session.info["after_commit"] == [callback]
+
+
+@pytest.mark.asyncio
+async def test_after_commit_runs_immediately_without_request_session():
+    service = ResultsService(ResultsRepository)
+    callback = AsyncMock()
+
+    await service.after_commit(callback)
+
+    callback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stream_per_batch_runs_analytics_per_batch():
+    async def batches():
+        yield [Quiz(id=1, quiz_name="Quiz 1"), Quiz(id=2, quiz_name="Quiz 2")]
+        yield [Quiz(id=3, quiz_name="Quiz 3")]
+
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.aggregate = AsyncMock(side_effect=[
+        [SimpleNamespace(result_quiz_id=1, last_attempt_date=datetime(2023, 10, 15))],
+        [],
+    ])
+
+    rows = [row async for row in service.stream_per_batch(batches(),
+                                                          service.get_last_attempt_times_for_all_quizzes)]
+
+    assert [row["quiz_id"] for row in rows] == [1, 2, 3]
+    assert rows[0]["last_attempt_date"] == datetime(2023, 10, 15)
+    assert service.rollup_repo.aggregate.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_leaderboard_totals_reads_rollup_columns():
+    service = ResultsService(ResultsRepository)
+    service.rollup_repo.filter_columns = AsyncMock(return_value=[])
+
+    await service.get_leaderboard_totals(5)
+
+    columns, filter_by = service.rollup_repo.filter_columns.call_args.args
+    assert "result_user_id" in columns and filter_by == {"result_company_id": 5}
+
+
+@pytest.mark.asyncio
+async def test_get_score_distribution_reads_columns():
+    service = ResultsService(ResultsRepository)
+    service.results_repo.filter_columns = AsyncMock(return_value=[
+        (3, 4, datetime(2023, 10, 1)), (1, 4, datetime(2023, 10, 2)),
+    ])
+    service.valid_result_access = AsyncMock()
+
+    distribution = await service.get_score_distribution(Company(id=1), {}, 1, quiz_id=2, percentiles=[50])
+
+    columns, filter_by = service.results_repo.filter_columns.call_args.args
+    assert filter_by == {"result_company_id": 1, "result_quiz_id": 2}
+    assert distribution["median"] == 0.5
+    assert distribution["last_attempt"] == datetime(2023, 10, 2)
+
+
+@pytest.mark.asyncio
+async def test_get_score_distribution_invalid_percentiles():
+    service = ResultsService(ResultsRepository)
+    service.valid_result_access = AsyncMock()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_score_distribution(Company(id=1), {}, 1, percentiles=[101])
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == ERROR_INVALID_PERCENTILES
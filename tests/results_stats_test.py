@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.results_stats import score_distribution, to_arrays
+
+
+def test_to_arrays_drops_attempts_without_questions():
+    rows = [(4, 5, datetime(2023, 1, 2)), (0, 0, datetime(2023, 1, 1)), (1, 2, datetime(2023, 1, 3))]
+
+    scores, attempts, first_attempt, last_attempt = to_arrays(rows)
+
+    assert scores.tolist() == [0.8, 0.5]
+    assert attempts == 3
+    assert (first_attempt, last_attempt) == (datetime(2023, 1, 1), datetime(2023, 1, 3))
+
+
+def test_score_distribution_matches_numpy_reference():
+    scores = np.array([0.0, 0.25, 0.5, 0.5, 0.75, 1.0])
+
+    distribution = score_distribution(scores, 6, percentiles=(25, 90), bins=4)
+
+    assert distribution["median"] == pytest.approx(0.5)
+    assert distribution["mean"] == pytest.approx(scores.mean())
+    assert distribution["std"] == pytest.approx(scores.std())
+    assert distribution["percentiles"] == {"25": pytest.approx(0.3125), "90": pytest.approx(0.875)}
+    assert distribution["histogram"] == {"edges": [0.0, 0.25, 0.5, 0.75, 1.0], "counts": [1, 1, 2, 2]}
+
+
+def test_score_distribution_empty():
+    distribution = score_distribution(*to_arrays([]))
+
+    assert distribution["attempts"] == 0
+    assert distribution["median"] is None
+    assert distribution["percentiles"]["99"] is None
+    assert sum(distribution["histogram"]["counts"]) == 0
@@ -9,7 +9,8 @@ from app.services.company_members import CompanyMembersService
 from app.services.notifications import NotificationsService
 from app.services.quizzes import QuizService
 from app.services.results import ResultsService
-from app.services.schedule_event import schedule_notification_sender
+from app.services.dashboard import DashboardService
+from app.services.schedule_event import schedule_notification_sender, schedule_dashboard_snapshots
 
 
 @pytest.mark.asyncio
@@ -19,4 +20,14 @@ async def test_schedule_notification_sender():
          patch.object(QuizService, 'get_quizzes', return_value=[Quiz(id=3, quiz_frequency=7)]), \
          patch.object(ResultsService, 'get_last_attempt_time_for_user_quiz', return_value=datetime.utcnow() - timedelta(days=8)), \
          patch.object(NotificationsService, 'add_notifications_about_time_to_quizz', return_value=None):
-        await schedule_notification_sender()
\ No newline at end of file
+        await schedule_notification_sender()
+
+
+@pytest.mark.asyncio
+async def test_schedule_dashboard_snapshots():
+    companies = [Company(id=1), Company(id=2)]
+    with patch.object(CompanyService, 'get_all_companies', return_value=companies), \
+         patch.object(DashboardService, 'refresh_snapshot', return_value=None) as refresh_snapshot:
+        await schedule_dashboard_snapshots()
+
+    assert [call.args[0] for call in refresh_snapshot.call_args_list] == companies
@@ -0,0 +1,108 @@
+import math
+import random
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.score_sketch import ScoreSketch, ScoreSketchService, MAX_QUANTILE_ERROR
+
+score_sketch_service = ScoreSketchService()
+PERCENTILES = (0, 1, 5, 25, 50, 75, 90, 95, 99, 99.9, 100)
+
+
+def exact_quantile(scores: list, p: float) -> float:
+    ordered = sorted(scores)
+    return ordered[max(math.ceil(p / 100 * len(ordered)), 1) - 1]
+
+
+def random_scores(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    scores = []
+    for _ in range(count):
+        total = rng.randint(1, 50)
+        scores.append(rng.randint(0, total) / total)
+    return scores
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_quantiles_within_documented_error(seed):
+    scores = random_scores(20000, seed)
+    sketch = ScoreSketch()
+    for score in scores:
+        sketch.add(score)
+
+    quantiles = sketch.quantiles(PERCENTILES)
+
+    for p in PERCENTILES:
+        assert abs(quantiles[f"{p:g}"] - exact_quantile(scores, p)) <= MAX_QUANTILE_ERROR + 1e-12
+
+
+def test_merge_equals_sketch_of_union():
+    first, second = random_scores(5000, 4), random_scores(7000, 5)
+
+    merged = ScoreSketch.from_scores(np.array(first)).merge(ScoreSketch.from_scores(np.array(second)))
+    union = ScoreSketch.from_scores(np.array(first + second))
+
+    assert merged.counts == union.counts
+    assert merged.total == 12000
+    for p in PERCENTILES:
+        assert abs(merged.quantiles([p])[f"{p:g}"] - exact_quantile(first + second, p)) <= MAX_QUANTILE_ERROR + 1e-12
+
+
+def test_from_scores_matches_add():
+    scores = [0.0, 0.3333, 0.5, 0.9999, 1.0]
+    added = ScoreSketch()
+    for score in scores:
+        added.add(score)
+
+    assert ScoreSketch.from_scores(np.array(scores)).counts == added.counts
+
+
+def test_empty_sketch():
+    assert ScoreSketch().quantiles([50]) == {"50": None}
+
+
+@pytest.mark.asyncio
+async def test_record_result_increments_company_and_quiz_bins(redis_mock):
+    redis, pipe = redis_mock
+
+    with patch("app.services.score_sketch.get_redis", AsyncMock(return_value=redis)):
+        await score_sketch_service.record_result(1, 2, 3, 4)
+
+    pipe.hincrby.assert_any_call("score_sketch:company:1", 750, 1)
+    pipe.hincrby.assert_any_call("score_sketch:quiz:2", 750, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_percentiles_merges_companies(redis_mock):
+    redis, pipe = redis_mock
+    pipe.execute.return_value = [{b"100": b"1"}, {b"900": b"3"}]
+
+    with patch("app.services.score_sketch.get_redis", AsyncMock(return_value=redis)):
+        result = await score_sketch_service.get_percentiles([25, 50], company_ids=[1, 2])
+
+    assert [call.args[0] for call in pipe.hgetall.call_args_list] == ["score_sketch:company:1",
+                                                                     "score_sketch:company:2"]
+    assert result["attempts"] == 4
+    assert result["percentiles"] == {"25": 0.1005, "50": 0.9005}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_company_replaces_sketches(redis_mock):
+    redis, pipe = redis_mock
+
+    async def batches():
+        yield [(1, 1, 2), (2, 3, 4), (None, 1, 1), (1, 0, 0)]
+
+    with patch("app.services.score_sketch.get_redis", AsyncMock(return_value=redis)):
+        await score_sketch_service.rebuild_company(7, batches())
+
+    mappings = {call.args[0]: call.kwargs["mapping"] for call in pipe.hset.call_args_list}
+    assert mappings == {
+        "score_sketch:company:7:rebuild": {500: 1, 750: 1},
+        "score_sketch:quiz:1:rebuild": {500: 1},
+        "score_sketch:quiz:2:rebuild": {750: 1},
+    }
+    pipe.rename.assert_any_call("score_sketch:company:7:rebuild", "score_sketch:company:7")
+    redis.pipeline.assert_called_once_with(transaction=True)
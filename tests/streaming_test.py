@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.services.redis import RESULT_FIELDS
+from app.utils.streaming import export_response
+
+ROWS = [
+    {"quiz_id": 1, "company_id": 2, "user_id": 3, "correct_count": 4, "total_count": 5},
+    {"quiz_id": 6, "company_id": 2, "user_id": 3, "correct_count": 1, "total_count": 5},
+]
+
+
+async def batches(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def body(response) -> str:
+    return "".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.asyncio
+async def test_export_csv_streams_header_and_rows():
+    response = export_response(batches(ROWS[:1], [], ROWS[1:]), "csv", "company_id_2", RESULT_FIELDS)
+
+    assert response.media_type == "text/csv"
+    assert response.headers["content-disposition"] == 'attachment; filename="company_id_2-results.csv"'
+    lines = (await body(response)).splitlines()
+    assert lines == ["quiz_id,company_id,user_id,correct_count,total_count", "1,2,3,4,5", "6,2,3,1,5"]
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson():
+    response = export_response(batches(ROWS[:1], ROWS[1:]), "ndjson", "user_id_3", RESULT_FIELDS)
+
+    assert [json.loads(line) for line in (await body(response)).splitlines()] == ROWS
+
+
+@pytest.mark.asyncio
+async def test_export_json_array():
+    response = export_response(batches([], ROWS[:1], [], ROWS[1:]), "json", "user_id_3", RESULT_FIELDS)
+    assert json.loads(await body(response)) == ROWS
+
+    empty = export_response(batches(), "json", "user_id_3", RESULT_FIELDS)
+    assert json.loads(await body(empty)) == []